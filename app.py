@@ -1,356 +1,741 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import pyodbc
-from pyodbc import Error
-import hashlib
-import jwt
-import datetime
-from flask import Flask, send_from_directory
-import os
-
-app = Flask(__name__)
-CORS(app) # Mengizinkan CORS untuk frontend
-app.config['SECRET_KEY'] = 'your_secret_key_farhan_shop' # Ganti dengan kunci rahasia yang kuat
-
-# Konfigurasi Database SQL Server untuk Windows Authentication
-DB_CONFIG = {
-    'server': 'LAPTOP-DU6E16BV', # Ganti dengan nama server SQL Server Anda
-    'database': 'FarhanShopDB', # Ganti dengan nama database Anda
-    'driver': '{ODBC Driver 17 for SQL Server}' # Sesuaikan dengan driver ODBC yang terinstal
-    # Tidak perlu 'username' dan 'password' karena menggunakan Windows Authentication
-}
-
-def get_db_connection():
-    """
-    Mendapatkan koneksi database SQL Server menggunakan Windows Authentication.
-    """
-    try:
-        conn_str = (
-            f"DRIVER={DB_CONFIG['driver']};"
-            f"SERVER={DB_CONFIG['server']};"
-            f"DATABASE={DB_CONFIG['database']};"
-            f"Trusted_Connection=yes;" # Menggunakan Windows Authentication
-        )
-        conn = pyodbc.connect(conn_str)
-        return conn
-    except Error as e:
-        print(f"Error connecting to SQL Server: {e}")
-        return None
-
-def execute_query(query, params=None, fetch=False):
-    """
-    Menjalankan query SQL dan mengembalikan hasil jika fetch=True.
-    """
-    conn = get_db_connection()
-    if conn is None:
-        return None
-
-    cursor = conn.cursor()
-    try:
-        cursor.execute(query, params or ())
-        if fetch:
-            columns = [column[0] for column in cursor.description]
-            results = []
-            for row in cursor.fetchall():
-                results.append(dict(zip(columns, row)))
-            return results
-        else:
-            conn.commit()
-            return True
-    except Error as e:
-        print(f"Database Error: {e}")
-        conn.rollback() # Rollback transaksi jika ada kesalahan
-        return None
-    finally:
-        cursor.close()
-        conn.close()
-
-def hash_password(password):
-    """
-    Menghash password menggunakan SHA256.
-    """
-    return hashlib.sha256(password.encode()).hexdigest()
-
-@app.route('/')
-def home():
-    return "Selamat datang di API Farhan Shop (SQL Server Windows Auth)!"
-
-@app.route('/register', methods=['POST'])
-def register():
-    """
-    Endpoint untuk registrasi user baru.
-    """
-    data = request.get_json()
-    username = data.get('username')
-    password = data.get('password')
-    email = data.get('email')
-
-    if not username or not password or not email:
-        return jsonify({'message': 'Username, password, dan email harus diisi'}), 400
-
-    hashed_password = hash_password(password)
-
-    user_exists = execute_query("SELECT id FROM users WHERE username = ? OR email = ?", (username, email), fetch=True)
-    if user_exists:
-        return jsonify({'message': 'Username atau email sudah terdaftar'}), 409
-
-    query = "INSERT INTO users (username, password, email) VALUES (?, ?, ?)"
-    if execute_query(query, (username, hashed_password, email)):
-        return jsonify({'message': 'Registrasi berhasil!'}), 201
-    return jsonify({'message': 'Registrasi gagal'}), 500
-
-@app.route('/login', methods=['POST'])
-def login():
-    """
-    Endpoint untuk login user.
-    """
-    data = request.get_json()
-    username = data.get('username')
-    password = data.get('password')
-
-    if not username or not password:
-        return jsonify({'message': 'Username dan password harus diisi'}), 400
-
-    query = "SELECT id, username, password FROM users WHERE username = ?"
-    user = execute_query(query, (username,), fetch=True)
-
-    if user and len(user) > 0:
-        user = user[0]
-        if user['password'] == hash_password(password):
-            token = jwt.encode({
-                'user_id': user['id'],
-                'username': user['username'],
-                'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-            }, app.config['SECRET_KEY'], algorithm='HS256')
-            return jsonify({'message': 'Login berhasil!', 'token': token, 'username': user['username']}), 200
-    return jsonify({'message': 'Username atau password salah'}), 401
-
-@app.route('/products', methods=['GET'])
-def get_products():
-    """
-    Endpoint untuk mendapatkan daftar produk.
-    """
-    query = "SELECT id, name, description, price, original_price, discount, image_url, stock FROM products"
-    products = execute_query(query, fetch=True)
-    if products is not None:
-        return jsonify(products), 200
-    return jsonify({'message': 'Gagal mengambil produk'}), 500
-
-@app.route('/add_to_cart', methods=['POST'])
-def add_to_cart():
-    """
-    Endpoint untuk menambahkan produk ke keranjang user.
-    Membutuhkan autentikasi token JWT.
-    """
-    auth_header = request.headers.get('Authorization')
-    if not auth_header:
-        return jsonify({'message': 'Token tidak tersedia'}), 401
-
-    try:
-        token = auth_header.split(" ")[1]
-        decoded_token = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        user_id = decoded_token['user_id']
-    except jwt.ExpiredSignatureError:
-        return jsonify({'message': 'Token kadaluarsa'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'message': 'Token tidak valid'}), 401
-
-    data = request.get_json()
-    product_id = data.get('product_id')
-    quantity = data.get('quantity', 1)
-
-    if not product_id or quantity < 1:
-        return jsonify({'message': 'ID produk dan kuantitas tidak valid'}), 400
-
-    product = execute_query("SELECT id, stock FROM products WHERE id = ?", (product_id,), fetch=True)
-    if not product or product[0]['stock'] < quantity:
-        return jsonify({'message': 'Produk tidak ditemukan atau stok tidak cukup'}), 404
-
-    cart_item = execute_query("SELECT id, quantity FROM carts WHERE user_id = ? AND product_id = ?", (user_id, product_id), fetch=True)
-
-    if cart_item:
-        new_quantity = cart_item[0]['quantity'] + quantity
-        execute_query("UPDATE carts SET quantity = ? WHERE id = ?", (new_quantity, cart_item[0]['id']))
-        return jsonify({'message': 'Kuantitas produk di keranjang diperbarui'}), 200
-    else:
-        query = "INSERT INTO carts (user_id, product_id, quantity) VALUES (?, ?, ?)"
-        if execute_query(query, (user_id, product_id, quantity)):
-            return jsonify({'message': 'Produk ditambahkan ke keranjang'}), 201
-    return jsonify({'message': 'Gagal menambahkan produk ke keranjang'}), 500
-
-
-@app.route('/cart', methods=['GET'])
-def get_cart():
-    """
-    Endpoint untuk mendapatkan item di keranjang user.
-    Membutuhkan autentikasi token JWT.
-    """
-    auth_header = request.headers.get('Authorization')
-    if not auth_header:
-        return jsonify({'message': 'Token tidak tersedia'}), 401
-
-    try:
-        token = auth_header.split(" ")[1]
-        decoded_token = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        user_id = decoded_token['user_id']
-    except jwt.ExpiredSignatureError:
-        return jsonify({'message': 'Token kadaluarsa'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'message': 'Token tidak valid'}), 401
-
-    query = """
-    SELECT c.product_id AS id, p.name, p.price, p.image_url, c.quantity
-    FROM carts c
-    JOIN products p ON c.product_id = p.id
-    WHERE c.user_id = ?
-    """
-    cart_items = execute_query(query, (user_id,), fetch=True)
-    if cart_items is not None:
-        return jsonify(cart_items), 200
-    return jsonify({'message': 'Gagal mengambil item keranjang'}), 500
-
-@app.route('/update_cart_quantity', methods=['POST'])
-def update_cart_quantity():
-    """
-    Endpoint untuk memperbarui kuantitas item di keranjang.
-    Membutuhkan autentikasi token JWT.
-    """
-    auth_header = request.headers.get('Authorization')
-    if not auth_header:
-        return jsonify({'message': 'Token tidak tersedia'}), 401
-
-    try:
-        token = auth_header.split(" ")[1]
-        decoded_token = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        user_id = decoded_token['user_id']
-    except jwt.ExpiredSignatureError:
-        return jsonify({'message': 'Token kadaluarsa'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'message': 'Token tidak valid'}), 401
-
-    data = request.get_json()
-    product_id = data.get('product_id')
-    quantity = data.get('quantity')
-
-    if not product_id or quantity is None or quantity < 0:
-        return jsonify({'message': 'ID produk dan kuantitas tidak valid'}), 400
-
-    if quantity == 0:
-        query = "DELETE FROM carts WHERE user_id = ? AND product_id = ?"
-        if execute_query(query, (user_id, product_id)):
-            return jsonify({'message': 'Item dihapus dari keranjang'}), 200
-        return jsonify({'message': 'Gagal menghapus item dari keranjang'}), 500
-    else:
-        query = "UPDATE carts SET quantity = ? WHERE user_id = ? AND product_id = ?"
-        if execute_query(query, (quantity, user_id, product_id)):
-            return jsonify({'message': 'Kuantitas keranjang diperbarui'}), 200
-        return jsonify({'message': 'Gagal memperbarui kuantitas keranjang'}), 500
-
-@app.route('/remove_from_cart', methods=['POST'])
-def remove_from_cart():
-    """
-    Endpoint untuk menghapus item dari keranjang.
-    Membutuhkan autentikasi token JWT.
-    """
-    auth_header = request.headers.get('Authorization')
-    if not auth_header:
-        return jsonify({'message': 'Token tidak tersedia'}), 401
-
-    try:
-        token = auth_header.split(" ")[1]
-        decoded_token = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        user_id = decoded_token['user_id']
-    except jwt.ExpiredSignatureError:
-        return jsonify({'message': 'Token kadaluarsa'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'message': 'Token tidak valid'}), 401
-
-    data = request.get_json()
-    product_id = data.get('product_id')
-
-    if not product_id:
-        return jsonify({'message': 'ID produk tidak valid'}), 400
-
-    query = "DELETE FROM carts WHERE user_id = ? AND product_id = ?"
-    if execute_query(query, (user_id, product_id)):
-        return jsonify({'message': 'Item berhasil dihapus dari keranjang'}), 200
-    return jsonify({'message': 'Gagal menghapus item dari keranjang'}), 500
-
-@app.route('/place_order', methods=['POST'])
-def place_order():
-    """
-    Endpoint untuk menempatkan pesanan dari keranjang.
-    Membutuhkan autentikasi token JWT.
-    """
-    auth_header = request.headers.get('Authorization')
-    if not auth_header:
-        return jsonify({'message': 'Token tidak tersedia'}), 401
-
-    try:
-        token = auth_header.split(" ")[1]
-        decoded_token = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-        user_id = decoded_token['user_id']
-    except jwt.ExpiredSignatureError:
-        return jsonify({'message': 'Token kadaluarsa'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'message': 'Token tidak valid'}), 401
-
-    data = request.get_json()
-    full_name = data.get('full_name')
-    address = data.get('address')
-    city = data.get('city')
-    zip_code = data.get('zip_code')
-    phone = data.get('phone')
-    email = data.get('email')
-    items = data.get('items')
-    total_amount = data.get('total_amount')
-
-    if not all([full_name, address, city, zip_code, phone, email, items, total_amount]):
-        return jsonify({'message': 'Semua detail pesanan harus diisi'}), 400
-    
-    if not items:
-        return jsonify({'message': 'Keranjang kosong, tidak ada item untuk dipesan'}), 400
-
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'message': 'Gagal terhubung ke database'}), 500
-
-    try:
-        cursor = conn.cursor()
-        insert_order_query = """
-        INSERT INTO orders (user_id, total_amount, full_name, address, city, zip_code, phone, email)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        cursor.execute(insert_order_query, (user_id, total_amount, full_name, address, city, zip_code, phone, email))
-        cursor.execute("SELECT SCOPE_IDENTITY() AS id")
-        order_id = cursor.fetchone()[0]
-
-        insert_order_item_query = """
-        INSERT INTO order_items (order_id, product_id, quantity, price_at_purchase)
-        VALUES (?, ?, ?, ?)
-        """
-        for item in items:
-            product_id = item['id']
-            quantity = item['quantity']
-            price_at_purchase = item['price']
-            cursor.execute(insert_order_item_query, (order_id, product_id, quantity, price_at_purchase))
-            
-            update_stock_query = "UPDATE products SET stock = stock - ? WHERE id = ?"
-            cursor.execute(update_stock_query, (quantity, product_id))
-
-        clear_cart_query = "DELETE FROM carts WHERE user_id = ?"
-        cursor.execute(clear_cart_query, (user_id,))
-
-        conn.commit()
-        return jsonify({'message': 'Pesanan berhasil ditempatkan!', 'order_id': order_id}), 201
-
-    except Error as e:
-        conn.rollback()
-        print(f"Database Error during order placement: {e}")
-        return jsonify({'message': f'Gagal menempatkan pesanan: {e}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
-
-if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+from flask import Flask, request, jsonify, g, has_request_context
+from flask_cors import CORS
+import jwt
+import datetime
+import os
+from db import DB_ERRORS, PoolTimeout, acquire_read, get_pool, mark_write, replica_stats, start_replica_sync, stop_replica_sync
+from catalog_cache import CatalogCache
+from catalog_query import ProductQuery, QueryError
+from search import SearchError, SearchIndex, parse_search_args
+from orders import OrderError, create_order, get_order, list_orders, normalize_items, parse_history_args
+from reservations import stock_reservations
+from jobs import job_queue
+from idempotency import IdempotencyError, fingerprint, idempotency_keys, validate_key
+import cart
+from auth import SharedRevocations, get_bearer_token, revoke_token, token_cache, token_required
+from passwords import LoginThrottle, PasswordHasher
+from metrics import init_metrics, metrics
+from responses import STREAM_BATCH_SIZE, FastJSONProvider, JsonArrayStream, compress, dumps, init_compression, negotiate_encoding
+from static_assets import AssetPathConverter, static_assets
+from ratelimit import init_rate_limit, rate_limiter
+
+app = Flask(__name__)
+app.url_map.converters['asset_path'] = AssetPathConverter # Harus terdaftar sebelum route dibuat
+app.json = FastJSONProvider(app) # Encoder ringkas (orjson jika terinstal) untuk semua jsonify
+CORS(app, expose_headers=['X-Cart-Version', 'Retry-After', 'X-RateLimit-Limit', 'X-RateLimit-Remaining']) # Mengizinkan CORS untuk frontend
+app.config['SECRET_KEY'] = 'your_secret_key_farhan_shop' # Ganti dengan kunci rahasia yang kuat
+app.config['TOKEN_CACHE_SIZE'] = 10000 # Jumlah token terverifikasi yang disimpan di cache
+app.config['TOKEN_REVOCATION_STORAGE'] = None # Path file SQLite agar logout berlaku di semua proses worker (None = per proses)
+app.config['CATALOG_CACHE_TTL'] = 60 # Detik sebelum katalog produk dimuat ulang dari database
+app.config['RESERVATION_TTL'] = 900 # Detik stok ditahan untuk item di keranjang sejak perubahan terakhir
+app.config['RESERVATION_SWEEP_INTERVAL'] = 30 # Detik antar sweep hold yang kedaluwarsa
+# Hash password; jalankan `python passwords.py --target-ms 250` untuk memilih biaya yang sesuai server
+app.config['PASSWORD_SCHEME'] = 'scrypt' # 'scrypt' atau 'pbkdf2_sha256'
+app.config['PASSWORD_SCRYPT_N'] = 2 ** 14
+app.config['PASSWORD_PBKDF2_ITERATIONS'] = 600000
+app.config['PASSWORD_MAX_CONCURRENCY'] = None # Maksimal hash bersamaan (default: jumlah core)
+app.config['LOGIN_MAX_FAILURES'] = 5 # Per username+IP dalam LOGIN_FAILURE_WINDOW
+app.config['LOGIN_MAX_FAILURES_PER_IP'] = 50
+app.config['LOGIN_FAILURE_WINDOW'] = 300 # Detik
+app.config['METRICS_ALLOWED_IPS'] = ('127.0.0.1', '::1') # IP yang boleh membaca /metrics tanpa token
+app.config['METRICS_TOKEN'] = None # Token Bearer untuk scraper /metrics dari IP lain (None = hanya METRICS_ALLOWED_IPS)
+app.config['SERVER_TIMING'] = False # True: header Server-Timing (waktu DB per request) di setiap respons
+app.config['PROFILE_SLOW_MS'] = None # Simpan profil cProfile untuk request yang lebih lambat dari ini (None = nonaktif)
+app.config['PROFILE_SAMPLE_RATE'] = 0.01 # Fraksi request yang diprofilkan saat profiler aktif
+app.config['PROFILE_DIR'] = 'profiles'
+app.config['COMPRESS_MIN_SIZE'] = 1024 # Respons JSON/teks di bawah ukuran ini (bytes) tidak dikompres
+app.config['COMPRESS_LEVEL'] = 6 # Level gzip / kualitas brotli untuk respons dinamis
+app.config['JOB_WORKERS'] = 4 # Thread worker job background per proses
+app.config['JOB_POLL_INTERVAL'] = 1.0 # Detik antar pengecekan tabel jobs saat antrean kosong
+app.config['JOB_MAX_ATTEMPTS'] = 5 # Percobaan sebelum job ditandai 'failed'
+app.config['JOB_RETENTION'] = 7 * 24 * 3600 # Detik job selesai disimpan sebelum dihapus
+app.config['LOW_STOCK_THRESHOLD'] = 5 # Stok bebas di bawah/sama dengan ini memicu peringatan setelah checkout
+app.config['IDEMPOTENCY_KEY_TTL'] = 24 * 3600 # Detik Idempotency-Key /place_order diingat
+app.config['IDEMPOTENCY_CACHE_SIZE'] = 10000 # Hasil Idempotency-Key yang disimpan di memori (LRU)
+app.config['STATIC_BUILD_DIR'] = os.path.join(app.root_path, 'build', 'static') # Hasil build aset frontend (ber-hash)
+app.config['STATIC_BUILD_ON_STARTUP'] = True # False jika `python static_assets.py build` dijalankan saat deploy
+app.config['STATIC_IMAGE_WIDTHS'] = (300, 600) # Lebar varian gambar kecil (butuh Pillow)
+# Rate limit per user (atau IP jika tanpa token) per endpoint: (request per detik, burst); None = tidak dibatasi
+app.config['RATE_LIMIT_ENABLED'] = True
+app.config['RATE_LIMITS'] = {
+    'default': (20, 40),
+    'get_products': (10, 30),
+    'search_products': (10, 30), # Typeahead: satu request per ketikan
+    'add_to_cart': (5, 20),
+    'update_cart_quantity': (5, 20),
+    'remove_from_cart': (5, 20),
+    'batch_update_cart': (5, 20),
+    'place_order': (0.5, 5),
+    'register': (0.1, 5),
+    'login': (1, 10), # Percobaan gagal dibatasi terpisah oleh LoginThrottle
+    'home': None, 'page': None, 'asset': None, 'source_asset': None, # Aset statis
+    'prometheus_metrics': (1, 10), # Render menjalankan semua collector
+}
+app.config['RATE_LIMIT_GLOBAL'] = None # (request per detik, burst) untuk seluruh klien bersama
+app.config['RATE_LIMIT_STORAGE'] = None # Path file SQLite agar bucket dibagi antar proses worker (None = per proses)
+
+# Konfigurasi Database SQL Server untuk Windows Authentication
+DB_CONFIG = {
+    'backend': 'mssql', # 'mssql' untuk SQL Server, 'sqlite' untuk pengganti lokal (tes/benchmark)
+    'server': 'LAPTOP-DU6E16BV', # Ganti dengan nama server SQL Server Anda
+    'database': 'FarhanShopDB', # Ganti dengan nama database Anda (path file untuk SQLite)
+    'driver': '{ODBC Driver 17 for SQL Server}', # Sesuaikan dengan driver ODBC yang terinstal
+    # Tidak perlu 'username' dan 'password' karena menggunakan Windows Authentication
+    'pool_size': 10, # Jumlah maksimal koneksi terbuka per proses
+    'pool_timeout': 5.0, # Detik menunggu koneksi bebas sebelum menyerah
+    'pool_max_idle': 300.0, # Koneksi idle lebih lama dari ini ditutup
+    'pool_health_check_interval': 30.0, # Koneksi idle lebih lama dari ini dicek dengan SELECT 1
+    'statement_cache_size': 128, # Statement yang di-cache per koneksi (lihat PooledConnection.prepared)
+    # Read replica untuk query baca; tiap entri menimpa kunci di atas, misalnya {'server': 'REPLICA-1'}
+    # atau {'database': 'replica1.db'} untuk SQLite (disalin dari primary setiap replica_sync_interval detik)
+    'replicas': [],
+    'replica_sticky_seconds': 5.0, # Setelah user menulis, query bacanya tetap ke primary selama ini
+    'replica_sync_interval': 1.0 # Hanya SQLite: jeda penyalinan primary ke file replica
+}
+
+def get_db_connection(read_only=False, writes=False):
+    """
+    Mengambil koneksi database dari connection pool.
+    read_only=True mengambil koneksi read replica (jika dikonfigurasi), kecuali user request
+    ini baru saja menulis. writes=True menandai bahwa koneksi dipakai untuk menulis data user
+    request ini, sehingga query bacanya berikutnya diarahkan ke primary (read-your-writes).
+    Panggil close() pada koneksi untuk mengembalikannya ke pool.
+    """
+    user_id = g.get('user_id') if has_request_context() else None
+    try:
+        if read_only:
+            return acquire_read(DB_CONFIG, user_id)
+        if writes and user_id is not None:
+            mark_write(DB_CONFIG, user_id)
+        return get_pool(DB_CONFIG).acquire()
+    except PoolTimeout as e:
+        print(f"Connection pool habis: {e}")
+        return None
+    except (DB_ERRORS + (RuntimeError,)) as e:
+        print(f"Error connecting to database: {e}")
+        return None
+
+def get_db_backend():
+    """
+    Mengembalikan backend database aktif (dipakai untuk SQL yang berbeda per dialek).
+    """
+    return get_pool(DB_CONFIG).backend
+
+def execute_query(query, params=None, fetch=False, primary=False):
+    """
+    Menjalankan query SQL dan mengembalikan hasil jika fetch=True.
+    Query fetch dibaca dari read replica kecuali primary=True (data yang harus selalu terbaru).
+    """
+    conn = get_db_connection(read_only=fetch and not primary, writes=not fetch)
+    if conn is None:
+        return None
+
+    cursor = conn.prepared(query)
+    try:
+        cursor.execute(query, params or ())
+        if fetch:
+            columns = [column[0] for column in cursor.description]
+            results = []
+            for row in cursor.fetchall():
+                results.append(dict(zip(columns, row)))
+            return results
+        else:
+            conn.commit()
+            return True
+    except DB_ERRORS as e:
+        print(f"Database Error: {e}")
+        try:
+            conn.rollback() # Rollback transaksi jika ada kesalahan
+        except DB_ERRORS:
+            conn.invalidate() # Koneksi rusak, jangan dikembalikan ke pool
+        return None
+    finally:
+        conn.close() # Cursor milik cache statement koneksi, tidak ditutup
+
+def run_transaction(work, writes=True):
+    """
+    Menjalankan work(conn, cursor) dalam satu transaksi pada satu koneksi (selalu di primary).
+    writes=False untuk pembacaan yang harus konsisten tanpa menulis (lihat get_db_connection).
+    Mengembalikan (True, hasil) jika berhasil di-commit, atau (False, None) jika gagal.
+    """
+    conn = get_db_connection(writes=writes)
+    if conn is None:
+        return False, None
+
+    cursor = conn.cursor()
+    try:
+        result = work(conn, cursor)
+        conn.commit()
+        return True, result
+    except DB_ERRORS as e:
+        print(f"Database Error: {e}")
+        try:
+            conn.rollback()
+        except DB_ERRORS:
+            conn.invalidate()
+        return False, None
+    finally:
+        cursor.close()
+        conn.close()
+
+def stream_products(product_query):
+    """
+    Mengembalikan JsonArrayStream untuk daftar produk tanpa limit. Baris diambil per potongan
+    keyset (STREAM_BATCH_SIZE baris, satu query dan satu koneksi per potongan), jadi koneksi
+    tidak dipegang selama klien lambat mengunduh. None jika potongan pertama gagal diambil.
+    """
+    product_query.paginated = True
+    product_query.limit = STREAM_BATCH_SIZE
+    backend = get_db_backend()
+
+    def fetch():
+        query, params = product_query.build(backend)
+        return execute_query(query, params, fetch=True)
+
+    def pages(rows):
+        while True:
+            yield rows[:STREAM_BATCH_SIZE]
+            if len(rows) <= STREAM_BATCH_SIZE:
+                return
+            product_query.seek(rows[STREAM_BATCH_SIZE - 1])
+            rows = fetch()
+            if rows is None:
+                # Status 200 sudah terkirim: putuskan respons agar klien tidak menerima array yang tampak lengkap
+                raise RuntimeError("Gagal mengambil potongan produk berikutnya")
+
+    rows = fetch()
+    if rows is None:
+        return None
+    return JsonArrayStream(pages(rows))
+
+def load_catalog():
+    """
+    Memuat seluruh katalog produk dari database (dipakai oleh catalog_cache).
+    """
+    query = "SELECT id, name, description, price, original_price, discount, image_url, stock FROM products"
+    # Dari primary: snapshot di-cache selama CATALOG_CACHE_TTL, jadi tidak boleh tertinggal dari replica
+    return execute_query(query, fetch=True, primary=True)
+
+token_cache.maxsize = app.config['TOKEN_CACHE_SIZE']
+if app.config['TOKEN_REVOCATION_STORAGE']:
+    token_cache.shared = SharedRevocations(app.config['TOKEN_REVOCATION_STORAGE'])
+stock_reservations.ttl = app.config['RESERVATION_TTL']
+stock_reservations.sweep_interval = app.config['RESERVATION_SWEEP_INTERVAL']
+job_queue.workers = app.config['JOB_WORKERS']
+job_queue.poll_interval = app.config['JOB_POLL_INTERVAL']
+job_queue.max_attempts = app.config['JOB_MAX_ATTEMPTS']
+job_queue.retention = app.config['JOB_RETENTION']
+job_queue.maintenance.append(idempotency_keys.purge)
+idempotency_keys.ttl = app.config['IDEMPOTENCY_KEY_TTL']
+idempotency_keys.maxsize = app.config['IDEMPOTENCY_CACHE_SIZE']
+static_assets.source_dir = app.root_path
+static_assets.output_dir = app.config['STATIC_BUILD_DIR']
+static_assets.build_on_startup = app.config['STATIC_BUILD_ON_STARTUP']
+static_assets.image_widths = app.config['STATIC_IMAGE_WIDTHS']
+password_hasher = PasswordHasher(
+    scheme=app.config['PASSWORD_SCHEME'],
+    scrypt_n=app.config['PASSWORD_SCRYPT_N'],
+    pbkdf2_iterations=app.config['PASSWORD_PBKDF2_ITERATIONS'],
+    max_concurrency=app.config['PASSWORD_MAX_CONCURRENCY']
+)
+login_throttle = LoginThrottle(
+    max_failures=app.config['LOGIN_MAX_FAILURES'],
+    max_failures_per_ip=app.config['LOGIN_MAX_FAILURES_PER_IP'],
+    window=app.config['LOGIN_FAILURE_WINDOW']
+)
+# Body katalog dikompres sekali per snapshot dengan level maksimum, lalu dipakai ulang
+catalog_cache = CatalogCache(load_catalog, dumps, ttl=app.config['CATALOG_CACHE_TTL'],
+                             compressor=lambda body, encoding: compress(body, encoding, level=9))
+
+def invalidate_catalog():
+    """
+    Menandai katalog berubah (stok atau data produk). Panggil setelah setiap penulisan ke tabel products.
+    """
+    catalog_cache.invalidate()
+
+def start_background_tasks():
+    """
+    Menjalankan tugas background per proses (sweeper hold stok, worker job). Dipanggil saat server start.
+    """
+    stock_reservations.start_sweeper(get_db_connection, on_change=invalidate_catalog)
+    job_queue.start(get_db_connection)
+    start_replica_sync(DB_CONFIG)
+
+def stop_background_tasks():
+    stock_reservations.stop_sweeper()
+    job_queue.stop()
+    stop_replica_sync()
+
+@job_queue.handler('order_placed')
+def order_placed_job(payload):
+    """
+    Pekerjaan setelah checkout yang tidak perlu ditunggu pembeli: peringatan stok menipis.
+    """
+    low_stock = execute_query(
+        "SELECT p.id, p.name, p.stock - p.reserved AS available FROM order_items oi "
+        "JOIN products p ON p.id = oi.product_id WHERE oi.order_id = ? AND p.stock - p.reserved <= ?",
+        (payload['order_id'], app.config['LOW_STOCK_THRESHOLD']), fetch=True, primary=True
+    )
+    if low_stock is None:
+        raise RuntimeError("Gagal memeriksa stok pesanan") # Dicoba ulang dengan backoff
+    for product in low_stock:
+        print(f"Stok menipis: {product['name']} ({product['id']}) tersisa {product['available']}")
+
+search_index = SearchIndex()
+
+def sync_search_index():
+    """
+    Menyamakan index pencarian dengan snapshot katalog terbaru (hanya produk yang berubah diindeks ulang).
+    Mengembalikan snapshot katalog, atau None jika katalog gagal dimuat.
+    """
+    catalog = catalog_cache.get()
+    if catalog is not None:
+        search_index.sync(catalog.products, catalog.version)
+    return catalog
+
+init_metrics(app)
+init_compression(app)
+init_rate_limit(app, rate_limiter)
+metrics.collectors['db_pool'] = lambda: get_pool(DB_CONFIG).stats()
+metrics.collectors['auth'] = token_cache.stats
+metrics.collectors['catalog'] = lambda: {'version': catalog_cache.version}
+metrics.collectors['search'] = search_index.stats
+metrics.collectors['reservations'] = stock_reservations.stats
+metrics.collectors['static'] = static_assets.stats
+metrics.collectors['jobs'] = job_queue.stats
+metrics.collectors['idempotency'] = idempotency_keys.stats
+metrics.collectors['db_replicas'] = lambda: replica_stats(DB_CONFIG)
+metrics.collectors['ratelimit'] = rate_limiter.stats
+
+def hash_password(password):
+    """
+    Menghash password dengan KDF yang dikonfigurasi (lihat passwords.PasswordHasher).
+    """
+    return password_hasher.hash(password)
+
+@app.route('/')
+def home():
+    return "Selamat datang di API Farhan Shop (SQL Server Windows Auth)!"
+
+@app.route('/<page>.html')
+def page(page):
+    """
+    Halaman frontend dengan rujukan CSS/JS/gambar yang sudah ditulis ulang ke URL ber-hash.
+    """
+    return static_assets.send_page(f'{page}.html')
+
+@app.route('/assets/<name>')
+def asset(name):
+    """
+    Aset ber-hash (immutable, Cache-Control satu tahun).
+    """
+    return static_assets.send_asset(name)
+
+@app.route('/<asset_path:path>')
+def source_asset(path):
+    """
+    Aset lewat path aslinya, misalnya images/product-1.jpg dari image_url produk (?w=300 untuk varian kecil).
+    """
+    return static_assets.send_source(path)
+
+@app.route('/register', methods=['POST'])
+def register():
+    """
+    Endpoint untuk registrasi user baru.
+    """
+    data = request.get_json(silent=True)
+    data = data if isinstance(data, dict) else {}
+    username = data.get('username')
+    password = data.get('password')
+    email = data.get('email')
+
+    if not all(isinstance(value, str) and value for value in (username, password, email)):
+        return jsonify({'message': 'Username, password, dan email harus diisi'}), 400
+
+    user_exists = execute_query("SELECT id FROM users WHERE username = ? OR email = ?", (username, email),
+                                fetch=True, primary=True)
+    if user_exists:
+        return jsonify({'message': 'Username atau email sudah terdaftar'}), 409
+
+    hashed_password = hash_password(password)
+    query = "INSERT INTO users (username, password, email) VALUES (?, ?, ?)"
+    if execute_query(query, (username, hashed_password, email)):
+        return jsonify({'message': 'Registrasi berhasil!'}), 201
+    return jsonify({'message': 'Registrasi gagal'}), 500
+
+@app.route('/login', methods=['POST'])
+def login():
+    """
+    Endpoint untuk login user.
+    """
+    data = request.get_json(silent=True)
+    data = data if isinstance(data, dict) else {}
+    username = data.get('username')
+    password = data.get('password')
+
+    # Ditolak sebelum LoginThrottle dan hasher, yang mengharapkan teks
+    if not isinstance(username, str) or not isinstance(password, str) or not username or not password:
+        return jsonify({'message': 'Username dan password harus diisi'}), 400
+
+    # Percobaan yang diblokir ditolak sebelum password di-hash
+    client_ip = request.remote_addr or ''
+    retry_after = login_throttle.retry_after(username, client_ip)
+    if retry_after:
+        response = jsonify({'message': 'Terlalu banyak percobaan login, coba lagi nanti'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+
+    query = "SELECT id, username, password FROM users WHERE username = ?"
+    user = execute_query(query, (username,), fetch=True, primary=True)
+
+    if not user:
+        password_hasher.dummy_verify(password) # Samakan waktu respons dengan username yang ada
+    else:
+        user = user[0]
+        if password_hasher.verify(password, user['password']):
+            login_throttle.reset(username, client_ip)
+            if password_hasher.needs_rehash(user['password']):
+                # Hash lama (SHA256 atau parameter lama) diganti dengan parameter saat ini
+                execute_query("UPDATE users SET password = ? WHERE id = ?", (hash_password(password), user['id']))
+            token = jwt.encode({
+                'user_id': user['id'],
+                'username': user['username'],
+                'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
+            }, app.config['SECRET_KEY'], algorithm='HS256')
+            return jsonify({'message': 'Login berhasil!', 'token': token, 'username': user['username']}), 200
+    login_throttle.record_failure(username, client_ip)
+    return jsonify({'message': 'Username atau password salah'}), 401
+
+@app.route('/logout', methods=['POST'])
+@token_required
+def logout():
+    """
+    Endpoint untuk logout: token yang dipakai dicabut sampai waktu kadaluarsanya.
+    Membutuhkan autentikasi token JWT.
+    """
+    if not revoke_token(get_bearer_token()):
+        return jsonify({'message': 'Gagal logout, coba lagi'}), 500
+    return jsonify({'message': 'Logout berhasil'}), 200
+
+@app.route('/products', methods=['GET'])
+def get_products():
+    """
+    Endpoint untuk mendapatkan daftar produk.
+
+    Tanpa parameter, katalog lengkap dilayani dari catalog_cache dengan ETag/Last-Modified
+    (mendukung If-None-Match -> 304).
+
+    Parameter opsional:
+    - min_price, max_price, discounted=1, in_stock=1: filter
+    - sort: id (default), price_asc, price_desc, name, discount
+    - limit, cursor: paginasi keyset; respons menjadi {'items': [...], 'next_cursor': ...}
+    """
+    try:
+        product_query = ProductQuery(request.args)
+    except QueryError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if not product_query.is_default:
+        if not product_query.paginated:
+            # Daftar tanpa limit bisa sangat besar: kirim per potongan tanpa memuat semuanya
+            stream = stream_products(product_query)
+            if stream is None:
+                return jsonify({'message': 'Gagal mengambil produk'}), 500
+            return app.response_class(stream, mimetype='application/json')
+        query, params = product_query.build(get_db_backend())
+        products = execute_query(query, params, fetch=True)
+        if products is None:
+            return jsonify({'message': 'Gagal mengambil produk'}), 500
+        items, next_cursor = product_query.page(products)
+        return jsonify({'items': items, 'next_cursor': next_cursor}), 200
+
+    catalog = catalog_cache.get()
+    if catalog is None:
+        return jsonify({'message': 'Gagal mengambil produk'}), 500
+
+    encoding = negotiate_encoding()
+    response = app.response_class(catalog.encoded(encoding), mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(catalog.etag if encoding is None else f"{catalog.etag}-{encoding}")
+    response.last_modified = catalog.last_modified
+    response.cache_control.no_cache = True # Browser wajib revalidasi, tapi cukup dengan 304
+    return response.make_conditional(request)
+
+@app.route('/products/search', methods=['GET'])
+def search_products():
+    """
+    Endpoint pencarian produk berdasarkan nama dan deskripsi (dari index di memori).
+
+    Parameter:
+    - q: kata kunci; kata terakhir juga dicocokkan sebagai awalan (autocomplete)
+    - limit: jumlah hasil (default 10, maksimal 50)
+    """
+    try:
+        query, limit = parse_search_args(request.args)
+    except SearchError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if sync_search_index() is None:
+        return jsonify({'message': 'Gagal mengambil produk'}), 500
+    items, total = search_index.search(query, limit)
+    return jsonify({'query': query, 'items': items, 'total': total}), 200
+
+@app.route('/add_to_cart', methods=['POST'])
+@token_required
+def add_to_cart():
+    """
+    Endpoint untuk menambahkan produk ke keranjang user.
+    Membutuhkan autentikasi token JWT.
+    """
+    user_id = g.user_id
+
+    data = request.get_json()
+    product_id = data.get('product_id')
+    quantity = data.get('quantity', 1)
+
+    if not product_id or quantity < 1:
+        return jsonify({'message': 'ID produk dan kuantitas tidak valid'}), 400
+
+    # Satu upsert atomik: validasi stok + insert/update baris keranjang
+    ok, action = run_transaction(
+        lambda conn, cursor: cart.add_item(cursor, conn.backend, user_id, product_id, quantity)
+    )
+    if not ok:
+        return jsonify({'message': 'Gagal menambahkan produk ke keranjang'}), 500
+    if action is None:
+        return jsonify({'message': 'Produk tidak ditemukan atau stok tidak cukup'}), 404
+    if action == 'updated':
+        return jsonify({'message': 'Kuantitas produk di keranjang diperbarui'}), 200
+    return jsonify({'message': 'Produk ditambahkan ke keranjang'}), 201
+
+
+@app.route('/cart', methods=['GET'])
+@token_required
+def get_cart():
+    """
+    Endpoint untuk mendapatkan item di keranjang user.
+    Membutuhkan autentikasi token JWT.
+    """
+    user_id = g.user_id
+
+    cart_items = execute_query(cart.CART_ITEMS_QUERY, (user_id,), fetch=True)
+    if cart_items is not None:
+        response = jsonify(cart_items)
+        # Versi dipakai klien sebagai dasar /cart/batch
+        response.headers['X-Cart-Version'] = cart.cart_version({item['id']: item['quantity'] for item in cart_items})
+        return response, 200
+    return jsonify({'message': 'Gagal mengambil item keranjang'}), 500
+
+@app.route('/update_cart_quantity', methods=['POST'])
+@token_required
+def update_cart_quantity():
+    """
+    Endpoint untuk memperbarui kuantitas item di keranjang.
+    Membutuhkan autentikasi token JWT.
+    """
+    user_id = g.user_id
+
+    data = request.get_json()
+    product_id = data.get('product_id')
+    quantity = data.get('quantity')
+
+    if not product_id or quantity is None or quantity < 0:
+        return jsonify({'message': 'ID produk dan kuantitas tidak valid'}), 400
+
+    if quantity == 0:
+        ok, _ = run_transaction(lambda conn, cursor: cart.remove_item(cursor, conn.backend, user_id, product_id))
+        if ok:
+            return jsonify({'message': 'Item dihapus dari keranjang'}), 200
+        return jsonify({'message': 'Gagal menghapus item dari keranjang'}), 500
+    else:
+        ok, result = run_transaction(
+            lambda conn, cursor: cart.update_item(cursor, conn.backend, user_id, product_id, quantity)
+        )
+        if not ok:
+            return jsonify({'message': 'Gagal memperbarui kuantitas keranjang'}), 500
+        if result == 'missing':
+            return jsonify({'message': 'Item tidak ada di keranjang'}), 404
+        if result is None:
+            return jsonify({'message': 'Produk tidak ditemukan atau stok tidak cukup'}), 404
+        return jsonify({'message': 'Kuantitas keranjang diperbarui'}), 200
+
+@app.route('/remove_from_cart', methods=['POST'])
+@token_required
+def remove_from_cart():
+    """
+    Endpoint untuk menghapus item dari keranjang.
+    Membutuhkan autentikasi token JWT.
+    """
+    user_id = g.user_id
+
+    data = request.get_json()
+    product_id = data.get('product_id')
+
+    if not product_id:
+        return jsonify({'message': 'ID produk tidak valid'}), 400
+
+    ok, _ = run_transaction(lambda conn, cursor: cart.remove_item(cursor, conn.backend, user_id, product_id))
+    if ok:
+        return jsonify({'message': 'Item berhasil dihapus dari keranjang'}), 200
+    return jsonify({'message': 'Gagal menghapus item dari keranjang'}), 500
+
+@app.route('/cart/batch', methods=['POST'])
+@token_required
+def batch_update_cart():
+    """
+    Endpoint untuk menerapkan banyak perubahan keranjang dalam satu request dan satu transaksi.
+    Menerima daftar operasi add/set/remove atau keadaan akhir keranjang ('items'),
+    opsional dengan 'version' dari respons sebelumnya. Mengembalikan keranjang baru.
+    Membutuhkan autentikasi token JWT.
+    """
+    user_id = g.user_id
+
+    try:
+        operations, desired, version = cart.parse_batch(request.get_json(silent=True))
+    except cart.CartError as e:
+        return jsonify({'message': str(e), **e.details}), e.status
+
+    conn = get_db_connection(writes=True)
+    if conn is None:
+        return jsonify({'message': 'Gagal terhubung ke database'}), 500
+
+    try:
+        items, new_version = cart.apply_batch(conn, user_id, operations, desired, version)
+        return jsonify({'message': 'Keranjang diperbarui', 'items': items, 'version': new_version}), 200
+    except cart.CartError as e:
+        return jsonify({'message': str(e), **e.details}), e.status
+    except DB_ERRORS as e:
+        conn.rollback()
+        print(f"Database Error during cart batch: {e}")
+        return jsonify({'message': 'Gagal memperbarui keranjang'}), 500
+    finally:
+        conn.close()
+
+def submit_order(user_id, shipping, lines, idempotency=None):
+    """
+    Membuat pesanan dan menyusun body respons JSON-nya. Mengembalikan ((status, body), stored);
+    stored=True jika hasil dicatat untuk `idempotency` = (key, request_hash) di transaksi pesanan.
+    """
+    conn = get_db_connection(writes=True)
+    if conn is None:
+        return (500, dumps({'message': 'Gagal terhubung ke database'})), False
+
+    created = {}
+
+    def on_created(cursor, order_id, total_amount):
+        created['body'] = dumps({'message': 'Pesanan berhasil ditempatkan!', 'order_id': order_id,
+                                 'total_amount': total_amount})
+        if idempotency is not None:
+            idempotency_keys.record(cursor, user_id, idempotency[0], idempotency[1], 201, created['body'])
+
+    try:
+        create_order(conn, user_id, shipping, lines, on_created=on_created)
+        invalidate_catalog() # Stok berubah
+        return (201, created['body']), idempotency is not None
+    except OrderError as e:
+        response = {'message': str(e)}
+        if e.details:
+            response.update(e.details)
+        return (e.status, dumps(response)), False
+    except DB_ERRORS as e:
+        conn.rollback()
+        print(f"Database Error during order placement: {e}")
+        return (500, dumps({'message': f'Gagal menempatkan pesanan: {e}'})), False
+    finally:
+        conn.close()
+
+@app.route('/place_order', methods=['POST'])
+@token_required
+def place_order():
+    """
+    Endpoint untuk menempatkan pesanan dari keranjang.
+    Membutuhkan autentikasi token JWT.
+
+    Header opsional Idempotency-Key: retry dengan key dan isi yang sama mengembalikan hasil
+    pesanan pertama (dengan header Idempotent-Replayed: true) tanpa membuat pesanan baru.
+    """
+    user_id = g.user_id
+
+    data = request.get_json()
+    shipping = {field: data.get(field) for field in ('full_name', 'address', 'city', 'zip_code', 'phone', 'email')}
+    items = data.get('items')
+
+    # total_amount dan harga dari klien diabaikan; total dihitung dari tabel products
+    if not all(shipping.values()) or not items:
+        return jsonify({'message': 'Semua detail pesanan harus diisi'}), 400
+
+    try:
+        lines = normalize_items(items)
+    except OrderError as e:
+        return jsonify({'message': str(e)}), e.status
+
+    key = request.headers.get('Idempotency-Key')
+    replayed = False
+    if key is None:
+        (status, body), _ = submit_order(user_id, shipping, lines)
+    else:
+        try:
+            validate_key(key)
+            request_hash = fingerprint({'shipping': shipping, 'lines': lines})
+            (status, body), replayed = idempotency_keys.run(
+                user_id, key, request_hash,
+                lookup=lambda: run_transaction(lambda conn, cursor: idempotency_keys.lookup(cursor, user_id, key),
+                                              writes=False)[1],
+                execute=lambda: submit_order(user_id, shipping, lines, (key, request_hash))
+            )
+        except IdempotencyError as e:
+            return jsonify({'message': str(e)}), e.status
+
+    response = app.response_class(body, status, mimetype='application/json')
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+@app.route('/orders', methods=['GET'])
+@token_required
+def get_orders():
+    """
+    Endpoint riwayat pesanan user, terbaru dulu, beserta baris pesanannya.
+    Membutuhkan autentikasi token JWT.
+
+    Parameter opsional:
+    - limit: jumlah pesanan per halaman (default 10, maksimal 50)
+    - cursor: next_cursor dari halaman sebelumnya
+    - lines=0: hanya ringkasan tanpa baris pesanan
+    """
+    user_id = g.user_id
+
+    try:
+        limit, after, with_lines = parse_history_args(request.args)
+    except OrderError as e:
+        return jsonify({'message': str(e)}), e.status
+
+    ok, result = run_transaction(
+        lambda conn, cursor: list_orders(cursor, conn.backend, user_id, limit, after, with_lines), writes=False
+    )
+    if not ok:
+        return jsonify({'message': 'Gagal mengambil riwayat pesanan'}), 500
+    orders, next_cursor = result
+    return jsonify({'items': orders, 'next_cursor': next_cursor}), 200
+
+@app.route('/orders/<int:order_id>', methods=['GET'])
+@token_required
+def get_order_detail(order_id):
+    """
+    Endpoint detail satu pesanan milik user.
+    Membutuhkan autentikasi token JWT.
+    """
+    user_id = g.user_id
+
+    ok, order = run_transaction(lambda conn, cursor: get_order(cursor, user_id, order_id), writes=False)
+    if not ok:
+        return jsonify({'message': 'Gagal mengambil pesanan'}), 500
+    if order is None:
+        return jsonify({'message': 'Pesanan tidak ditemukan'}), 404
+    return jsonify(order), 200
+
+if __name__ == '__main__':
+    start_background_tasks()
+    app.run(debug=True, port=5000)
@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, DB_CONFIG, start_background_tasks, stop_background_tasks, sync_search_index
+from auth import SharedRevocations, token_cache
+from db import close_pool, get_pool
+from ratelimit import SharedStore, rate_limiter
+from static_assets import static_assets
+
+# Jumlah thread per proses yang menjalankan handler Flask (dan query database yang blocking)
+THREADS = int(os.environ.get('ASGI_THREADS', DB_CONFIG.get('pool_size', 10)))
+# Detik menunggu request yang sedang berjalan saat server dimatikan
+SHUTDOWN_TIMEOUT = float(os.environ.get('ASGI_SHUTDOWN_TIMEOUT', 30))
+# Jumlah proses worker; dengan lebih dari satu, rate limit dan logout dibagi lewat file SQLite
+WORKERS = int(os.environ.get('ASGI_WORKERS', 1))
+# Direktori file bersama jika RATE_LIMIT_STORAGE / TOKEN_REVOCATION_STORAGE tidak diatur
+SHARED_STATE_DIR = os.environ.get('ASGI_SHARED_STATE_DIR', os.path.join(tempfile.gettempdir(), 'farhan-shop'))
+
+# State yang tetap per proses walaupun ada beberapa worker (lihat README)
+PER_PROCESS_STATE = (
+    "cache katalog: perubahan stok/harga dari worker lain terlihat setelah CATALOG_CACHE_TTL",
+    "LoginThrottle: batas login gagal berlaku per worker (efektif x jumlah worker)",
+    "Idempotency-Key: duplikat bersamaan di worker berbeda tidak digabung, tapi tetap ditolak oleh tabel",
+    "read replica: read-your-writes hanya di worker yang menerima penulisan",
+)
+
+
+class WsgiToAsgi:
+    """
+    Adaptor ASGI untuk aplikasi WSGI Flask.
+
+    Event loop hanya menangani I/O jaringan; handler Flask beserta panggilan pyodbc/sqlite
+    yang blocking dijalankan di ThreadPoolExecutor berukuran tetap, sehingga satu proses
+    bisa menahan banyak koneksi klien sementara jumlah query bersamaan tetap dibatasi.
+    Body respons dikirim per potongan, jadi respons streaming tetap streaming.
+    """
+
+    def __init__(self, wsgi_app, threads=THREADS, shutdown_timeout=SHUTDOWN_TIMEOUT):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.shutdown_timeout = shutdown_timeout
+        self.executor = None
+        self._in_flight = 0
+        self._idle = None
+        self._shutting_down = False
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise RuntimeError(f"Tipe scope ASGI tidak didukung: {scope['type']}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    self._start()
+                    if DB_CONFIG.get('pool_size', 10) < self.threads:
+                        print(f"Peringatan: pool_size ({DB_CONFIG.get('pool_size', 10)}) lebih kecil dari "
+                              f"jumlah thread ({self.threads}); request akan menunggu koneksi")
+                    # Buka satu koneksi lebih awal agar kesalahan konfigurasi langsung terlihat
+                    await asyncio.get_running_loop().run_in_executor(self.executor, _warm_up_pool)
+                    start_background_tasks()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self._shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _start(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='wsgi')
+            self._idle = asyncio.Event()
+            self._idle.set()
+
+    async def _shutdown(self):
+        """
+        Graceful shutdown: tolak request baru, tunggu request berjalan, lalu tutup pool database.
+        """
+        self._shutting_down = True
+        if self._idle is not None:
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.shutdown_timeout)
+            except asyncio.TimeoutError:
+                print(f"Shutdown: {self._in_flight} request masih berjalan setelah {self.shutdown_timeout} detik")
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        stop_background_tasks()
+        close_pool()
+
+    async def _http(self, scope, receive, send):
+        if self._shutting_down:
+            await _send_plain(send, 503, b'Server sedang dimatikan')
+            return
+        self._start() # Server tanpa lifespan
+        loop = asyncio.get_running_loop()
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            body.extend(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            environ = _build_environ(scope, bytes(body))
+            response_start = {}
+
+            def start_response(status, headers, exc_info=None):
+                response_start['status'] = int(status.split(' ', 1)[0])
+                response_start['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                             for name, value in headers]
+
+            iterator = await loop.run_in_executor(self.executor, _start_app, self.wsgi_app, environ, start_response)
+            try:
+                await send({'type': 'http.response.start', 'status': response_start['status'],
+                            'headers': response_start['headers']})
+                while True:
+                    chunk = await loop.run_in_executor(self.executor, next, iterator, None)
+                    if chunk is None:
+                        break
+                    if chunk:
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                await send({'type': 'http.response.body', 'body': b''})
+            finally:
+                close = getattr(iterator, 'close', None)
+                if close is not None:
+                    await loop.run_in_executor(self.executor, close)
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
+
+def use_shared_state(workers):
+    """
+    Dengan lebih dari satu proses worker, bucket rate limit dan token yang dicabut wajib dibagi:
+    dipakai RATE_LIMIT_STORAGE / TOKEN_REVOCATION_STORAGE jika diatur, selain itu file di SHARED_STATE_DIR.
+    Dipanggil di setiap proses worker saat modul ini diimpor.
+    """
+    if workers <= 1:
+        return
+    os.makedirs(SHARED_STATE_DIR, exist_ok=True)
+    if not isinstance(rate_limiter.store, SharedStore):
+        app.config['RATE_LIMIT_STORAGE'] = os.path.join(SHARED_STATE_DIR, 'ratelimit.db')
+        rate_limiter.store = SharedStore(app.config['RATE_LIMIT_STORAGE'])
+    if token_cache.shared is None:
+        app.config['TOKEN_REVOCATION_STORAGE'] = os.path.join(SHARED_STATE_DIR, 'revoked_tokens.db')
+        token_cache.shared = SharedRevocations(app.config['TOKEN_REVOCATION_STORAGE'])
+
+def _start_app(wsgi_app, environ, start_response):
+    return iter(wsgi_app(environ, start_response))
+
+def _warm_up_pool():
+    get_pool(DB_CONFIG).acquire().close()
+    sync_search_index() # Bangun index pencarian sebelum request pertama
+    static_assets.load() # Build/baca manifest aset statis sebelum request pertama
+
+def _build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+async def _send_plain(send, status, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+use_shared_state(WORKERS)
+application = WsgiToAsgi(app)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Menjalankan API Farhan Shop dalam mode produksi (ASGI).")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Jumlah proses")
+    parser.add_argument('--threads', type=int, default=THREADS, help="Thread handler per proses")
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("uvicorn belum terinstal. Jalankan: pip install uvicorn")
+
+    # Setiap proses worker mengimpor ulang modul ini, jadi konfigurasi diteruskan lewat environment
+    os.environ['ASGI_THREADS'] = str(args.threads)
+    os.environ['ASGI_WORKERS'] = str(args.workers)
+    if args.workers > 1:
+        print(f"{args.workers} worker: rate limit dan token yang dicabut dibagi lewat file SQLite. "
+              f"State berikut tetap per proses:")
+        for state in PER_PROCESS_STATE:
+            print(f"  - {state}")
+    uvicorn.run('asgi:application', host=args.host, port=args.port, workers=args.workers,
+                lifespan='on', timeout_graceful_shutdown=int(SHUTDOWN_TIMEOUT))
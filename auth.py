@@ -0,0 +1,232 @@
+import functools
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from flask import current_app, g, jsonify, request
+
+REVOCATION_SCHEMA_SQL = "CREATE TABLE IF NOT EXISTS revoked_tokens (token_hash TEXT PRIMARY KEY, exp REAL NOT NULL) WITHOUT ROWID"
+
+
+class SharedRevocations:
+    """
+    Daftar token yang dicabut di file SQLite yang dipakai bersama oleh semua proses worker di satu mesin.
+    Yang disimpan hanya hash SHA-256 token. Setiap thread memakai koneksinya sendiri.
+    """
+
+    def __init__(self, path, busy_timeout=0.5, purge_interval=60.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.purge_interval = purge_interval
+        self.errors = 0
+        self._local = threading.local()
+        self._next_purge = 0.0
+        self._connect().execute(REVOCATION_SCHEMA_SQL)
+
+    def revoke(self, token, exp):
+        """
+        Mencatat token sebagai dicabut. Mengembalikan False jika file tidak bisa ditulis.
+        """
+        try:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO revoked_tokens (token_hash, exp) VALUES (?, ?)", (_token_hash(token), exp))
+            now = time.time()
+            if now >= self._next_purge:
+                self._next_purge = now + self.purge_interval
+                conn.execute("DELETE FROM revoked_tokens WHERE exp <= ?", (now,))
+            return True
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Revocation store error: {e}")
+            return False
+
+    def is_revoked(self, token, now):
+        try:
+            row = self._connect().execute(
+                "SELECT 1 FROM revoked_tokens WHERE token_hash = ? AND exp > ?", (_token_hash(token), now)
+            ).fetchone()
+            return row is not None
+        except sqlite3.Error as e:
+            # Fail open seperti rate limit: token yang dicabut di proses ini tetap ditolak (lihat TokenCache)
+            self.errors += 1
+            print(f"Revocation store error: {e}")
+            return False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            self._local.conn = conn
+        return conn
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenCache:
+    """
+    Cache LRU berukuran tetap untuk token JWT yang sudah diverifikasi, beserta daftar token yang dicabut.
+    Entri tidak pernah dipakai melewati `exp` token.
+
+    Tanpa `shared`, token yang dicabut hanya diketahui proses ini. Dengan beberapa proses worker,
+    pasang SharedRevocations agar logout berlaku di semua worker.
+    """
+
+    def __init__(self, maxsize=10000, shared=None, purge_interval=60.0):
+        self.maxsize = maxsize
+        self.shared = shared
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._verified = OrderedDict() # token -> (claims, exp)
+        self._revoked = {} # token -> exp, dibuang setelah kadaluarsa
+        self._lock = threading.Lock()
+        self._stats = {
+            'cache_hits': 0,
+            'verifications': 0,
+            'failures': 0,
+            'verify_seconds_total': 0.0,
+            'verify_seconds_max': 0.0,
+        }
+
+    def get(self, token, now):
+        """
+        Mengembalikan claims token yang masih berlaku dari cache, atau None.
+        """
+        with self._lock:
+            entry = self._verified.get(token)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._verified[token]
+                return None
+            self._verified.move_to_end(token)
+            self._stats['cache_hits'] += 1
+            return entry[0]
+
+    def put(self, token, claims, exp):
+        with self._lock:
+            self._verified[token] = (claims, exp)
+            self._verified.move_to_end(token)
+            while len(self._verified) > self.maxsize:
+                self._verified.popitem(last=False)
+
+    def revoke(self, token, exp):
+        """
+        Mencabut token. Mengembalikan False jika gagal dicatat di `shared`
+        (token tetap dicabut di proses ini).
+        """
+        with self._lock:
+            self._verified.pop(token, None)
+            self._revoked[token] = exp
+            # Token yang sudah kadaluarsa tidak perlu diingat lagi; disapu paling sering sekali per purge_interval
+            now = time.time()
+            if now >= self._next_purge:
+                self._next_purge = now + self.purge_interval
+                for expired in [t for t, e in self._revoked.items() if e <= now]:
+                    del self._revoked[expired]
+        return self.shared is None or self.shared.revoke(token, exp)
+
+    def is_revoked(self, token, now):
+        with self._lock:
+            if token in self._revoked:
+                return True
+        return self.shared is not None and self.shared.is_revoked(token, now)
+
+    def record_verification(self, seconds, ok):
+        with self._lock:
+            self._stats['verifications'] += 1
+            if not ok:
+                self._stats['failures'] += 1
+            self._stats['verify_seconds_total'] += seconds
+            self._stats['verify_seconds_max'] = max(self._stats['verify_seconds_max'], seconds)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(cached=len(self._verified), revoked=len(self._revoked))
+        if self.shared is not None:
+            stats['revocation_store_errors'] = self.shared.errors
+        return stats
+
+
+token_cache = TokenCache()
+
+def verify_token(token):
+    """
+    Memverifikasi token JWT, memakai cache jika token sudah pernah diverifikasi.
+    Melempar jwt.ExpiredSignatureError / jwt.InvalidTokenError seperti jwt.decode.
+    """
+    now = time.time()
+    if token_cache.is_revoked(token, now):
+        raise jwt.InvalidTokenError('Token sudah dicabut')
+    claims = token_cache.get(token, now)
+    if claims is not None:
+        return claims
+
+    start = time.perf_counter()
+    try:
+        claims = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        token_cache.record_verification(time.perf_counter() - start, ok=False)
+        raise
+    token_cache.record_verification(time.perf_counter() - start, ok=True)
+    if 'exp' in claims:
+        token_cache.put(token, claims, claims['exp'])
+    return claims
+
+def verify_request_token(token):
+    """
+    verify_token yang hasilnya diingat selama request, sehingga rate limit dan token_required
+    tidak memverifikasi token yang sama dua kali.
+    """
+    verified = g.get('verified_token')
+    if verified is not None and verified[0] == token:
+        return verified[1]
+    claims = verify_token(token)
+    g.verified_token = (token, claims)
+    return claims
+
+def revoke_token(token):
+    """
+    Mencabut token (misalnya saat logout) sampai waktu kadaluarsanya.
+    Mengembalikan False jika pencabutan gagal dicatat untuk proses worker lain.
+    """
+    claims = verify_request_token(token)
+    return token_cache.revoke(token, claims.get('exp', time.time()))
+
+def get_bearer_token():
+    """
+    Mengambil token dari header 'Authorization: Bearer <token>', atau None.
+    """
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None
+    parts = auth_header.split(" ")
+    return parts[1] if len(parts) > 1 else ''
+
+def token_required(f):
+    """
+    Decorator untuk endpoint yang membutuhkan autentikasi token JWT.
+    Mengisi g.user_id dan g.token_claims sebelum endpoint dipanggil.
+    """
+    @functools.wraps(f)
+    def decorated(*args, **kwargs):
+        token = get_bearer_token()
+        if token is None:
+            return jsonify({'message': 'Token tidak tersedia'}), 401
+
+        try:
+            claims = verify_request_token(token)
+            g.user_id = claims['user_id']
+            g.token_claims = claims
+        except jwt.ExpiredSignatureError:
+            return jsonify({'message': 'Token kadaluarsa'}), 401
+        except (jwt.InvalidTokenError, KeyError):
+            return jsonify({'message': 'Token tidak valid'}), 401
+        return f(*args, **kwargs)
+    return decorated
@@ -0,0 +1,267 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import db_setup
+from db import init_pool, start_replica_sync
+from passwords import PasswordHasher
+
+BENCH_PASSWORD = 'bench-password'
+
+
+def seed_database(path, products, users, carts, seed=42):
+    """
+    Membuat database SQLite dengan skema aplikasi dan mengisinya dengan data sintetis.
+    Semua user memakai password yang sama agar hash cukup dihitung sekali.
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    db_setup.setup_sqlite_database(conn)
+    conn.execute("DELETE FROM products") # Ganti produk contoh dengan katalog benchmark
+
+    conn.executemany(
+        "INSERT INTO products (id, name, description, price, original_price, discount, image_url, stock) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (f"bench-{i}", f"Produk {i}", f"Deskripsi produk benchmark {i}.",
+             price, price * 1.2 if discount else None, discount, f"images/product-{i % 12 + 1}.jpg", 1000000)
+            for i in range(products)
+            for price, discount in [(rng.randrange(5, 200) * 1000, rng.choice((0, 0, 0, 10, 30)))]
+        )
+    )
+    password_hash = PasswordHasher().hash(BENCH_PASSWORD)
+    conn.executemany(
+        "INSERT INTO users (username, password, email) VALUES (?, ?, ?)",
+        ((f"user{i}", password_hash, f"user{i}@bench.local") for i in range(users))
+    )
+    cart_rows = set()
+    for user_id in range(1, min(carts, users) + 1):
+        for _ in range(rng.randint(1, 5)):
+            cart_rows.add((user_id, f"bench-{rng.randrange(products)}"))
+    conn.executemany("INSERT INTO carts (user_id, product_id, quantity) VALUES (?, ?, 1)", sorted(cart_rows))
+    conn.commit()
+    conn.close()
+
+
+class TestClientDriver:
+    """
+    Mengirim request lewat Flask test client (tanpa jaringan, satu proses).
+    """
+
+    def __init__(self, flask_app):
+        self.app = flask_app
+
+    def request(self, method, path, json_body=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = self.app.test_client().open(path, method=method, json=json_body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpDriver:
+    """
+    Mengirim request ke server HTTP yang sedang berjalan (misalnya `python asgi.py`).
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, json_body=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        data = json.dumps(json_body).encode() if json_body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req) as response:
+                body = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            status = e.code
+        try:
+            return status, json.loads(body) if body else None
+        except ValueError:
+            return status, None
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def run_scenario(name, make_request, total, concurrency):
+    """
+    Menjalankan `make_request(i)` sebanyak `total` kali dengan `concurrency` thread.
+    make_request mengembalikan status HTTP. Mengembalikan ringkasan latensi dan throughput.
+    """
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal errors
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                status = make_request(i)
+            except Exception as e:
+                print(f"[{name}] Error: {e}")
+                status = None
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if status is None or status >= 400:
+                    errors += 1
+
+    wall_start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    result = {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else None,
+        'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+        'max_ms': round(latencies[-1], 3) if latencies else None,
+    }
+    print(f"{name:<16} {result['requests']:>6} req  {result['errors']:>4} err  "
+          f"{result['throughput_rps']:>9} req/s  p50 {result['p50_ms']:>8} ms  "
+          f"p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms")
+    return result
+
+def run_benchmark(driver, args):
+    rng = random.Random(args.seed)
+    users = min(args.users, args.concurrency * 4)
+    print(f"Login {users} user untuk token...")
+    tokens = []
+    for i in range(users):
+        status, body = driver.request('POST', '/login', {'username': f'user{i}', 'password': BENCH_PASSWORD})
+        if status != 200:
+            raise SystemExit(f"Login user{i} gagal ({status}): {body}")
+        tokens.append(body['token'])
+
+    def product_id():
+        return f"bench-{rng.randrange(args.products)}"
+
+    scenarios = {
+        'login': (args.login_requests, lambda i: driver.request(
+            'POST', '/login', {'username': f'user{i % args.users}', 'password': BENCH_PASSWORD})[0]),
+        'products': (args.requests, lambda i: driver.request('GET', '/products')[0]),
+        'products_page': (args.requests, lambda i: driver.request(
+            'GET', f'/products?limit=20&sort=price_asc&min_price={rng.randrange(5, 150) * 1000}')[0]),
+        'add_to_cart': (args.requests, lambda i: driver.request(
+            'POST', '/add_to_cart', {'product_id': product_id(), 'quantity': 1}, tokens[i % len(tokens)])[0]),
+        'cart': (args.requests, lambda i: driver.request('GET', '/cart', token=tokens[i % len(tokens)])[0]),
+        'place_order': (args.requests, lambda i: driver.request('POST', '/place_order', {
+            'full_name': 'Bench User', 'address': 'Jl. Benchmark 1', 'city': 'Jakarta', 'zip_code': '10110',
+            'phone': '08123456789', 'email': 'bench@bench.local',
+            'items': [{'id': product_id(), 'quantity': rng.randint(1, 3)} for _ in range(args.order_lines)],
+        }, tokens[i % len(tokens)])[0]),
+    }
+    selected = args.endpoints.split(',') if args.endpoints else list(scenarios)
+    results = {}
+    for name in selected:
+        if name not in scenarios:
+            raise SystemExit(f"Endpoint benchmark tidak dikenal: {name}. Pilihan: {', '.join(scenarios)}")
+        total, make_request = scenarios[name]
+        results[name] = run_scenario(name, make_request, total, args.concurrency)
+    return results
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    print(f"\nPerbandingan dengan {baseline_path} (p95 dan throughput):")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        p95_change = (result['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+        rps_change = (result['throughput_rps'] - old['throughput_rps']) / old['throughput_rps'] * 100 if old['throughput_rps'] else 0
+        print(f"{name:<16} p95 {old['p95_ms']:>8} -> {result['p95_ms']:>8} ms ({p95_change:+.1f}%)  "
+              f"throughput {old['throughput_rps']:>9} -> {result['throughput_rps']:>9} req/s ({rps_change:+.1f}%)")
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark endpoint API Farhan Shop pada database SQLite lokal.")
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--carts', type=int, default=100, help="Jumlah user yang keranjangnya sudah berisi")
+    parser.add_argument('--requests', type=int, default=500, help="Request per endpoint")
+    parser.add_argument('--login-requests', type=int, default=50)
+    parser.add_argument('--order-lines', type=int, default=3, help="Jumlah baris per pesanan")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--replicas', type=int, default=0,
+                        help="Jumlah read replica SQLite (salinan file database) untuk query baca")
+    parser.add_argument('--endpoints', help="Daftar endpoint dipisah koma (default: semua)")
+    parser.add_argument('--url', help="Benchmark server HTTP yang sudah berjalan, bukan Flask test client. "
+                                      "Server harus memakai database hasil --seed-only.")
+    parser.add_argument('--database', help="Path database SQLite (default: file sementara)")
+    parser.add_argument('--seed-only', action='store_true', help="Hanya membuat database lalu keluar")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="File hasil sebelumnya untuk dibandingkan")
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='farhanshop-bench-'), 'bench.db')
+    if not args.url or args.seed_only:
+        print(f"Mengisi {database}: {args.products} produk, {args.users} user, {args.carts} keranjang...")
+        seed_database(database, args.products, args.users, args.carts, args.seed)
+        if args.seed_only:
+            raise SystemExit(0)
+
+    if args.url:
+        driver = HttpDriver(args.url)
+    else:
+        import app as shop
+        shop.DB_CONFIG.update(backend='sqlite', database=database, pool_size=args.concurrency,
+                              replicas=[{'database': f'{database}.replica{i}'} for i in range(args.replicas)])
+        shop.app.config['RATE_LIMIT_ENABLED'] = False # Benchmark sengaja mengirim request secepat mungkin
+        init_pool(shop.DB_CONFIG)
+        start_replica_sync(shop.DB_CONFIG)
+        driver = TestClientDriver(shop.app)
+
+    results = run_benchmark(driver, args)
+    report = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nHasil disimpan ke {args.output}")
+    if args.compare:
+        compare(results, args.compare)
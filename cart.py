@@ -0,0 +1,199 @@
+import hashlib
+
+from reservations import stock_reservations
+
+# Setiap mutasi keranjang juga mengatur hold stok (reservations.py) dalam transaksi yang sama;
+# pengecekan stok dilakukan oleh hold. Bergantung pada index unik carts(user_id, product_id).
+
+SET_ITEM_SQL = {
+    'mssql': """
+    MERGE carts WITH (HOLDLOCK) AS c
+    USING (SELECT ? AS user_id, ? AS product_id) AS s
+    ON c.user_id = s.user_id AND c.product_id = s.product_id
+    WHEN MATCHED THEN
+        UPDATE SET quantity = ?
+    WHEN NOT MATCHED THEN
+        INSERT (user_id, product_id, quantity) VALUES (s.user_id, s.product_id, ?);
+    """,
+    'sqlite': """
+    INSERT INTO carts (user_id, product_id, quantity) VALUES (?, ?, ?)
+    ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = excluded.quantity
+    """,
+}
+
+
+def add_item(cursor, backend, user_id, product_id, quantity):
+    """
+    Menambah `quantity` ke item keranjang (atau membuatnya) jika stok bebas cukup untuk menahan totalnya.
+    Mengembalikan 'inserted', 'updated', atau None jika produk tidak ada / stok tidak cukup.
+    """
+    held = stock_reservations.hold(cursor, backend, user_id, product_id, quantity, add=True)
+    if held is None:
+        return None
+    _upsert(cursor, backend, user_id, product_id, held[0])
+    return 'updated' if held[1] else 'inserted'
+
+def set_item(cursor, backend, user_id, product_id, quantity):
+    """
+    Mengatur kuantitas item keranjang ke `quantity` (membuatnya jika belum ada) jika stok bebas cukup.
+    Mengembalikan False jika produk tidak ada atau stok tidak cukup.
+    """
+    if stock_reservations.hold(cursor, backend, user_id, product_id, quantity) is None:
+        return False
+    _upsert(cursor, backend, user_id, product_id, quantity)
+    return True
+
+def update_item(cursor, backend, user_id, product_id, quantity):
+    """
+    Mengubah kuantitas item yang sudah ada di keranjang; item baru tidak dibuat.
+    Mengembalikan 'updated', 'missing' jika item tidak ada di keranjang, atau None jika
+    produk tidak ada / stok tidak cukup.
+    """
+    held = stock_reservations.hold(cursor, backend, user_id, product_id, quantity, existing=True)
+    if held is None:
+        return None
+    if not held[1]:
+        return 'missing'
+    cursor.execute("UPDATE carts SET quantity = ? WHERE user_id = ? AND product_id = ?", (quantity, user_id, product_id))
+    return 'updated'
+
+def _upsert(cursor, backend, user_id, product_id, quantity):
+    if backend.name == 'mssql':
+        cursor.execute(SET_ITEM_SQL['mssql'], (user_id, product_id, quantity, quantity))
+    else:
+        cursor.execute(SET_ITEM_SQL['sqlite'], (user_id, product_id, quantity))
+
+def remove_item(cursor, backend, user_id, product_id):
+    """
+    Menghapus item dari keranjang dan melepas hold stoknya. Mengembalikan True jika ada baris yang dihapus.
+    """
+    cursor.execute("DELETE FROM carts WHERE user_id = ? AND product_id = ?", (user_id, product_id))
+    removed = cursor.rowcount > 0
+    stock_reservations.release(cursor, backend, user_id, product_id)
+    return removed
+
+CART_ITEMS_QUERY = """
+    SELECT c.product_id AS id, p.name, p.price, p.image_url, c.quantity, r.expires_at AS reserved_until
+    FROM carts c
+    JOIN products p ON c.product_id = p.id
+    LEFT JOIN stock_reservations r ON r.user_id = c.user_id AND r.product_id = c.product_id
+    WHERE c.user_id = ?
+    """
+
+BATCH_OPERATIONS = ('add', 'set', 'remove')
+MAX_BATCH_OPERATIONS = 100
+
+
+class CartError(Exception):
+    """
+    Batch keranjang ditolak. `status` adalah kode HTTP yang sesuai.
+    """
+    status = 400
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details or {}
+
+
+class CartConflict(CartError):
+    status = 409
+
+
+def cart_version(quantities):
+    """
+    Versi keranjang: hash dari pasangan (product_id, quantity) yang terurut.
+    Tidak butuh kolom tambahan dan berubah setiap kali isi keranjang berubah.
+    """
+    raw = ";".join(f"{product_id}={quantity}" for product_id, quantity in sorted(quantities.items()))
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+def parse_batch(data):
+    """
+    Memvalidasi body /cart/batch. Bentuk yang diterima:
+    - {"operations": [{"op": "add"|"set"|"remove", "product_id": ..., "quantity": n}], "version": ...}
+    - {"items": [{"product_id": ..., "quantity": n}], "version": ...} (keadaan akhir keranjang)
+    Mengembalikan (operations, desired_items, expected_version); salah satu dari keduanya None.
+    """
+    if not isinstance(data, dict):
+        raise CartError('Body batch tidak valid')
+    operations = data.get('operations')
+    items = data.get('items')
+    if (operations is None) == (items is None):
+        raise CartError("Isi salah satu dari 'operations' atau 'items'")
+    entries = operations if operations is not None else items
+    if not isinstance(entries, list) or len(entries) > MAX_BATCH_OPERATIONS:
+        raise CartError(f'Maksimal {MAX_BATCH_OPERATIONS} operasi per batch')
+
+    parsed = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise CartError('Format operasi tidak valid')
+        op = entry.get('op', 'set') if operations is not None else 'set'
+        product_id = entry.get('product_id') or entry.get('id')
+        quantity = entry.get('quantity', 1 if op == 'add' else None)
+        if op not in BATCH_OPERATIONS or not product_id:
+            raise CartError('Operasi atau ID produk tidak valid')
+        if op != 'remove' and (not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 0
+                               or (op == 'add' and quantity < 1)):
+            raise CartError('Kuantitas tidak valid', {'product_id': product_id})
+        if op == 'set' and quantity == 0:
+            op = 'remove'
+        parsed.append((op, product_id, quantity))
+
+    if operations is not None:
+        return parsed, None, data.get('version')
+    return None, {product_id: quantity for _, product_id, quantity in parsed if quantity}, data.get('version')
+
+def apply_batch(conn, user_id, operations, desired, expected_version=None):
+    """
+    Menerapkan batch dalam satu transaksi dan mengembalikan (items, version) keranjang baru.
+    Jika `expected_version` diberikan dan tidak sama dengan versi saat ini, atau ada operasi
+    yang gagal (stok tidak cukup), seluruh batch dibatalkan dan CartConflict dilempar
+    dengan isi keranjang terkini di `details`.
+    """
+    backend = conn.backend
+    cursor = conn.cursor()
+    try:
+        current = _lock_cart(cursor, backend, user_id)
+        if expected_version is not None and expected_version != cart_version(current):
+            raise CartConflict('Keranjang sudah berubah, muat ulang keranjang')
+
+        if desired is not None:
+            # Keadaan akhir -> hanya baris yang berbeda yang disentuh
+            operations = [('remove', product_id, None) for product_id in current if product_id not in desired]
+            operations += [('set', product_id, quantity) for product_id, quantity in desired.items()
+                           if current.get(product_id) != quantity]
+
+        for index, (op, product_id, quantity) in enumerate(operations):
+            if op == 'remove':
+                remove_item(cursor, backend, user_id, product_id)
+                continue
+            applied = (add_item if op == 'add' else set_item)(cursor, backend, user_id, product_id, quantity)
+            if not applied:
+                raise CartConflict('Produk tidak ditemukan atau stok tidak cukup',
+                                   {'failed': {'index': index, 'product_id': product_id}})
+
+        items = fetch_cart(cursor, user_id)
+        conn.commit()
+        return items, cart_version({item['id']: item['quantity'] for item in items})
+    except CartError as e:
+        conn.rollback()
+        items = fetch_cart(cursor, user_id)
+        e.details.update(items=items, version=cart_version({item['id']: item['quantity'] for item in items}))
+        raise
+    finally:
+        cursor.close()
+
+def fetch_cart(cursor, user_id):
+    """
+    Mengambil item keranjang user beserta data produknya.
+    """
+    cursor.execute(CART_ITEMS_QUERY, (user_id,))
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def _lock_cart(cursor, backend, user_id):
+    # Di SQL Server baris keranjang dikunci agar batch paralel untuk user yang sama berurutan
+    hint = " WITH (UPDLOCK, HOLDLOCK)" if backend.name == 'mssql' else ""
+    cursor.execute(f"SELECT product_id, quantity FROM carts{hint} WHERE user_id = ?", (user_id,))
+    return {row[0]: row[1] for row in cursor.fetchall()}
@@ -0,0 +1,95 @@
+import datetime
+import hashlib
+import threading
+import time
+
+
+class CatalogEntry:
+    """
+    Satu snapshot katalog yang sudah diserialisasi, beserta metadata HTTP-nya.
+    """
+
+    def __init__(self, products, body, version, last_modified, loaded_at, compressor=None, digest=None):
+        self.products = products
+        self.body = body
+        self.version = version
+        self.digest = digest or hashlib.sha1(body.encode() if isinstance(body, str) else body).hexdigest()
+        self.last_modified = last_modified
+        self.loaded_at = loaded_at
+        self.compressor = compressor
+        self._encoded = {} # encoding -> body terkompresi, dibuat sekali per snapshot
+
+    def encoded(self, encoding):
+        """
+        Body untuk Content-Encoding `encoding` (None = tanpa kompresi).
+        """
+        if encoding is None or self.compressor is None:
+            return self.body
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = self.compressor(self.body, encoding)
+        return data
+
+    @property
+    def etag(self):
+        # Dari isi, bukan dari versi: versi dimulai dari 1 di setiap proses sehingga tidak unik
+        # antar restart maupun antar proses worker
+        return f"catalog-{self.digest[:20]}"
+
+
+class CatalogCache:
+    """
+    Cache katalog produk di dalam proses dengan TTL dan invalidasi eksplisit.
+
+    Setiap perubahan katalog (invalidate() atau isi yang berbeda saat dimuat ulang)
+    menaikkan versi (dipakai index pencarian untuk mendeteksi perubahan). ETag diambil
+    dari hash isi katalog sehingga sama di semua proses untuk isi yang sama.
+    """
+
+    def __init__(self, loader, serializer, ttl=60.0, compressor=None):
+        self.loader = loader
+        self.serializer = serializer
+        self.ttl = ttl
+        self.compressor = compressor # compressor(body, encoding) -> bytes, opsional
+        self.version = 1
+        self._entry = None
+        self._digest = None
+        self._last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Mengembalikan CatalogEntry terkini, atau None jika katalog gagal dimuat.
+        """
+        entry = self._entry
+        if entry is not None and time.monotonic() - entry.loaded_at < self.ttl:
+            return entry
+        # Hanya satu thread yang memuat ulang; thread lain memakai hasilnya
+        with self._lock:
+            entry = self._entry
+            if entry is not None and time.monotonic() - entry.loaded_at < self.ttl:
+                return entry
+            products = self.loader()
+            if products is None:
+                return None
+            body = self.serializer(products)
+            digest = hashlib.sha1(body.encode() if isinstance(body, str) else body).hexdigest()
+            if self._digest is not None and digest != self._digest:
+                self._bump()
+            self._digest = digest
+            self._entry = CatalogEntry(products, body, self.version, self._last_modified, time.monotonic(),
+                                       self.compressor, digest)
+            return self._entry
+
+    def invalidate(self):
+        """
+        Membuang snapshot dan menaikkan versi katalog. Dipanggil setelah stok atau data produk berubah.
+        """
+        with self._lock:
+            self._bump()
+            self._entry = None
+            self._digest = None
+
+    def _bump(self):
+        self.version += 1
+        self._last_modified = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
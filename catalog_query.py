@@ -0,0 +1,140 @@
+import base64
+import json
+
+PRODUCT_COLUMNS = "id, name, description, price, original_price, discount, image_url, stock"
+
+# Pilihan urutan: nama -> (kolom urutan, arah). id selalu dipakai sebagai pemecah seri.
+SORTS = {
+    'id': (None, 'ASC'),
+    'price_asc': ('price', 'ASC'),
+    'price_desc': ('price', 'DESC'),
+    'name': ('name', 'ASC'),
+    'discount': ('discount', 'DESC'),
+}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class QueryError(ValueError):
+    """
+    Parameter query /products tidak valid.
+    """
+
+
+class ProductQuery:
+    """
+    Filter, urutan, dan posisi halaman (keyset) untuk daftar produk.
+    """
+
+    def __init__(self, args):
+        self.sort = args.get('sort', 'id')
+        if self.sort not in SORTS:
+            raise QueryError(f"Urutan tidak dikenal: {self.sort}. Pilihan: {', '.join(SORTS)}")
+        self.min_price = _parse_number(args, 'min_price')
+        self.max_price = _parse_number(args, 'max_price')
+        self.discounted = _parse_flag(args, 'discounted')
+        self.in_stock = _parse_flag(args, 'in_stock')
+        self.paginated = 'limit' in args or 'cursor' in args
+
+        self.limit = DEFAULT_LIMIT
+        if 'limit' in args:
+            try:
+                self.limit = int(args['limit'])
+            except ValueError:
+                raise QueryError("limit harus berupa angka")
+            if not 1 <= self.limit <= MAX_LIMIT:
+                raise QueryError(f"limit harus antara 1 dan {MAX_LIMIT}")
+        self.after = decode_cursor(args['cursor'], self.sort) if args.get('cursor') else None
+
+    @property
+    def is_default(self):
+        """
+        True jika query sama dengan katalog lengkap tanpa filter (bisa dilayani dari cache).
+        """
+        return (not self.paginated and self.sort == 'id' and self.min_price is None
+                and self.max_price is None and not self.discounted and not self.in_stock)
+
+    def build(self, backend):
+        """
+        Membangun SQL dan parameter untuk backend yang diberikan.
+        """
+        column, direction = SORTS[self.sort]
+        op = '>' if direction == 'ASC' else '<'
+        conditions = []
+        params = []
+        if self.min_price is not None:
+            conditions.append("price >= ?")
+            params.append(self.min_price)
+        if self.max_price is not None:
+            conditions.append("price <= ?")
+            params.append(self.max_price)
+        if self.discounted:
+            conditions.append("discount > 0")
+        if self.in_stock:
+            conditions.append("stock - reserved > 0") # Stok bebas: stok yang ditahan keranjang tidak dihitung
+        if self.after is not None:
+            value, last_id = self.after
+            if column is None:
+                conditions.append(f"id {op} ?")
+                params.append(last_id)
+            else:
+                conditions.append(f"({column} {op} ? OR ({column} = ? AND id {op} ?))")
+                params.extend([value, value, last_id])
+
+        query = f"SELECT {PRODUCT_COLUMNS} FROM products"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        order = [f"{column} {direction}"] if column else []
+        order.append(f"id {direction}")
+        query += " ORDER BY " + ", ".join(order)
+        if self.paginated:
+            # Ambil satu baris lebih untuk mengetahui apakah masih ada halaman berikutnya
+            query = backend.limit(query, self.limit + 1)
+        return query, params
+
+    def page(self, rows):
+        """
+        Memotong hasil ke `limit` baris dan mengembalikan (items, next_cursor).
+        """
+        if len(rows) <= self.limit:
+            return rows, None
+        items = rows[:self.limit]
+        column, _ = SORTS[self.sort]
+        last = items[-1]
+        return items, encode_cursor(self.sort, last[column] if column else None, last['id'])
+
+    def seek(self, row):
+        """
+        Melanjutkan query setelah `row` (baris terakhir potongan sebelumnya), tanpa lewat cursor teks.
+        """
+        column, _ = SORTS[self.sort]
+        self.after = (row[column] if column else None, row['id'])
+
+
+def encode_cursor(sort, value, last_id):
+    if value is not None and not isinstance(value, (int, str)):
+        value = str(value) # Decimal/float disimpan sebagai teks agar presisinya utuh
+    raw = json.dumps([sort, value, last_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, sort):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, last_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise QueryError("cursor tidak valid")
+    if cursor_sort != sort:
+        raise QueryError("cursor dibuat untuk urutan yang berbeda")
+    return value, last_id
+
+def _parse_number(args, name):
+    if args.get(name) in (None, ''):
+        return None
+    try:
+        return float(args[name])
+    except ValueError:
+        raise QueryError(f"{name} harus berupa angka")
+
+def _parse_flag(args, name):
+    return args.get(name, '').lower() in ('1', 'true', 'yes')
@@ -0,0 +1,596 @@
+import datetime
+import itertools
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from decimal import Decimal
+
+try:
+    import pyodbc
+except ImportError: # pyodbc hanya dibutuhkan untuk backend SQL Server
+    pyodbc = None
+
+# Semua jenis error database yang perlu ditangkap oleh pemanggil
+DB_ERRORS = (sqlite3.Error,) + ((pyodbc.Error,) if pyodbc is not None else ())
+
+# SQLite tidak mengenal Decimal; simpan sebagai teks, kolom NUMERIC mengonversinya kembali
+sqlite3.register_adapter(Decimal, str)
+# Waktu (UTC tanpa zona) disimpan sebagai teks ISO agar bisa dibandingkan langsung di SQL
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(' '))
+
+# Callback instrumentasi (misalnya metrics.py):
+# query_listeners dipanggil dengan (detik,) setelah setiap execute/executemany,
+# acquire_listeners dipanggil dengan (detik_menunggu,) setelah koneksi diambil dari pool.
+query_listeners = []
+acquire_listeners = []
+
+
+class PoolTimeout(Exception):
+    """
+    Dilempar ketika tidak ada koneksi yang tersedia di pool dalam batas waktu tunggu.
+    """
+
+
+class SqlServerBackend:
+    """
+    Backend SQL Server menggunakan pyodbc dan Windows Authentication.
+    """
+    name = 'mssql'
+
+    def __init__(self, config):
+        self.config = config
+
+    def connect(self):
+        if pyodbc is None:
+            raise RuntimeError("pyodbc tidak terinstal, backend SQL Server tidak dapat digunakan")
+        conn_str = (
+            f"DRIVER={self.config['driver']};"
+            f"SERVER={self.config['server']};"
+            f"DATABASE={self.config['database']};"
+            f"Trusted_Connection=yes;" # Menggunakan Windows Authentication
+        )
+        return pyodbc.connect(conn_str)
+
+    def ping(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def last_insert_id(self, cursor):
+        cursor.execute("SELECT SCOPE_IDENTITY() AS id")
+        return int(cursor.fetchone()[0])
+
+    def insert_returning_id(self, cursor, table, columns, params):
+        """
+        INSERT satu baris dan mengembalikan id IDENTITY-nya dalam satu round trip.
+        """
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) OUTPUT INSERTED.id "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            params
+        )
+        return int(cursor.fetchone()[0])
+
+    def limit(self, query, n):
+        """
+        Membatasi jumlah baris hasil query yang diakhiri ORDER BY (T-SQL: OFFSET/FETCH).
+        Tidak menyentuh isi query, jadi aman untuk SELECT DISTINCT, CTE, dan subquery.
+        """
+        if 'ORDER BY' not in query.upper():
+            raise ValueError("limit() membutuhkan query yang diakhiri ORDER BY")
+        return f"{query} OFFSET 0 ROWS FETCH NEXT {int(n)} ROWS ONLY"
+
+
+class SqliteBackend:
+    """
+    Backend SQLite sebagai pengganti lokal SQL Server untuk pengujian dan benchmark.
+    """
+    name = 'sqlite'
+
+    def __init__(self, config):
+        self.config = config
+
+    def connect(self):
+        conn = sqlite3.connect(
+            self.config.get('database', 'farhanshop.db'),
+            timeout=self.config.get('busy_timeout', 5.0),
+            check_same_thread=False, # Koneksi berpindah thread melalui pool
+            cached_statements=self.config.get('statement_cache_size', 128)
+        )
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def ping(self, conn):
+        conn.execute("SELECT 1").fetchone()
+
+    def last_insert_id(self, cursor):
+        return cursor.lastrowid
+
+    def insert_returning_id(self, cursor, table, columns, params):
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) RETURNING id",
+            params
+        )
+        return cursor.fetchone()[0]
+
+    def limit(self, query, n):
+        return f"{query} LIMIT {int(n)}"
+
+
+BACKENDS = {
+    SqlServerBackend.name: SqlServerBackend,
+    SqliteBackend.name: SqliteBackend,
+}
+
+def create_backend(config):
+    """
+    Membuat backend database sesuai DB_CONFIG['backend'] (default: SQL Server).
+    """
+    name = config.get('backend', SqlServerBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Backend database tidak dikenal: {name}")
+    return BACKENDS[name](config)
+
+
+class TimedCursor:
+    """
+    Pembungkus cursor yang melaporkan durasi setiap query ke query_listeners.
+    """
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def execute(self, *args):
+        start = time.perf_counter()
+        try:
+            self._raw.execute(*args)
+        finally:
+            _notify(query_listeners, time.perf_counter() - start)
+        return self
+
+    def executemany(self, *args):
+        start = time.perf_counter()
+        try:
+            self._raw.executemany(*args)
+        finally:
+            _notify(query_listeners, time.perf_counter() - start)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+
+def _notify(listeners, value):
+    for listener in listeners:
+        listener(value)
+
+
+class PooledConnection:
+    """
+    Pembungkus koneksi dari pool. close() mengembalikan koneksi ke pool, bukan menutupnya.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+        self.invalid = False
+
+    @property
+    def backend(self):
+        return self._pool.backend
+
+    def cursor(self):
+        cursor = self._raw.cursor()
+        return TimedCursor(cursor) if query_listeners else cursor
+
+    def prepared(self, sql):
+        """
+        Cursor yang di-cache per koneksi fisik untuk teks SQL `sql`. Menjalankan SQL yang sama lagi
+        pada cursor yang sama memakai ulang statement yang sudah di-prepare (pyodbc melewati
+        SQLPrepare). Jangan tutup cursor ini; hasilnya harus dibaca habis sebelum koneksi dikembalikan.
+        """
+        cursor = self._pool.statement_cursor(self._raw, sql)
+        return TimedCursor(cursor) if query_listeners else cursor
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def invalidate(self):
+        """
+        Menandai koneksi rusak agar dibuang saat dikembalikan ke pool.
+        """
+        self.invalid = True
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw, discard=self.invalid)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Pool koneksi thread-safe dengan ukuran tetap, health check, dan pengusiran koneksi idle.
+    """
+
+    def __init__(self, backend, size=10, timeout=5.0, max_idle=300.0, health_check_interval=30.0,
+                 statement_cache_size=128):
+        self.backend = backend
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.statement_cache_size = statement_cache_size
+        self._idle = deque() # (koneksi, waktu terakhir dipakai)
+        self._statements = {} # id(koneksi fisik) -> OrderedDict(sql -> cursor), LRU per koneksi
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            'acquired': 0,
+            'created': 0,
+            'discarded': 0,
+            'evicted_idle': 0,
+            'failed_health_checks': 0,
+            'timeouts': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'statement_hits': 0,
+            'statement_misses': 0,
+        }
+
+    def acquire(self):
+        """
+        Mengambil koneksi dari pool, menunggu maksimal `timeout` detik jika pool penuh.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Pool koneksi sudah ditutup")
+                self._evict_idle()
+                if self._idle:
+                    raw, last_used = self._idle.pop() # LIFO: koneksi paling hangat dulu
+                    self._in_use += 1
+                    break
+                if self._in_use < self.size:
+                    raw, last_used = None, None
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f"Tidak ada koneksi tersedia setelah {self.timeout} detik")
+                self._cond.wait(remaining)
+            waited = time.monotonic() - start
+            self._record_wait(waited)
+        _notify(acquire_listeners, waited)
+
+        # Pembuatan koneksi dan health check dilakukan di luar lock
+        try:
+            if raw is not None and time.monotonic() - last_used > self.health_check_interval:
+                try:
+                    self.backend.ping(raw)
+                except DB_ERRORS:
+                    self._count('failed_health_checks')
+                    self._close_raw(raw)
+                    raw = None
+            if raw is None:
+                raw = self.backend.connect()
+                self._count('created')
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw)
+
+    def release(self, raw, discard=False):
+        """
+        Mengembalikan koneksi ke pool. Transaksi yang masih terbuka di-rollback.
+        """
+        if not discard:
+            try:
+                raw.rollback()
+            except DB_ERRORS:
+                discard = True
+        if discard:
+            self._close_raw(raw)
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._stats['discarded'] += 1
+            elif self._closed:
+                self._close_raw(raw)
+            else:
+                self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+    def statement_cursor(self, raw, sql):
+        """
+        Cursor cache untuk `sql` pada koneksi `raw` (hanya dipakai oleh thread pemegang koneksi).
+        """
+        statements = self._statements.get(id(raw))
+        if statements is None:
+            with self._cond:
+                statements = self._statements[id(raw)] = OrderedDict()
+        cursor = statements.get(sql)
+        if cursor is not None:
+            statements.move_to_end(sql)
+            self._count('statement_hits')
+            return cursor
+        self._count('statement_misses')
+        cursor = statements[sql] = raw.cursor()
+        if len(statements) > self.statement_cache_size:
+            statements.popitem(last=False)[1].close()
+        return cursor
+
+    def close_all(self):
+        """
+        Menutup semua koneksi idle; koneksi yang sedang dipakai ditutup saat dikembalikan.
+        """
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._close_raw(self._idle.popleft()[0])
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(size=self.size, in_use=self._in_use, idle=len(self._idle),
+                         cached_statements=sum(len(statements) for statements in self._statements.values()))
+        return stats
+
+    def _evict_idle(self):
+        # Koneksi tertua ada di sisi kiri deque
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            self._close_raw(self._idle.popleft()[0])
+            self._stats['evicted_idle'] += 1
+
+    def _record_wait(self, waited):
+        self._stats['acquired'] += 1
+        self._stats['wait_seconds_total'] += waited
+        self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited)
+
+    def _count(self, key):
+        with self._cond:
+            self._stats[key] += 1
+
+    def _close_raw(self, raw):
+        for cursor in self._statements.pop(id(raw), {}).values():
+            try:
+                cursor.close()
+            except DB_ERRORS:
+                pass
+        try:
+            raw.close()
+        except DB_ERRORS:
+            pass
+
+
+class ReplicaSet:
+    """
+    Read replica beserta routing query baca.
+
+    Query baca dibagi round-robin ke pool replica, kecuali untuk `key` (biasanya user_id) yang
+    menulis ke primary dalam `sticky_seconds` terakhir: query user tersebut tetap ke primary agar
+    ia selalu melihat tulisannya sendiri walaupun replica tertinggal. Jika replica tidak bisa
+    dipakai, query dialihkan ke primary. Penanda tulis disimpan per proses.
+    """
+
+    def __init__(self, pools, sticky_seconds=5.0):
+        self.pools = pools
+        self.sticky_seconds = sticky_seconds
+        self._last_write = OrderedDict() # key -> waktu tulis terakhir, urut dari yang paling lama
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {'replica_reads': 0, 'sticky_reads': 0, 'fallbacks': 0}
+
+    def mark_write(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[key] = now
+            self._last_write.move_to_end(key)
+            while self._last_write:
+                oldest_key, written = next(iter(self._last_write.items()))
+                if now - written <= self.sticky_seconds:
+                    break
+                del self._last_write[oldest_key]
+
+    def acquire(self, primary, key=None):
+        """
+        Koneksi untuk query baca: dari replica, atau dari `primary` jika `key` baru saja menulis.
+        """
+        if key is not None:
+            with self._lock:
+                written = self._last_write.get(key)
+            if written is not None and time.monotonic() - written <= self.sticky_seconds:
+                self._count('sticky_reads')
+                return primary.acquire()
+        pool = self.pools[next(self._next) % len(self.pools)]
+        try:
+            conn = pool.acquire()
+        except (PoolTimeout, RuntimeError) + DB_ERRORS as e:
+            self._count('fallbacks')
+            print(f"Read replica tidak tersedia, memakai primary: {e}")
+            return primary.acquire()
+        self._count('replica_reads')
+        return conn
+
+    def close_all(self):
+        for pool in self.pools:
+            pool.close_all()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, replicas=len(self.pools), sticky_keys=len(self._last_write))
+        for i, pool in enumerate(self.pools):
+            pool_stats = pool.stats()
+            for name in ('acquired', 'in_use', 'timeouts', 'statement_hits'):
+                stats[f'replica{i}_{name}'] = pool_stats[name]
+        return stats
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+
+def sync_sqlite_replicas(config):
+    """
+    Pengganti replikasi untuk SQLite lokal: menyalin file primary ke setiap file replica
+    dengan backup API. Dipanggil berkala (lihat start_replica_sync) sehingga replica
+    tertinggal seperti replica sungguhan.
+    """
+    source = sqlite3.connect(config.get('database', 'farhanshop.db'), timeout=config.get('busy_timeout', 5.0))
+    try:
+        for replica in config.get('replicas', ()):
+            target = sqlite3.connect(replica['database'], timeout=config.get('busy_timeout', 5.0))
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+    finally:
+        source.close()
+
+
+_pool = None
+_replicas = None
+_pool_lock = threading.Lock()
+_sync_stop = threading.Event()
+_sync_thread = None
+
+def _build_pool(config):
+    return ConnectionPool(
+        create_backend(config),
+        size=config.get('pool_size', 10),
+        timeout=config.get('pool_timeout', 5.0),
+        max_idle=config.get('pool_max_idle', 300.0),
+        health_check_interval=config.get('pool_health_check_interval', 30.0),
+        statement_cache_size=config.get('statement_cache_size', 128),
+    )
+
+def _build_replicas(config):
+    replicas = config.get('replicas')
+    if not replicas:
+        return None
+    # Setiap replica mewarisi konfigurasi primary; cukup tulis yang berbeda (server atau file database)
+    base = {key: value for key, value in config.items() if key != 'replicas'}
+    return ReplicaSet([_build_pool(dict(base, **replica)) for replica in replicas],
+                      sticky_seconds=config.get('replica_sticky_seconds', 5.0))
+
+def init_pool(config):
+    """
+    Membuat (ulang) pool global (primary dan read replica) dari konfigurasi database.
+    """
+    global _pool, _replicas
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        if _replicas is not None:
+            _replicas.close_all()
+        _pool = _build_pool(config)
+        _replicas = _build_replicas(config)
+        return _pool
+
+def get_pool(config):
+    """
+    Mengembalikan pool global, membuatnya saat pertama kali dipanggil.
+    """
+    global _pool, _replicas
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _build_pool(config)
+                _replicas = _build_replicas(config)
+    return _pool
+
+def get_replicas(config):
+    """
+    ReplicaSet global, atau None jika DB_CONFIG tidak memiliki 'replicas'.
+    """
+    get_pool(config)
+    return _replicas
+
+def replica_stats(config):
+    replicas = get_replicas(config)
+    return replicas.stats() if replicas is not None else {'replicas': 0}
+
+def acquire_read(config, key=None):
+    """
+    Mengambil koneksi untuk query baca (replica jika ada, lihat ReplicaSet).
+    """
+    primary = get_pool(config)
+    replicas = _replicas
+    return primary.acquire() if replicas is None else replicas.acquire(primary, key)
+
+def mark_write(config, key):
+    """
+    Mencatat bahwa `key` baru saja menulis ke primary (read-your-writes).
+    """
+    replicas = get_replicas(config)
+    if replicas is not None:
+        replicas.mark_write(key)
+
+def start_replica_sync(config):
+    """
+    Untuk backend SQLite dengan 'replicas': menyalin primary ke replica setiap
+    `replica_sync_interval` detik di thread background. Backend lain direplikasi oleh server database.
+    """
+    global _sync_thread
+    if config.get('backend') != SqliteBackend.name or not config.get('replicas'):
+        return
+    if _sync_thread is not None and _sync_thread.is_alive():
+        return
+    sync_sqlite_replicas(config) # File replica harus sudah berisi sebelum query baca pertama
+    _sync_stop.clear()
+    interval = config.get('replica_sync_interval', 1.0)
+
+    def run():
+        while not _sync_stop.wait(interval):
+            try:
+                sync_sqlite_replicas(config)
+            except DB_ERRORS as e:
+                print(f"Sinkronisasi replica SQLite gagal: {e}")
+
+    _sync_thread = threading.Thread(target=run, name='sqlite-replica-sync', daemon=True)
+    _sync_thread.start()
+
+def stop_replica_sync():
+    global _sync_thread
+    _sync_stop.set()
+    if _sync_thread is not None:
+        _sync_thread.join()
+        _sync_thread = None
+
+def close_pool():
+    """
+    Menutup pool global (misalnya saat server dimatikan).
+    """
+    global _pool, _replicas
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+        if _replicas is not None:
+            _replicas.close_all()
+            _replicas = None
@@ -1,190 +1,467 @@
-import pyodbc
-from pyodbc import Error
-import hashlib
-
-# Fungsi koneksi diubah untuk Windows Authentication
-def create_db_connection(server, database, driver="{ODBC Driver 17 for SQL Server}"):
-    """
-    Membuat koneksi ke database SQL Server menggunakan Windows Authentication.
-    """
-    connection = None
-    try:
-        conn_str = (
-            f"DRIVER={driver};"
-            f"SERVER={server};"
-            f"DATABASE={database};"
-            f"Trusted_Connection=yes;" # Menggunakan Windows Authentication
-        )
-        connection = pyodbc.connect(conn_str, autocommit=True) # autocommit=True untuk DDL
-        print("Koneksi database SQL Server berhasil menggunakan Windows Authentication!")
-    except Error as e:
-        print(f"Error: '{e}'")
-    return connection
-
-def execute_query(connection, query, params=None):
-    """
-    Menjalankan query SQL.
-    """
-    cursor = connection.cursor()
-    try:
-        cursor.execute(query, params or ())
-        print("Query berhasil dieksekusi")
-        return True
-    except Error as e:
-        print(f"Error: '{e}'")
-        return False
-    finally:
-        cursor.close()
-
-def fetch_query(connection, query, params=None):
-    """
-    Mengambil data dari query SQL.
-    """
-    cursor = connection.cursor()
-    try:
-        cursor.execute(query, params or ())
-        columns = [column[0] for column in cursor.description]
-        results = []
-        for row in cursor.fetchall():
-            results.append(dict(zip(columns, row)))
-        return results
-    except Error as e:
-        print(f"Error: '{e}'")
-        return None
-    finally:
-        cursor.close()
-
-def hash_password(password):
-    """
-    Menghash password menggunakan SHA256.
-    """
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def setup_database(connection, db_name):
-    """
-    Mengatur tabel yang diperlukan untuk aplikasi e-commerce di SQL Server.
-    """
-    create_users_table = """
-    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='users' and xtype='U')
-    CREATE TABLE users (
-        id INT IDENTITY(1,1) PRIMARY KEY,
-        username NVARCHAR(255) NOT NULL UNIQUE,
-        password NVARCHAR(255) NOT NULL,
-        email NVARCHAR(255) UNIQUE,
-        created_at DATETIME DEFAULT GETDATE()
-    );
-    """
-    execute_query(connection, create_users_table)
-
-    create_products_table = """
-    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='products' and xtype='U')
-    CREATE TABLE products (
-        id NVARCHAR(255) PRIMARY KEY,
-        name NVARCHAR(255) NOT NULL,
-        description NVARCHAR(MAX),
-        price DECIMAL(10, 2) NOT NULL,
-        original_price DECIMAL(10, 2),
-        discount INT DEFAULT 0,
-        image_url NVARCHAR(255),
-        stock INT DEFAULT 0
-    );
-    """
-    execute_query(connection, create_products_table)
-
-    create_carts_table = """
-    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='carts' and xtype='U')
-    CREATE TABLE carts (
-        id INT IDENTITY(1,1) PRIMARY KEY,
-        user_id INT,
-        product_id NVARCHAR(255),
-        quantity INT NOT NULL,
-        FOREIGN KEY (user_id) REFERENCES users(id),
-        FOREIGN KEY (product_id) REFERENCES products(id)
-    );
-    """
-    execute_query(connection, create_carts_table)
-
-    create_orders_table = """
-    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='orders' and xtype='U')
-    CREATE TABLE orders (
-        id INT IDENTITY(1,1) PRIMARY KEY,
-        user_id INT,
-        order_date DATETIME DEFAULT GETDATE(),
-        total_amount DECIMAL(10, 2) NOT NULL,
-        full_name NVARCHAR(255),
-        address NVARCHAR(MAX),
-        city NVARCHAR(255),
-        zip_code NVARCHAR(10),
-        phone NVARCHAR(20),
-        email NVARCHAR(255),
-        FOREIGN KEY (user_id) REFERENCES users(id)
-    );
-    """
-    execute_query(connection, create_orders_table)
-
-    create_order_items_table = """
-    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='order_items' and xtype='U')
-    CREATE TABLE order_items (
-        id INT IDENTITY(1,1) PRIMARY KEY,
-        order_id INT,
-        product_id NVARCHAR(255),
-        quantity INT NOT NULL,
-        price_at_purchase DECIMAL(10, 2) NOT NULL,
-        FOREIGN KEY (order_id) REFERENCES orders(id),
-        FOREIGN KEY (product_id) REFERENCES products(id)
-    );
-    """
-    execute_query(connection, create_order_items_table)
-
-    products = fetch_query(connection, "SELECT TOP 1 * FROM products")
-    if not products:
-        print("Menambahkan produk contoh...")
-        sample_products = [
-            ('product-1', 'Bell Pepper', 'Lada segar pilihan.', 100000.00, 120000.00, 30, 'images/product-1.jpg', 50),
-            ('product-2', 'Strawberry', 'Stroberi manis dan segar.', 60000.00, None, 0, 'images/product-2.jpg', 100),
-            ('product-3', 'Green Beans', 'Buncis hijau organik.', 40000.00, None, 0, 'images/product-3.jpg', 75),
-            ('product-4', 'Purple Cabbage', 'Kol ungu segar.', 50000.00, None, 0, 'images/product-4.jpg', 60),
-            ('product-5', 'Tomatoe', 'Tomat merah segar.', 40000.00, 80000.00, 30, 'images/product-5.jpg', 90),
-            ('product-6', 'Brocolli', 'Brokoli hijau segar.', 20000.00, None, 0, 'images/product-6.jpg', 40),
-            ('product-7', 'Carrots', 'Wortel renyah.', 15000.00, None, 0, 'images/product-7.jpg', 120),
-            ('product-8', 'Fruit Juice', 'Jus buah segar.', 70000.00, None, 0, 'images/product-8.jpg', 80),
-            ('product-9', 'Onion', 'Bawang bombay.', 100000.00, 120000.00, 30, 'images/product-9.jpg', 70),
-            ('product-10', 'Apple', 'Apel merah segar.', 80000.00, None, 0, 'images/product-10.jpg', 110),
-            ('product-11', 'Garlic', 'Bawang putih.', 70000.00, None, 0, 'images/product-11.jpg', 95),
-            ('product-12', 'Chilli', 'Cabai pedas.', 50000.00, None, 0, 'images/product-12.jpg', 65)
-        ]
-        insert_product_query = """
-        INSERT INTO products (id, name, description, price, original_price, discount, image_url, stock)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        for product in sample_products:
-            execute_query(connection, insert_product_query, product)
-        print("Produk contoh berhasil ditambahkan.")
-
-if __name__ == "__main__":
-    # Ganti dengan detail koneksi database SQL Server Anda
-    # SERVER: Biasanya 'localhost' atau '.\SQLEXPRESS' atau nama server/IP
-    # DATABASE: Nama database yang akan dibuat/digunakan
-    # DRIVER: Sesuaikan dengan driver ODBC yang terinstal di sistem Anda.
-    #         Contoh: "{ODBC Driver 17 for SQL Server}" atau "{SQL Server}"
-    
-    DB_SERVER = "LAPTOP-DU6E16BV" # Ganti dengan nama server SQL Server Anda
-    DB_NAME = "FarhanShopDB" # Nama database yang akan dibuat
-
-    # Koneksi ke master database untuk membuat database baru jika belum ada
-    # Tidak perlu username/password karena menggunakan Trusted_Connection
-    master_conn = create_db_connection(DB_SERVER, "master") # Perhatikan tidak ada username/password
-    if master_conn:
-        create_database_query = f"IF NOT EXISTS (SELECT name FROM sys.databases WHERE name = N'{DB_NAME}') CREATE DATABASE {DB_NAME};"
-        execute_query(master_conn, create_database_query)
-        master_conn.close()
-        print(f"Database '{DB_NAME}' siap digunakan.")
-
-    # Koneksi langsung ke database yang baru dibuat/sudah ada untuk setup tabel
-    connection = create_db_connection(DB_SERVER, DB_NAME) # Perhatikan tidak ada username/password
-    if connection:
-        setup_database(connection, DB_NAME)
-        connection.close()
-    else:
-        print("Gagal terhubung ke database untuk setup tabel.")
-
+from db import DB_ERRORS as Error, pyodbc
+from passwords import hasher
+
+# Fungsi koneksi diubah untuk Windows Authentication
+def create_db_connection(server, database, driver="{ODBC Driver 17 for SQL Server}"):
+    """
+    Membuat koneksi ke database SQL Server menggunakan Windows Authentication.
+    """
+    connection = None
+    try:
+        conn_str = (
+            f"DRIVER={driver};"
+            f"SERVER={server};"
+            f"DATABASE={database};"
+            f"Trusted_Connection=yes;" # Menggunakan Windows Authentication
+        )
+        connection = pyodbc.connect(conn_str, autocommit=True) # autocommit=True untuk DDL
+        print("Koneksi database SQL Server berhasil menggunakan Windows Authentication!")
+    except Error as e:
+        print(f"Error: '{e}'")
+    return connection
+
+def execute_query(connection, query, params=None):
+    """
+    Menjalankan query SQL.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params or ())
+        print("Query berhasil dieksekusi")
+        return True
+    except Error as e:
+        print(f"Error: '{e}'")
+        return False
+    finally:
+        cursor.close()
+
+def fetch_query(connection, query, params=None):
+    """
+    Mengambil data dari query SQL.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params or ())
+        columns = [column[0] for column in cursor.description]
+        results = []
+        for row in cursor.fetchall():
+            results.append(dict(zip(columns, row)))
+        return results
+    except Error as e:
+        print(f"Error: '{e}'")
+        return None
+    finally:
+        cursor.close()
+
+# Produk contoh yang diisi saat tabel products masih kosong
+SAMPLE_PRODUCTS = [
+    ('product-1', 'Bell Pepper', 'Lada segar pilihan.', 100000.00, 120000.00, 30, 'images/product-1.jpg', 50),
+    ('product-2', 'Strawberry', 'Stroberi manis dan segar.', 60000.00, None, 0, 'images/product-2.jpg', 100),
+    ('product-3', 'Green Beans', 'Buncis hijau organik.', 40000.00, None, 0, 'images/product-3.jpg', 75),
+    ('product-4', 'Purple Cabbage', 'Kol ungu segar.', 50000.00, None, 0, 'images/product-4.jpg', 60),
+    ('product-5', 'Tomatoe', 'Tomat merah segar.', 40000.00, 80000.00, 30, 'images/product-5.jpg', 90),
+    ('product-6', 'Brocolli', 'Brokoli hijau segar.', 20000.00, None, 0, 'images/product-6.jpg', 40),
+    ('product-7', 'Carrots', 'Wortel renyah.', 15000.00, None, 0, 'images/product-7.jpg', 120),
+    ('product-8', 'Fruit Juice', 'Jus buah segar.', 70000.00, None, 0, 'images/product-8.jpg', 80),
+    ('product-9', 'Onion', 'Bawang bombay.', 100000.00, 120000.00, 30, 'images/product-9.jpg', 70),
+    ('product-10', 'Apple', 'Apel merah segar.', 80000.00, None, 0, 'images/product-10.jpg', 110),
+    ('product-11', 'Garlic', 'Bawang putih.', 70000.00, None, 0, 'images/product-11.jpg', 95),
+    ('product-12', 'Chilli', 'Cabai pedas.', 50000.00, None, 0, 'images/product-12.jpg', 65)
+]
+
+def hash_password(password):
+    """
+    Menghash password dengan KDF yang sama dengan app.py (lihat passwords.PasswordHasher).
+    """
+    return hasher.hash(password)
+
+def setup_database(connection, db_name):
+    """
+    Mengatur tabel yang diperlukan untuk aplikasi e-commerce di SQL Server.
+    """
+    create_users_table = """
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='users' and xtype='U')
+    CREATE TABLE users (
+        id INT IDENTITY(1,1) PRIMARY KEY,
+        username NVARCHAR(255) NOT NULL UNIQUE,
+        password NVARCHAR(255) NOT NULL,
+        email NVARCHAR(255) UNIQUE,
+        created_at DATETIME DEFAULT GETDATE()
+    );
+    """
+    execute_query(connection, create_users_table)
+
+    create_products_table = """
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='products' and xtype='U')
+    CREATE TABLE products (
+        id NVARCHAR(255) PRIMARY KEY,
+        name NVARCHAR(255) NOT NULL,
+        description NVARCHAR(MAX),
+        price DECIMAL(10, 2) NOT NULL,
+        original_price DECIMAL(10, 2),
+        discount INT DEFAULT 0,
+        image_url NVARCHAR(255),
+        stock INT DEFAULT 0
+    );
+    """
+    execute_query(connection, create_products_table)
+
+    create_carts_table = """
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='carts' and xtype='U')
+    CREATE TABLE carts (
+        id INT IDENTITY(1,1) PRIMARY KEY,
+        user_id INT,
+        product_id NVARCHAR(255),
+        quantity INT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users(id),
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    );
+    """
+    execute_query(connection, create_carts_table)
+
+    create_orders_table = """
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='orders' and xtype='U')
+    CREATE TABLE orders (
+        id INT IDENTITY(1,1) PRIMARY KEY,
+        user_id INT,
+        order_date DATETIME DEFAULT GETDATE(),
+        total_amount DECIMAL(10, 2) NOT NULL,
+        full_name NVARCHAR(255),
+        address NVARCHAR(MAX),
+        city NVARCHAR(255),
+        zip_code NVARCHAR(10),
+        phone NVARCHAR(20),
+        email NVARCHAR(255),
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    );
+    """
+    execute_query(connection, create_orders_table)
+
+    create_order_items_table = """
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='order_items' and xtype='U')
+    CREATE TABLE order_items (
+        id INT IDENTITY(1,1) PRIMARY KEY,
+        order_id INT,
+        product_id NVARCHAR(255),
+        quantity INT NOT NULL,
+        price_at_purchase DECIMAL(10, 2) NOT NULL,
+        FOREIGN KEY (order_id) REFERENCES orders(id),
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    );
+    """
+    execute_query(connection, create_order_items_table)
+
+    # Index unik untuk upsert keranjang atomik; baris duplikat lama digabung terlebih dahulu
+    create_carts_unique_index = """
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'UX_carts_user_product' AND object_id = OBJECT_ID('carts'))
+    BEGIN
+        UPDATE c SET quantity = d.total_quantity
+        FROM carts c
+        JOIN (SELECT MIN(id) AS keep_id, SUM(quantity) AS total_quantity
+              FROM carts GROUP BY user_id, product_id HAVING COUNT(*) > 1) d ON c.id = d.keep_id;
+
+        DELETE c
+        FROM carts c
+        JOIN (SELECT user_id, product_id, MIN(id) AS keep_id
+              FROM carts GROUP BY user_id, product_id HAVING COUNT(*) > 1) d
+          ON c.user_id = d.user_id AND c.product_id = d.product_id AND c.id <> d.keep_id;
+
+        CREATE UNIQUE INDEX UX_carts_user_product ON carts (user_id, product_id);
+    END
+    """
+    execute_query(connection, create_carts_unique_index)
+
+    # Index untuk filter/urutan/paginasi keyset di /products (seek, bukan scan)
+    product_indexes = {
+        'IX_products_price_id': "CREATE INDEX IX_products_price_id ON products (price, id)",
+        'IX_products_name_id': "CREATE INDEX IX_products_name_id ON products (name, id)",
+        'IX_products_discounted': "CREATE INDEX IX_products_discounted ON products (discount, id) WHERE discount > 0",
+    }
+    for index_name, create_index in product_indexes.items():
+        execute_query(connection, f"""
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = '{index_name}' AND object_id = OBJECT_ID('products'))
+        {create_index};
+        """)
+    # Filter in_stock memakai stok bebas (stock - reserved), yang tidak bisa menjadi predikat filtered index;
+    # index lama dengan predikat stock > 0 dihapus (urutan harga tetap memakai IX_products_price_id)
+    execute_query(connection, """
+    IF EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_products_in_stock_price' AND object_id = OBJECT_ID('products'))
+        DROP INDEX IX_products_in_stock_price ON products;
+    """)
+
+    # Ringkasan pesanan untuk riwayat (/orders); pesanan lama diisi dari order_items
+    execute_query(connection, """
+    IF COL_LENGTH('orders', 'item_count') IS NULL
+        ALTER TABLE orders ADD item_count INT NULL, line_count INT NULL;
+    """)
+    execute_query(connection, """
+    UPDATE o SET item_count = COALESCE(s.item_count, 0), line_count = COALESCE(s.line_count, 0)
+    FROM orders o
+    LEFT JOIN (SELECT order_id, SUM(quantity) AS item_count, COUNT(*) AS line_count
+               FROM order_items GROUP BY order_id) s ON s.order_id = o.id
+    WHERE o.item_count IS NULL;
+    """)
+
+    # Index riwayat pesanan: halaman per user tanpa sort, baris per pesanan tanpa scan
+    order_indexes = {
+        'IX_orders_user_date': ('orders', "CREATE INDEX IX_orders_user_date ON orders (user_id, order_date DESC, id DESC) "
+                                          "INCLUDE (total_amount, item_count, line_count)"),
+        'IX_order_items_order': ('order_items', "CREATE INDEX IX_order_items_order ON order_items (order_id) "
+                                                "INCLUDE (product_id, quantity, price_at_purchase)"),
+    }
+    for index_name, (table_name, create_index) in order_indexes.items():
+        execute_query(connection, f"""
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = '{index_name}' AND object_id = OBJECT_ID('{table_name}'))
+        {create_index};
+        """)
+
+    # Reservasi stok: kolom penahan di products, tabel hold per user, dan shard untuk produk yang sangat laris
+    reservation_columns = {
+        'reserved': "ALTER TABLE products ADD reserved INT NOT NULL DEFAULT 0",
+        'stock_shards': "ALTER TABLE products ADD stock_shards INT NOT NULL DEFAULT 0",
+    }
+    for column_name, add_column in reservation_columns.items():
+        execute_query(connection, f"IF COL_LENGTH('products', '{column_name}') IS NULL {add_column};")
+
+    create_stock_reservations_table = """
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='stock_reservations' and xtype='U')
+    BEGIN
+        CREATE TABLE stock_reservations (
+            id INT IDENTITY(1,1) PRIMARY KEY,
+            user_id INT NOT NULL,
+            product_id NVARCHAR(255) NOT NULL,
+            quantity INT NOT NULL,
+            shard INT NULL,
+            expires_at DATETIME2 NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        );
+        CREATE UNIQUE INDEX UX_stock_reservations_user_product ON stock_reservations (user_id, product_id);
+        CREATE INDEX IX_stock_reservations_expires ON stock_reservations (expires_at);
+    END
+    """
+    execute_query(connection, create_stock_reservations_table)
+
+    create_stock_shards_table = """
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='stock_shards' and xtype='U')
+    CREATE TABLE stock_shards (
+        product_id NVARCHAR(255) NOT NULL,
+        shard INT NOT NULL,
+        stock INT NOT NULL,
+        reserved INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (product_id, shard),
+        FOREIGN KEY (product_id) REFERENCES products(id)
+    );
+    """
+    execute_query(connection, create_stock_shards_table)
+
+    # Antrean job background (lihat jobs.py)
+    create_jobs_table = """
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='jobs' and xtype='U')
+    BEGIN
+        CREATE TABLE jobs (
+            id BIGINT IDENTITY(1,1) PRIMARY KEY,
+            kind NVARCHAR(100) NOT NULL,
+            payload NVARCHAR(MAX),
+            idempotency_key NVARCHAR(255) NULL,
+            status NVARCHAR(20) NOT NULL DEFAULT 'pending',
+            attempts INT NOT NULL DEFAULT 0,
+            max_attempts INT NOT NULL,
+            run_at DATETIME2 NOT NULL,
+            created_at DATETIME2 NOT NULL,
+            started_at DATETIME2 NULL,
+            finished_at DATETIME2 NULL,
+            locked_until DATETIME2 NULL,
+            last_error NVARCHAR(MAX) NULL
+        );
+        CREATE UNIQUE INDEX UX_jobs_idempotency_key ON jobs (idempotency_key) WHERE idempotency_key IS NOT NULL;
+        CREATE INDEX IX_jobs_status_run_at ON jobs (status, run_at);
+    END
+    """
+    execute_query(connection, create_jobs_table)
+
+    # Hasil /place_order per Idempotency-Key (lihat idempotency.py)
+    create_idempotency_keys_table = """
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='idempotency_keys' and xtype='U')
+    BEGIN
+        CREATE TABLE idempotency_keys (
+            user_id INT NOT NULL,
+            idem_key NVARCHAR(255) NOT NULL,
+            request_hash CHAR(64) NOT NULL,
+            status_code INT NOT NULL,
+            response_body NVARCHAR(MAX) NOT NULL,
+            created_at DATETIME2 NOT NULL,
+            PRIMARY KEY (user_id, idem_key),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        );
+        CREATE INDEX IX_idempotency_keys_created ON idempotency_keys (created_at);
+    END
+    """
+    execute_query(connection, create_idempotency_keys_table)
+
+    products = fetch_query(connection, "SELECT TOP 1 * FROM products")
+    if not products:
+        print("Menambahkan produk contoh...")
+        # Satu INSERT multi-baris; untuk katalog besar gunakan import_products.py
+        insert_product_query = """
+        INSERT INTO products (id, name, description, price, original_price, discount, image_url, stock)
+        VALUES """ + ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?)"] * len(SAMPLE_PRODUCTS))
+        execute_query(connection, insert_product_query, [value for product in SAMPLE_PRODUCTS for value in product])
+        print("Produk contoh berhasil ditambahkan.")
+
+def setup_sqlite_database(connection):
+    """
+    Mengatur skema yang setara di SQLite, dipakai sebagai pengganti lokal SQL Server
+    untuk pengujian dan benchmark.
+    """
+    connection.executescript("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        email TEXT UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS products (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT,
+        price NUMERIC NOT NULL,
+        original_price NUMERIC,
+        discount INTEGER DEFAULT 0,
+        image_url TEXT,
+        stock INTEGER DEFAULT 0,
+        reserved INTEGER NOT NULL DEFAULT 0,
+        stock_shards INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS carts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER REFERENCES users(id),
+        product_id TEXT REFERENCES products(id),
+        quantity INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER REFERENCES users(id),
+        order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        total_amount NUMERIC NOT NULL,
+        full_name TEXT,
+        address TEXT,
+        city TEXT,
+        zip_code TEXT,
+        phone TEXT,
+        email TEXT,
+        item_count INTEGER,
+        line_count INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS order_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER REFERENCES orders(id),
+        product_id TEXT REFERENCES products(id),
+        quantity INTEGER NOT NULL,
+        price_at_purchase NUMERIC NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS stock_reservations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        product_id TEXT NOT NULL REFERENCES products(id),
+        quantity INTEGER NOT NULL,
+        shard INTEGER,
+        expires_at TIMESTAMP NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS stock_shards (
+        product_id TEXT NOT NULL REFERENCES products(id),
+        shard INTEGER NOT NULL,
+        stock INTEGER NOT NULL,
+        reserved INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (product_id, shard)
+    );
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        payload TEXT,
+        idempotency_key TEXT UNIQUE,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        run_at TIMESTAMP NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP,
+        locked_until TIMESTAMP,
+        last_error TEXT
+    );
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        idem_key TEXT NOT NULL,
+        request_hash TEXT NOT NULL,
+        status_code INTEGER NOT NULL,
+        response_body TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (user_id, idem_key)
+    );
+    CREATE INDEX IF NOT EXISTS IX_jobs_status_run_at ON jobs (status, run_at);
+    CREATE INDEX IF NOT EXISTS IX_idempotency_keys_created ON idempotency_keys (created_at);
+    CREATE UNIQUE INDEX IF NOT EXISTS UX_carts_user_product ON carts (user_id, product_id);
+    CREATE UNIQUE INDEX IF NOT EXISTS UX_stock_reservations_user_product ON stock_reservations (user_id, product_id);
+    CREATE INDEX IF NOT EXISTS IX_stock_reservations_expires ON stock_reservations (expires_at);
+    CREATE INDEX IF NOT EXISTS IX_orders_user_date ON orders (user_id, order_date DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS IX_order_items_order ON order_items (order_id);
+    CREATE INDEX IF NOT EXISTS IX_products_price_id ON products (price, id);
+    CREATE INDEX IF NOT EXISTS IX_products_name_id ON products (name, id);
+    CREATE INDEX IF NOT EXISTS IX_products_discounted ON products (discount, id) WHERE discount > 0;
+    DROP INDEX IF EXISTS IX_products_in_stock_price; -- Diganti filter stock - reserved > 0 (lihat setup_database)
+    """)
+
+    # Database lama: tambahkan kolom yang belum ada
+    added_columns = {
+        'products': {'reserved': "INTEGER NOT NULL DEFAULT 0", 'stock_shards': "INTEGER NOT NULL DEFAULT 0"},
+        'orders': {'item_count': "INTEGER", 'line_count': "INTEGER"},
+    }
+    for table_name, definitions in added_columns.items():
+        columns = {row['name'] for row in fetch_query(connection, f"PRAGMA table_info({table_name})")}
+        for column_name, definition in definitions.items():
+            if column_name not in columns:
+                connection.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}")
+    connection.execute("""
+    UPDATE orders SET
+        item_count = (SELECT COALESCE(SUM(quantity), 0) FROM order_items WHERE order_id = orders.id),
+        line_count = (SELECT COUNT(*) FROM order_items WHERE order_id = orders.id)
+    WHERE item_count IS NULL
+    """)
+
+    products = fetch_query(connection, "SELECT * FROM products LIMIT 1")
+    if not products:
+        connection.executemany("""
+        INSERT INTO products (id, name, description, price, original_price, discount, image_url, stock)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, SAMPLE_PRODUCTS)
+    connection.commit()
+
+if __name__ == "__main__":
+    # Ganti dengan detail koneksi database SQL Server Anda
+    # SERVER: Biasanya 'localhost' atau '.\SQLEXPRESS' atau nama server/IP
+    # DATABASE: Nama database yang akan dibuat/digunakan
+    # DRIVER: Sesuaikan dengan driver ODBC yang terinstal di sistem Anda.
+    #         Contoh: "{ODBC Driver 17 for SQL Server}" atau "{SQL Server}"
+    
+    DB_SERVER = "LAPTOP-DU6E16BV" # Ganti dengan nama server SQL Server Anda
+    DB_NAME = "FarhanShopDB" # Nama database yang akan dibuat
+
+    # Koneksi ke master database untuk membuat database baru jika belum ada
+    # Tidak perlu username/password karena menggunakan Trusted_Connection
+    master_conn = create_db_connection(DB_SERVER, "master") # Perhatikan tidak ada username/password
+    if master_conn:
+        create_database_query = f"IF NOT EXISTS (SELECT name FROM sys.databases WHERE name = N'{DB_NAME}') CREATE DATABASE {DB_NAME};"
+        execute_query(master_conn, create_database_query)
+        master_conn.close()
+        print(f"Database '{DB_NAME}' siap digunakan.")
+
+    # Koneksi langsung ke database yang baru dibuat/sudah ada untuk setup tabel
+    connection = create_db_connection(DB_SERVER, DB_NAME) # Perhatikan tidak ada username/password
+    if connection:
+        setup_database(connection, DB_NAME)
+        connection.close()
+    else:
+        print("Gagal terhubung ke database untuk setup tabel.")
+
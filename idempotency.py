@@ -0,0 +1,197 @@
+import argparse
+import datetime
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+MAX_KEY_LENGTH = 255
+
+SELECT_KEY_SQL = """
+    SELECT request_hash, status_code, response_body FROM idempotency_keys
+    WHERE user_id = ? AND idem_key = ? AND created_at >= ?
+    """
+
+PURGE_KEYS_SQL = {
+    'mssql': "DELETE TOP (?) FROM idempotency_keys WHERE created_at < ?",
+    'sqlite': "DELETE FROM idempotency_keys WHERE rowid IN (SELECT rowid FROM idempotency_keys WHERE created_at < ? LIMIT ?)",
+}
+
+
+class IdempotencyError(ValueError):
+    """
+    Idempotency-Key tidak valid atau dipakai ulang untuk request yang berbeda.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+def fingerprint(value):
+    """
+    Hash SHA-256 dari representasi JSON kanonis `value` (urutan key tidak berpengaruh).
+    """
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(',', ':'), default=str).encode()).hexdigest()
+
+def validate_key(key):
+    if not key or len(key) > MAX_KEY_LENGTH or not key.isprintable():
+        raise IdempotencyError(f"Idempotency-Key harus berisi 1-{MAX_KEY_LENGTH} karakter yang dapat dicetak")
+    return key
+
+
+class _InFlight:
+    def __init__(self, request_hash):
+        self.request_hash = request_hash
+        self.done = threading.Event()
+        self.result = None
+
+
+class IdempotencyKeys:
+    """
+    Idempotency-Key untuk endpoint yang menulis data (saat ini /place_order).
+
+    Hasil yang berhasil disimpan di tabel idempotency_keys dalam transaksi yang sama dengan
+    datanya (lihat record()), beserta hash request agar key tidak bisa dipakai untuk isi yang berbeda.
+    Cache LRU di depan tabel membuat retry cukup dilayani dari memori, dan request duplikat yang
+    datang bersamaan di proses yang sama menunggu satu eksekusi alih-alih menjalankannya lagi.
+    Duplikat di proses lain ditolak oleh primary key tabel dan hasil pertama yang dikembalikan.
+    """
+
+    def __init__(self, maxsize=10000, ttl=24 * 3600, wait_timeout=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl # Detik key berlaku; setelah itu key yang sama dianggap request baru
+        self.wait_timeout = wait_timeout # Detik duplikat menunggu eksekusi yang sedang berjalan
+        self._cache = OrderedDict() # (user_id, key) -> (request_hash, status, body, created)
+        self._in_flight = {} # (user_id, key) -> _InFlight
+        self._lock = threading.Lock()
+        self._stats = {'executed': 0, 'cache_hits': 0, 'db_hits': 0, 'coalesced': 0, 'conflicts': 0}
+
+    def run(self, user_id, key, request_hash, lookup, execute):
+        """
+        Menjalankan `execute` paling banyak sekali untuk (user_id, key).
+
+        lookup() mencari hasil tersimpan di database: (request_hash, status, body) atau None.
+        execute() mengembalikan ((status, body), stored); stored=True jika hasil sudah
+        dicatat lewat record() sehingga boleh di-cache. Mengembalikan ((status, body), replayed).
+        """
+        cache_key = (user_id, key)
+        with self._lock:
+            entry = self._cache.get(cache_key)
+            if entry is not None and time.time() - entry[3] < self.ttl:
+                self._cache.move_to_end(cache_key)
+                self._stats['cache_hits'] += 1
+                return self._replay(entry[0], request_hash, (entry[1], entry[2])), True
+            flight = self._in_flight.get(cache_key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[cache_key] = _InFlight(request_hash)
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout) or flight.result is None:
+                raise IdempotencyError("Request dengan Idempotency-Key ini masih diproses", 409)
+            self._stats['coalesced'] += 1
+            return self._replay(flight.request_hash, request_hash, flight.result), True
+
+        try:
+            stored = lookup()
+            if stored is None:
+                flight.result, is_stored = execute()
+                self._stats['executed'] += 1
+                if is_stored:
+                    self._remember(cache_key, request_hash, flight.result)
+                    return flight.result, False
+                if flight.result[0] < 500:
+                    return flight.result, False
+                # Gagal di server, mungkin karena proses lain lebih dulu mencatat key yang sama (INSERT bentrok)
+                stored = lookup()
+                if stored is None:
+                    return flight.result, False
+            self._stats['db_hits'] += 1
+            flight.request_hash, flight.result = stored[0], (stored[1], stored[2])
+            self._remember(cache_key, stored[0], flight.result)
+            return self._replay(stored[0], request_hash, flight.result), True
+        finally:
+            with self._lock:
+                del self._in_flight[cache_key]
+            flight.done.set()
+
+    def record(self, cursor, user_id, key, request_hash, status, body):
+        """
+        Menyimpan hasil di transaksi pemanggil. Jika key yang sama sudah dicatat proses lain,
+        INSERT gagal karena primary key dan seluruh transaksi harus di-rollback.
+        """
+        now = _now()
+        # Key kedaluwarsa yang belum dibersihkan tidak boleh menghalangi pemakaian ulang
+        cursor.execute("DELETE FROM idempotency_keys WHERE user_id = ? AND idem_key = ? AND created_at < ?",
+                       (user_id, key, now - datetime.timedelta(seconds=self.ttl)))
+        cursor.execute(
+            "INSERT INTO idempotency_keys (user_id, idem_key, request_hash, status_code, response_body, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, key, request_hash, status, body.decode() if isinstance(body, bytes) else body, now)
+        )
+
+    def lookup(self, cursor, user_id, key):
+        cursor.execute(SELECT_KEY_SQL, (user_id, key, _now() - datetime.timedelta(seconds=self.ttl)))
+        row = cursor.fetchone()
+        return None if row is None else (row[0], row[1], row[2].encode())
+
+    def purge(self, conn, batch_size=1000):
+        """
+        Menghapus key kedaluwarsa (dipanggil berkala dari pemeliharaan job_queue).
+        """
+        cutoff = _now() - datetime.timedelta(seconds=self.ttl)
+        cursor = conn.cursor()
+        try:
+            if conn.backend.name == 'mssql':
+                cursor.execute(PURGE_KEYS_SQL['mssql'], (batch_size, cutoff))
+            else:
+                cursor.execute(PURGE_KEYS_SQL['sqlite'], (cutoff, batch_size))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, cached=len(self._cache), in_flight=len(self._in_flight))
+
+    def _replay(self, stored_hash, request_hash, result):
+        if stored_hash != request_hash:
+            self._stats['conflicts'] += 1
+            raise IdempotencyError("Idempotency-Key sudah dipakai untuk request yang berbeda", 422)
+        return result
+
+    def _remember(self, cache_key, request_hash, result):
+        with self._lock:
+            self._cache[cache_key] = (request_hash, result[0], result[1], time.time())
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+
+idempotency_keys = IdempotencyKeys()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pemeliharaan tabel idempotency_keys.")
+    parser.add_argument('command', choices=('purge',))
+    args = parser.parse_args()
+
+    from app import DB_CONFIG, idempotency_keys # TTL dari konfigurasi app.py
+    from db import get_pool
+    conn = get_pool(DB_CONFIG).acquire()
+    try:
+        total = 0
+        while True:
+            removed = idempotency_keys.purge(conn)
+            total += removed
+            if removed < 1000:
+                break
+        print(f"{total} key kedaluwarsa dihapus")
+    finally:
+        conn.close()
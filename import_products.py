@@ -0,0 +1,320 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+from db import DB_ERRORS, create_backend
+from reservations import set_sharded_stock
+
+COLUMNS = ('id', 'name', 'description', 'price', 'original_price', 'discount', 'image_url', 'stock')
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ProductImportError(ValueError):
+    """
+    Baris atau file input tidak valid.
+    """
+
+
+def read_json_array(f):
+    """
+    Membaca array JSON besar (seperti products.json) elemen demi elemen tanpa memuat seluruh file.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    started = False
+    eof = False
+    while True:
+        # Lewati spasi dan pemisah sebelum elemen berikutnya
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = buffer[pos:] + f.read(READ_CHUNK_SIZE), 0
+            eof = len(buffer) == 0
+        if pos >= len(buffer):
+            raise ProductImportError("Array JSON tidak ditutup")
+        if not started:
+            if buffer[pos] != '[':
+                raise ProductImportError("File JSON harus berisi array produk")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == ']':
+            return
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    raise ProductImportError(f"JSON tidak valid di sekitar karakter {pos}")
+                buffer, pos = buffer[pos:] + chunk, 0
+        yield item
+        pos = end
+
+def read_ndjson(f):
+    for line_no, line in enumerate(f, 1):
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                raise ProductImportError(f"JSON tidak valid di baris {line_no}")
+
+def read_csv(f):
+    yield from csv.DictReader(f)
+
+READERS = {'json': read_json_array, 'ndjson': read_ndjson, 'csv': read_csv}
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension == 'jsonl':
+        return 'ndjson'
+    if extension not in READERS:
+        raise ProductImportError(f"Format file tidak dikenal: {path}. Gunakan --format")
+    return extension
+
+def normalize(record):
+    """
+    Mengubah satu record input menjadi tuple sesuai urutan COLUMNS.
+    """
+    def value(name):
+        v = record.get(name)
+        return None if v in ('', None) else v
+
+    def decimal(name):
+        v = value(name)
+        if v is None:
+            return None
+        try:
+            return Decimal(str(v))
+        except InvalidOperation:
+            raise ProductImportError(f"{name} tidak valid untuk produk {record.get('id')}: {v}")
+
+    def integer(name, default):
+        v = value(name)
+        try:
+            return default if v is None else int(v)
+        except ValueError:
+            raise ProductImportError(f"{name} tidak valid untuk produk {record.get('id')}: {v}")
+
+    if not value('id') or not value('name') or value('price') is None:
+        raise ProductImportError(f"Produk wajib memiliki id, name, dan price: {record}")
+    return (str(record['id']), record['name'], value('description'), decimal('price'),
+            decimal('original_price'), integer('discount', 0), value('image_url'), integer('stock', 0))
+
+def batches(records, size):
+    """
+    Mengelompokkan record menjadi batch berisi `size` produk unik (id ganda: baris terakhir menang).
+    """
+    batch = {}
+    for record in records:
+        row = normalize(record)
+        batch[row[0]] = row
+        if len(batch) >= size:
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        yield list(batch.values())
+
+
+class SqlServerUpsert:
+    """
+    Upsert batch ke SQL Server: baris dikirim ke tabel sementara dengan fast_executemany,
+    lalu satu MERGE memperbarui hanya baris yang berubah.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        cursor = conn.cursor()
+        cursor.execute("""
+        CREATE TABLE #product_import (
+            id NVARCHAR(255) PRIMARY KEY,
+            name NVARCHAR(255) NOT NULL,
+            description NVARCHAR(MAX),
+            price DECIMAL(10, 2) NOT NULL,
+            original_price DECIMAL(10, 2),
+            discount INT,
+            image_url NVARCHAR(255),
+            stock INT
+        )
+        """)
+        conn.commit()
+        cursor.close()
+
+    def upsert(self, rows):
+        cursor = self.conn.cursor()
+        try:
+            cursor.fast_executemany = True
+            cursor.execute("TRUNCATE TABLE #product_import")
+            cursor.executemany(
+                f"INSERT INTO #product_import ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows
+            )
+            cursor.execute("""
+            SELECT s.id, s.stock, t.stock_shards FROM #product_import s
+            JOIN products t WITH (UPDLOCK) ON t.id = s.id
+            WHERE (t.stock_shards = 0 AND s.stock < t.reserved) OR (t.stock_shards > 0 AND s.stock <> t.stock)
+            """)
+            clamped, sharded = _split_stock_rows(cursor.fetchall())
+            # Stok tidak boleh di bawah hold (reserved); stok produk yang di-shard ditulis ke stock_shards
+            cursor.execute("""
+            MERGE products AS t
+            USING #product_import AS s ON t.id = s.id
+            WHEN MATCHED AND EXISTS (
+                SELECT s.name, s.description, s.price, s.original_price, s.discount, s.image_url,
+                       CASE WHEN t.stock_shards = 0 AND s.stock < t.reserved THEN t.reserved ELSE s.stock END
+                EXCEPT
+                SELECT t.name, t.description, t.price, t.original_price, t.discount, t.image_url, t.stock
+            ) THEN UPDATE SET
+                name = s.name, description = s.description, price = s.price, original_price = s.original_price,
+                discount = s.discount, image_url = s.image_url,
+                stock = CASE WHEN t.stock_shards > 0 THEN t.stock WHEN s.stock < t.reserved THEN t.reserved ELSE s.stock END
+            WHEN NOT MATCHED THEN
+                INSERT (id, name, description, price, original_price, discount, image_url, stock)
+                VALUES (s.id, s.name, s.description, s.price, s.original_price, s.discount, s.image_url, s.stock)
+            OUTPUT $action;
+            """)
+            actions = [row[0] for row in cursor.fetchall()]
+            for product_id, stock in sharded:
+                clamped += set_sharded_stock(cursor, product_id, stock)
+            self.conn.commit()
+            return actions.count('INSERT'), actions.count('UPDATE'), clamped
+        except DB_ERRORS:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+class SqliteUpsert:
+    """
+    Upsert batch ke SQLite dengan INSERT ... ON CONFLICT yang hanya menulis baris yang berubah.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def upsert(self, rows):
+        cursor = self.conn.cursor()
+        try:
+            ids = [row[0] for row in rows]
+            existing = {}
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                cursor.execute(
+                    f"SELECT id, stock, reserved, stock_shards FROM products WHERE id IN ({', '.join('?' * len(part))})", part
+                )
+                existing.update((row[0], row[1:]) for row in cursor.fetchall())
+            stock_rows = []
+            for row in rows:
+                if row[0] in existing:
+                    stock, reserved, shards = existing[row[0]]
+                    if (shards and row[7] != stock) or (not shards and row[7] < reserved):
+                        stock_rows.append((row[0], row[7], shards))
+            clamped, sharded = _split_stock_rows(stock_rows)
+            before = self.conn.total_changes
+            cursor.executemany(f"""
+            INSERT INTO products ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})
+            ON CONFLICT (id) DO UPDATE SET
+                name = excluded.name, description = excluded.description, price = excluded.price,
+                original_price = excluded.original_price, discount = excluded.discount,
+                image_url = excluded.image_url,
+                stock = CASE WHEN products.stock_shards > 0 THEN products.stock ELSE max(excluded.stock, products.reserved) END
+            WHERE products.name IS NOT excluded.name OR products.description IS NOT excluded.description
+               OR products.price IS NOT excluded.price OR products.original_price IS NOT excluded.original_price
+               OR products.discount IS NOT excluded.discount OR products.image_url IS NOT excluded.image_url
+               OR products.stock IS NOT CASE WHEN products.stock_shards > 0 THEN excluded.stock
+                                             ELSE max(excluded.stock, products.reserved) END
+            """, rows)
+            inserted = len(set(ids) - set(existing))
+            updated = self.conn.total_changes - before - inserted
+            for product_id, stock in sharded:
+                clamped += set_sharded_stock(cursor, product_id, stock)
+            self.conn.commit()
+            return inserted, updated, clamped
+        except DB_ERRORS:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+def _split_stock_rows(rows):
+    """
+    Memisahkan baris (id, stok impor, stock_shards) yang stoknya butuh penanganan khusus:
+    mengembalikan (jumlah produk tanpa shard yang stoknya dinaikkan ke reserved, [(id, stok)] produk ber-shard).
+    Stok produk ber-shard ditulis lewat set_sharded_stock agar tidak ditimpa ringkasan dari stock_shards.
+    """
+    clamped = 0
+    sharded = []
+    for product_id, stock, shards in rows:
+        if shards:
+            sharded.append((product_id, stock))
+        else:
+            clamped += 1
+    return clamped, sharded
+
+UPSERTERS = {'mssql': SqlServerUpsert, 'sqlite': SqliteUpsert}
+
+def import_products(conn, backend, records, batch_size=1000, progress=True):
+    """
+    Mengimpor record produk secara streaming dalam transaksi per batch.
+    Mengembalikan ringkasan jumlah baris dan kecepatan.
+    """
+    upserter = UPSERTERS[backend.name](conn)
+    totals = {'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'clamped': 0}
+    start = time.perf_counter()
+    for batch in batches(records, batch_size):
+        inserted, updated, clamped = upserter.upsert(batch)
+        totals['rows'] += len(batch)
+        totals['clamped'] += clamped
+        totals['inserted'] += inserted
+        totals['updated'] += updated
+        totals['unchanged'] += len(batch) - inserted - updated
+        if progress:
+            elapsed = time.perf_counter() - start
+            print(f"{totals['rows']} baris ({totals['rows'] / elapsed:,.0f} baris/detik)", file=sys.stderr)
+    totals['seconds'] = round(time.perf_counter() - start, 3)
+    totals['rows_per_second'] = round(totals['rows'] / totals['seconds'], 1) if totals['seconds'] else None
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Impor katalog produk (JSON/NDJSON/CSV) ke tabel products.")
+    parser.add_argument('path', help="File input, atau '-' untuk stdin")
+    parser.add_argument('--format', choices=sorted(READERS), help="Default: dari ekstensi file")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Baris per batch/transaksi")
+    parser.add_argument('--backend', choices=sorted(UPSERTERS), help="Default: DB_CONFIG di app.py")
+    parser.add_argument('--server')
+    parser.add_argument('--database', help="Nama database SQL Server atau path file SQLite")
+    args = parser.parse_args()
+
+    from app import DB_CONFIG
+    config = dict(DB_CONFIG)
+    for key in ('backend', 'server', 'database'):
+        if getattr(args, key):
+            config[key] = getattr(args, key)
+
+    input_format = args.format or detect_format(args.path)
+    backend = create_backend(config)
+    conn = backend.connect()
+    try:
+        f = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8', newline='')
+        with f:
+            summary = import_products(conn, backend, READERS[input_format](f), args.batch_size)
+    except ProductImportError as e:
+        sys.exit(f"Impor gagal: {e}")
+    finally:
+        conn.close()
+    print(f"Selesai: {summary['rows']} baris ({summary['inserted']} baru, {summary['updated']} diperbarui, "
+          f"{summary['unchanged']} tidak berubah) dalam {summary['seconds']} detik "
+          f"-> {summary['rows_per_second']} baris/detik")
+    if summary['clamped']:
+        print(f"{summary['clamped']} produk memiliki stok impor di bawah jumlah yang ditahan keranjang; "
+              f"stoknya disamakan dengan jumlah tersebut")
@@ -0,0 +1,357 @@
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db import DB_ERRORS
+from metrics import metrics
+
+# Klaim job siap jalan (atau yang lease-nya habis karena worker mati) dan tandai 'running' dalam satu statement
+CLAIM_JOBS_SQL = {
+    'mssql': """
+    WITH next_jobs AS (
+        SELECT TOP (?) * FROM jobs WITH (UPDLOCK, READPAST, ROWLOCK)
+        WHERE (status = 'pending' AND run_at <= ?) OR (status = 'running' AND locked_until < ?)
+        ORDER BY run_at
+    )
+    UPDATE next_jobs SET status = 'running', attempts = attempts + 1, started_at = ?, locked_until = ?
+    OUTPUT inserted.id, inserted.kind, inserted.payload, inserted.attempts, inserted.max_attempts, inserted.run_at
+    """,
+    'sqlite': """
+    UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, locked_until = ?
+    WHERE id IN (
+        SELECT id FROM jobs
+        WHERE (status = 'pending' AND run_at <= ?) OR (status = 'running' AND locked_until < ?)
+        ORDER BY run_at LIMIT ?
+    )
+    RETURNING id, kind, payload, attempts, max_attempts, run_at
+    """,
+}
+
+INSERT_JOB_SQL = "INSERT INTO jobs (kind, payload, idempotency_key, max_attempts, run_at, created_at) VALUES (?, ?, ?, ?, ?, ?)"
+
+# Job dengan idempotency key yang sudah ada tidak ditambahkan lagi
+INSERT_UNIQUE_JOB_SQL = {
+    'mssql': """
+    INSERT INTO jobs (kind, payload, idempotency_key, max_attempts, run_at, created_at)
+    SELECT ?, ?, ?, ?, ?, ?
+    WHERE NOT EXISTS (SELECT 1 FROM jobs WITH (UPDLOCK, HOLDLOCK) WHERE idempotency_key = ?)
+    """,
+    'sqlite': INSERT_JOB_SQL + " ON CONFLICT (idempotency_key) DO NOTHING",
+}
+
+PURGE_JOBS_SQL = {
+    'mssql': "DELETE TOP (?) FROM jobs WHERE status = 'done' AND finished_at < ?",
+    'sqlite': "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status = 'done' AND finished_at < ? LIMIT ?)",
+}
+
+# Hasil job hanya ditulis jika attempts masih sama: worker yang lease-nya sudah diambil alih tidak menimpa status
+FINISH_JOB_SQL = {
+    'done': "UPDATE jobs SET status = 'done', finished_at = ?, locked_until = NULL, last_error = NULL WHERE id = ? AND attempts = ?",
+    'retry': "UPDATE jobs SET status = 'pending', run_at = ?, locked_until = NULL, last_error = ? WHERE id = ? AND attempts = ?",
+    'failed': "UPDATE jobs SET status = 'failed', finished_at = ?, locked_until = NULL, last_error = ? WHERE id = ? AND attempts = ?",
+}
+
+DEPTH_SQL = "SELECT status, COUNT(*), MIN(run_at) FROM jobs WHERE status <> 'done' GROUP BY status"
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+def _as_datetime(value):
+    # SQLite mengembalikan TIMESTAMP sebagai teks
+    return datetime.datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+class JobQueue:
+    """
+    Antrean job background di dalam proses dengan tabel `jobs` sebagai penyimpanan persisten.
+
+    enqueue() dipanggil di dalam transaksi handler, sehingga job hanya ada jika data yang
+    memicunya ikut di-commit; setelah commit pemanggil memanggil notify(). Thread dispatcher
+    mengklaim job sebanyak worker yang bebas (UPDLOCK + READPAST, jadi beberapa proses bisa
+    berbagi tabel yang sama) lalu menjalankannya di ThreadPoolExecutor berukuran tetap. Job yang gagal dicoba ulang dengan backoff
+    eksponensial sampai max_attempts, lalu ditandai 'failed'.
+
+    Job dijalankan minimal sekali: job yang worker-nya mati diklaim ulang setelah `lease`
+    detik, jadi handler harus aman dijalankan lebih dari sekali.
+    """
+
+    def __init__(self, workers=4, poll_interval=1.0, lease=300, max_attempts=5, backoff_base=2.0,
+                 backoff_max=600, retention=7 * 24 * 3600, stats_interval=10.0):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retention = retention # Detik job 'done' disimpan (selama itu idempotency key-nya tetap berlaku)
+        self.stats_interval = stats_interval
+        self.handlers = {}
+        self.maintenance = [] # Fungsi fn(conn) tambahan yang dijalankan dispatcher setiap stats_interval
+        self._stats = {'enqueued': 0, 'duplicates': 0, 'succeeded': 0, 'retried': 0, 'failed': 0, 'dispatch_errors': 0}
+        self._stats_lock = threading.Lock() # _stats diubah dari thread request, dispatcher, dan worker
+        self._depth = {} # Snapshot isi tabel jobs per status, diperbarui setiap stats_interval
+        self._active = 0
+        self._active_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._executor = None
+        self._thread = None
+
+    def handler(self, kind, max_attempts=None):
+        """
+        Decorator untuk mendaftarkan fungsi handler(payload) bagi jenis job `kind`.
+        """
+        def register(func):
+            self.handlers[kind] = (func, max_attempts)
+            return func
+        return register
+
+    def enqueue(self, cursor, backend, kind, payload=None, key=None, delay=0):
+        """
+        Menambahkan job di transaksi pemanggil; job baru terlihat oleh worker setelah commit.
+        Mengembalikan False jika job dengan idempotency `key` yang sama sudah pernah dibuat.
+        Job baru dihitung sebagai 'enqueued' saat notify() dipanggil setelah commit.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Jenis job tidak dikenal: {kind}")
+        max_attempts = self.handlers[kind][1] or self.max_attempts
+        now = _now()
+        params = (kind, json.dumps(payload), key, max_attempts, now + datetime.timedelta(seconds=delay), now)
+        if key is None:
+            cursor.execute(INSERT_JOB_SQL, params)
+        elif backend.name == 'mssql':
+            cursor.execute(INSERT_UNIQUE_JOB_SQL['mssql'], params + (key,))
+        else:
+            cursor.execute(INSERT_UNIQUE_JOB_SQL['sqlite'], params)
+        inserted = cursor.rowcount == 1
+        if not inserted:
+            self._count('duplicates')
+        return inserted
+
+    def notify(self, enqueued=0):
+        """
+        Membangunkan dispatcher setelah commit agar job baru tidak menunggu poll_interval.
+        `enqueued`: jumlah job yang baru di-commit (job dari transaksi yang di-rollback tidak dihitung).
+        """
+        if enqueued:
+            self._count('enqueued', enqueued)
+        self._wake.set()
+
+    def start(self, get_connection):
+        """
+        Menjalankan dispatcher dan worker pool di background (sekali per proses).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job-worker')
+        self._thread = threading.Thread(target=self._dispatch, args=(get_connection,), name='job-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """
+        Berhenti mengklaim job dan menunggu job yang sedang berjalan (maksimal `timeout` detik).
+        Job yang belum selesai diklaim ulang oleh proses lain setelah lease habis.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._executor is not None:
+            deadline = time.monotonic() + timeout
+            while self._active and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def run_pending(self, conn, limit=100):
+        """
+        Menjalankan job yang sudah jatuh tempo secara langsung di thread ini (CLI/pemeliharaan).
+        Mengembalikan jumlah job yang dijalankan.
+        """
+        jobs = self._claim(conn, limit)
+        for job in jobs:
+            self._execute(lambda: conn, job, close=False)
+        return len(jobs)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return dict(stats, **self._depth, active=self._active, workers=self.workers)
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _dispatch(self, get_connection):
+        last_maintenance = 0.0
+        while not self._stop.is_set():
+            free = self.workers - self._active
+            claimed = []
+            conn = get_connection() if free or time.monotonic() - last_maintenance >= self.stats_interval else None
+            if conn is not None:
+                try:
+                    if free:
+                        claimed = self._claim(conn, free)
+                    if time.monotonic() - last_maintenance >= self.stats_interval:
+                        self._maintain(conn)
+                        last_maintenance = time.monotonic()
+                except DB_ERRORS as e:
+                    self._count('dispatch_errors')
+                    print(f"Dispatcher job gagal: {e}")
+                    try:
+                        conn.rollback()
+                    except DB_ERRORS:
+                        conn.invalidate()
+                finally:
+                    conn.close()
+            for job in claimed:
+                with self._active_lock:
+                    self._active += 1
+                self._executor.submit(self._execute, get_connection, job)
+            if claimed and len(claimed) == free:
+                continue # Masih mungkin ada job lain yang menunggu; klaim lagi begitu ada worker bebas
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _claim(self, conn, limit):
+        now = _now()
+        locked_until = now + datetime.timedelta(seconds=self.lease)
+        if conn.backend.name == 'mssql':
+            params = (limit, now, now, now, locked_until)
+        else:
+            params = (now, locked_until, now, now, limit)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(CLAIM_JOBS_SQL[conn.backend.name], params)
+            jobs = [(row[0], row[1], row[2], row[3], row[4], _as_datetime(row[5]), now) for row in cursor.fetchall()]
+            conn.commit()
+            return jobs
+        finally:
+            cursor.close()
+
+    def _maintain(self, conn):
+        """
+        Menghapus job 'done' yang lebih lama dari retention, menjalankan tugas `maintenance`,
+        dan memperbarui snapshot kedalaman antrean.
+        """
+        cursor = conn.cursor()
+        try:
+            cutoff = _now() - datetime.timedelta(seconds=self.retention)
+            if conn.backend.name == 'mssql':
+                cursor.execute(PURGE_JOBS_SQL['mssql'], (1000, cutoff))
+            else:
+                cursor.execute(PURGE_JOBS_SQL['sqlite'], (cutoff, 1000))
+            conn.commit()
+            for task in self.maintenance:
+                task(conn)
+            cursor.execute(DEPTH_SQL)
+            depth = {'queue_pending': 0, 'queue_running': 0, 'queue_failed': 0, 'queue_oldest_pending_seconds': 0}
+            for status, count, oldest in cursor.fetchall():
+                depth[f'queue_{status}'] = count
+                if status == 'pending' and oldest is not None:
+                    depth['queue_oldest_pending_seconds'] = max(0, round((_now() - _as_datetime(oldest)).total_seconds(), 3))
+            self._depth = depth
+        finally:
+            cursor.close()
+
+    def _execute(self, get_connection, job, close=True):
+        job_id, kind, payload, attempts, max_attempts, run_at, claimed_at = job
+        start = time.perf_counter()
+        error = None
+        try:
+            handler = self.handlers.get(kind)
+            if handler is None:
+                raise LookupError(f"Tidak ada handler untuk job {kind}")
+            handler[0](json.loads(payload) if payload else None)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        duration = time.perf_counter() - start
+
+        if error is None:
+            outcome = 'done'
+        elif attempts < max_attempts:
+            outcome = 'retry'
+            print(f"Job {kind} #{job_id} gagal (percobaan {attempts}/{max_attempts}): {error}")
+        else:
+            outcome = 'failed'
+            print(f"Job {kind} #{job_id} gagal permanen setelah {attempts} percobaan: {error}")
+        self._count({'done': 'succeeded', 'retry': 'retried', 'failed': 'failed'}[outcome])
+        metrics.record_job(kind, outcome, max(0.0, (claimed_at - run_at).total_seconds()), duration)
+
+        try:
+            conn = get_connection()
+            if conn is None:
+                return # Status tetap 'running'; job diklaim ulang setelah lease habis
+            try:
+                self._finish(conn, job_id, attempts, outcome, error)
+            except DB_ERRORS as e:
+                print(f"Gagal menyimpan hasil job {kind} #{job_id}: {e}")
+                conn.rollback()
+            finally:
+                if close:
+                    conn.close()
+        finally:
+            if close:
+                with self._active_lock:
+                    self._active -= 1
+                self._wake.set() # Worker bebas: dispatcher boleh mengklaim lagi
+
+    def _finish(self, conn, job_id, attempts, outcome, error):
+        cursor = conn.cursor()
+        try:
+            if outcome == 'done':
+                cursor.execute(FINISH_JOB_SQL['done'], (_now(), job_id, attempts))
+            elif outcome == 'retry':
+                cursor.execute(FINISH_JOB_SQL['retry'], (_now() + datetime.timedelta(seconds=self._backoff(attempts)),
+                                                         error[:4000], job_id, attempts))
+            else:
+                cursor.execute(FINISH_JOB_SQL['failed'], (_now(), error[:4000], job_id, attempts))
+            conn.commit()
+        finally:
+            cursor.close()
+
+    def _backoff(self, attempts):
+        # Backoff eksponensial dengan jitter agar job yang gagal bersamaan tidak dicoba ulang serentak
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+
+job_queue = JobQueue()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pemeliharaan antrean job background.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status', help="Jumlah job per status")
+    subparsers.add_parser('run', help="Jalankan job yang jatuh tempo sekarang (tanpa server)")
+    retry_parser = subparsers.add_parser('retry', help="Jadwalkan ulang job yang 'failed'")
+    retry_parser.add_argument('job_id', type=int)
+    args = parser.parse_args()
+
+    from app import DB_CONFIG, job_queue # Handler job didaftarkan di app.py
+    from db import get_pool
+    conn = get_pool(DB_CONFIG).acquire()
+    try:
+        cursor = conn.cursor()
+        if args.command == 'status':
+            cursor.execute("SELECT status, COUNT(*), MIN(run_at) FROM jobs GROUP BY status")
+            for status, count, oldest in cursor.fetchall():
+                print(f"{status}: {count} (paling lama: {oldest})")
+        elif args.command == 'run':
+            start = time.perf_counter()
+            print(f"{job_queue.run_pending(conn)} job dijalankan ({time.perf_counter() - start:.2f} detik)")
+        else:
+            cursor.execute("UPDATE jobs SET status = 'pending', attempts = 0, run_at = ?, last_error = NULL "
+                           "WHERE id = ? AND status = 'failed'", (_now(), args.job_id))
+            conn.commit()
+            print(f"Job {args.job_id} dijadwalkan ulang" if cursor.rowcount else f"Job {args.job_id} tidak berstatus 'failed'")
+        cursor.close()
+    finally:
+        conn.close()
@@ -0,0 +1,254 @@
+import contextvars
+import cProfile
+import hmac
+import os
+import random
+import re
+import threading
+import time
+
+from flask import Response, abort, g, request
+
+import db
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+JOB_LATENCY_BUCKETS = LATENCY_BUCKETS + (30.0, 60.0, 300.0, 900.0) # Job bisa menunggu lama saat antre atau backoff
+
+# Statistik DB untuk request yang sedang berjalan: [jumlah query, detik DB]
+_request_db = contextvars.ContextVar('request_db', default=None)
+
+
+class Histogram:
+    """
+    Histogram kumulatif bergaya Prometheus dengan label.
+    """
+
+    def __init__(self, name, help_text, buckets, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self._series = {} # label values -> [counts per bucket..., +Inf count, sum]
+
+    def observe(self, value, labels=()):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            base = _format_labels(self.label_names, labels)
+            for bound, count in zip(self.buckets, series):
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_join_labels(base, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_join_labels(base, le)} {series[-2]}")
+            lines.append(f"{self.name}_count{_wrap(base)} {series[-2]}")
+            lines.append(f"{self.name}_sum{_wrap(base)} {series[-1]:.6f}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_wrap(_format_labels(self.label_names, labels))} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+def _join_labels(base, extra):
+    return "{" + (f"{base},{extra}" if base else extra) + "}"
+
+def _wrap(base):
+    return "{" + base + "}" if base else ""
+
+def _metric_name(text):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', text)
+
+
+class Metrics:
+    """
+    Registry metrik per proses: latensi per endpoint, waktu dan jumlah query DB per request,
+    waktu tunggu connection pool, jumlah error, serta latensi job background.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter('farhanshop_http_requests_total', 'Jumlah request HTTP',
+                                ('endpoint', 'method', 'status'))
+        self.errors = Counter('farhanshop_http_errors_total', 'Request yang berakhir 5xx atau exception',
+                              ('endpoint',))
+        self.latency = Histogram('farhanshop_http_request_duration_seconds', 'Latensi request HTTP',
+                                 LATENCY_BUCKETS, ('endpoint',))
+        self.db_time = Histogram('farhanshop_request_db_seconds', 'Total waktu query DB per request',
+                                 LATENCY_BUCKETS, ('endpoint',))
+        self.db_queries = Histogram('farhanshop_request_db_queries', 'Jumlah query DB per request',
+                                    QUERY_COUNT_BUCKETS, ('endpoint',))
+        self.pool_acquire = Histogram('farhanshop_db_pool_acquire_seconds', 'Waktu menunggu koneksi dari pool',
+                                      LATENCY_BUCKETS)
+        self.jobs = Counter('farhanshop_jobs_total', 'Job background yang selesai dijalankan', ('kind', 'outcome'))
+        self.job_wait = Histogram('farhanshop_job_wait_seconds', 'Waktu job menunggu di antrean sejak jatuh tempo',
+                                  JOB_LATENCY_BUCKETS, ('kind',))
+        self.job_duration = Histogram('farhanshop_job_duration_seconds', 'Waktu eksekusi handler job',
+                                      JOB_LATENCY_BUCKETS, ('kind',))
+        # Sumber gauge tambahan: nama -> fungsi yang mengembalikan dict angka
+        self.collectors = {}
+
+    def record_request(self, endpoint, method, status, seconds, db_stats):
+        with self._lock:
+            self.requests.inc((endpoint, method, str(status)))
+            if status >= 500:
+                self.errors.inc((endpoint,))
+            self.latency.observe(seconds, (endpoint,))
+            if db_stats is not None:
+                self.db_queries.observe(db_stats[0], (endpoint,))
+                self.db_time.observe(db_stats[1], (endpoint,))
+
+    def record_exception(self, endpoint):
+        with self._lock:
+            self.errors.inc((endpoint,))
+
+    def record_acquire(self, seconds):
+        with self._lock:
+            self.pool_acquire.observe(seconds)
+
+    def record_job(self, kind, outcome, wait_seconds, seconds):
+        with self._lock:
+            self.jobs.inc((kind, outcome))
+            self.job_wait.observe(wait_seconds, (kind,))
+            self.job_duration.observe(seconds, (kind,))
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.errors, self.latency, self.db_time, self.db_queries, self.pool_acquire,
+                           self.jobs, self.job_wait, self.job_duration):
+                lines.extend(metric.render())
+        for prefix, collect in self.collectors.items():
+            for key, value in collect().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"farhanshop_{prefix}_{_metric_name(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+_profile_lock = threading.Lock() # cProfile hanya boleh aktif di satu thread sekaligus
+
+def _record_query(seconds):
+    stats = _request_db.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += seconds
+
+def init_metrics(app):
+    """
+    Memasang middleware metrik dan endpoint /metrics pada aplikasi Flask.
+
+    Akses /metrics:
+    - METRICS_ALLOWED_IPS: IP yang boleh mengambil metrik tanpa token (default hanya localhost)
+    - METRICS_TOKEN: jika diatur, klien lain boleh mengambil metrik dengan `Authorization: Bearer <token>`
+    - SERVER_TIMING: True untuk menambahkan header Server-Timing (waktu DB) ke setiap respons
+
+    Konfigurasi profiler (opsional):
+    - PROFILE_SLOW_MS: request yang lebih lambat dari ini disimpan profilnya (None = nonaktif)
+    - PROFILE_SAMPLE_RATE: fraksi request yang diprofilkan (0..1)
+    - PROFILE_DIR: folder file .prof (format pstats; bisa dibuka dengan snakeviz/flameprof)
+    """
+    app.config.setdefault('METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    app.config.setdefault('METRICS_TOKEN', None)
+    app.config.setdefault('SERVER_TIMING', False)
+    app.config.setdefault('PROFILE_SLOW_MS', None)
+    app.config.setdefault('PROFILE_SAMPLE_RATE', 0.01)
+    app.config.setdefault('PROFILE_DIR', 'profiles')
+
+    db.query_listeners.append(_record_query)
+    db.acquire_listeners.append(metrics.record_acquire)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_db_token = _request_db.set([0, 0.0])
+        g.profiler = None
+        if app.config['PROFILE_SLOW_MS'] is not None and random.random() < app.config['PROFILE_SAMPLE_RATE']:
+            if _profile_lock.acquire(blocking=False):
+                g.profiler = cProfile.Profile()
+                g.profiler.enable()
+
+    @app.after_request
+    def finish_request_metrics(response):
+        start = g.get('metrics_start')
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        db_stats = _request_db.get()
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.record_request(endpoint, request.method, response.status_code, elapsed, db_stats)
+        if db_stats is not None and app.config['SERVER_TIMING']:
+            response.headers['Server-Timing'] = (
+                f"db;dur={db_stats[1] * 1000:.2f};desc=\"{db_stats[0]} queries\", total;dur={elapsed * 1000:.2f}"
+            )
+        _finish_profile(app, endpoint, elapsed)
+        return response
+
+    @app.teardown_request
+    def teardown_request_metrics(exc):
+        if exc is not None:
+            metrics.record_exception(request.url_rule.rule if request.url_rule else 'unmatched')
+        _finish_profile(app, None, None)
+        token = g.pop('metrics_db_token', None)
+        if token is not None:
+            _request_db.reset(token)
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        """
+        Endpoint metrik dalam format teks Prometheus (per proses).
+        Hanya untuk METRICS_ALLOWED_IPS atau klien yang membawa METRICS_TOKEN; selain itu 404.
+        """
+        if not _metrics_allowed(app):
+            abort(404) # Tidak memberi tahu bahwa endpoint ini ada
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def _metrics_allowed(app):
+    if request.remote_addr in app.config['METRICS_ALLOWED_IPS']:
+        return True
+    token = app.config['METRICS_TOKEN']
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get('Authorization', '').encode(), f"Bearer {token}".encode())
+
+def _finish_profile(app, endpoint, elapsed):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    try:
+        profiler.disable()
+        if elapsed is not None and elapsed * 1000 >= app.config['PROFILE_SLOW_MS']:
+            os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{_metric_name(endpoint.strip('/')) or 'root'}-{elapsed * 1000:.0f}ms.prof"
+            profiler.dump_stats(os.path.join(app.config['PROFILE_DIR'], name))
+            print(f"Request lambat {endpoint} ({elapsed * 1000:.0f} ms), profil disimpan ke {name}")
+    finally:
+        _profile_lock.release()
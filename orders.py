@@ -0,0 +1,203 @@
+import datetime
+from decimal import Decimal
+
+from catalog_query import QueryError, decode_cursor, encode_cursor
+from jobs import job_queue
+from reservations import stock_reservations
+
+# Batas baris per pesanan agar jumlah parameter tetap jauh di bawah batas SQL Server (2100)
+MAX_ORDER_LINES = 200
+
+# Riwayat pesanan: ringkasan (item_count/line_count) disimpan saat pesanan dibuat
+ORDER_COLUMNS = "id, order_date, total_amount, item_count, line_count, full_name, address, city, zip_code, phone, email"
+DEFAULT_ORDERS_LIMIT = 10
+MAX_ORDERS_LIMIT = 50
+
+
+class OrderError(Exception):
+    """
+    Pesanan tidak dapat dibuat. `status` adalah kode HTTP yang sesuai.
+    """
+    status = 400
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details
+
+
+class ProductNotFound(OrderError):
+    status = 404
+
+
+class OutOfStock(OrderError):
+    status = 409
+
+
+def normalize_items(items):
+    """
+    Memvalidasi item dari klien dan menggabungkan product_id yang sama.
+    Hanya id dan quantity yang dipakai; harga selalu diambil dari tabel products.
+    Mengembalikan dict {product_id: quantity} dengan urutan stabil.
+    """
+    if not isinstance(items, list) or not items:
+        raise OrderError('Keranjang kosong, tidak ada item untuk dipesan')
+    lines = {}
+    for item in items:
+        if not isinstance(item, dict):
+            raise OrderError('Format item pesanan tidak valid')
+        product_id = item.get('id')
+        quantity = item.get('quantity')
+        if isinstance(quantity, str) and quantity.isdigit():
+            quantity = int(quantity) # Kuantitas dari localStorage bisa berupa string
+        if not product_id or not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            raise OrderError('ID produk dan kuantitas item pesanan tidak valid')
+        lines[product_id] = lines.get(product_id, 0) + quantity
+    if len(lines) > MAX_ORDER_LINES:
+        raise OrderError(f'Maksimal {MAX_ORDER_LINES} produk berbeda per pesanan')
+    return lines
+
+def create_order(conn, user_id, shipping, lines, on_created=None):
+    """
+    Membuat pesanan secara set-based dengan jumlah round trip tetap, berapa pun jumlah barisnya:
+    harga dibaca sekali, baris pesanan disisipkan dengan satu INSERT multi-baris, dan hold
+    stok user diubah menjadi pengurangan stok (lihat reservations.StockReservations.consume)
+    dengan UPDATE bersyarat yang mendeteksi oversell.
+
+    Pengurangan stok dijalankan terakhir sehingga lock baris produk hanya ditahan
+    sampai commit. Job 'order_placed' ditambahkan di transaksi yang sama, jadi hanya ada
+    jika pesanan berhasil. Melempar OrderError (dan turunannya) tanpa mengubah data.
+    `shipping` berisi full_name, address, city, zip_code, phone, email.
+    `on_created(cursor, order_id, total_amount)` (opsional) dipanggil di transaksi yang sama
+    sebelum stok dikurangi, misalnya untuk mencatat Idempotency-Key.
+    Mengembalikan (order_id, total_amount).
+    """
+    product_ids = list(lines)
+    placeholders = ", ".join("?" * len(product_ids))
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT id, price, stock_shards FROM products WHERE id IN ({placeholders})", product_ids)
+        rows = cursor.fetchall()
+        prices = {row[0]: Decimal(str(row[1])) for row in rows}
+        shard_counts = {row[0]: row[2] for row in rows}
+        missing = [product_id for product_id in product_ids if product_id not in prices]
+        if missing:
+            raise ProductNotFound('Produk tidak ditemukan', {'product_ids': missing})
+
+        total_amount = sum(prices[product_id] * quantity for product_id, quantity in lines.items())
+
+        order_id = conn.backend.insert_returning_id(
+            cursor, 'orders',
+            ('user_id', 'total_amount', 'item_count', 'line_count',
+             'full_name', 'address', 'city', 'zip_code', 'phone', 'email'),
+            (user_id, total_amount, sum(lines.values()), len(lines),
+             shipping['full_name'], shipping['address'], shipping['city'],
+             shipping['zip_code'], shipping['phone'], shipping['email'])
+        )
+
+        line_params = []
+        for product_id, quantity in lines.items():
+            line_params.extend((order_id, product_id, quantity, prices[product_id]))
+        cursor.execute(
+            "INSERT INTO order_items (order_id, product_id, quantity, price_at_purchase) VALUES "
+            + ", ".join(["(?, ?, ?, ?)"] * len(lines)),
+            line_params
+        )
+
+        cursor.execute("DELETE FROM carts WHERE user_id = ?", (user_id,))
+
+        # Pekerjaan lanjutan dijalankan worker background setelah commit (lihat jobs.py)
+        enqueued = job_queue.enqueue(cursor, conn.backend, 'order_placed', {'order_id': order_id, 'user_id': user_id},
+                                     key=f"order_placed:{order_id}")
+        if on_created is not None:
+            on_created(cursor, order_id, total_amount)
+
+        shortages = stock_reservations.consume(cursor, conn.backend, user_id, lines, shard_counts)
+        if shortages:
+            raise OutOfStock('Stok tidak cukup untuk sebagian produk', {'shortages': shortages})
+        conn.commit()
+        job_queue.notify(enqueued=int(enqueued)) # Job sudah di-commit; worker langsung mengambilnya
+        return order_id, total_amount
+    except OrderError:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def parse_history_args(args):
+    """
+    Membaca parameter limit, cursor, dan lines untuk /orders.
+    Mengembalikan (limit, after, with_lines); after adalah (order_date, id) atau None.
+    """
+    try:
+        limit = int(args.get('limit', DEFAULT_ORDERS_LIMIT))
+    except ValueError:
+        raise OrderError("limit harus berupa angka")
+    if not 1 <= limit <= MAX_ORDERS_LIMIT:
+        raise OrderError(f"limit harus antara 1 dan {MAX_ORDERS_LIMIT}")
+    after = None
+    if args.get('cursor'):
+        try:
+            order_date, last_id = decode_cursor(args['cursor'], 'orders')
+            after = (datetime.datetime.fromisoformat(order_date), int(last_id))
+        except (QueryError, ValueError, TypeError):
+            raise OrderError("cursor tidak valid")
+    with_lines = args.get('lines', '1').lower() not in ('0', 'false', 'no')
+    return limit, after, with_lines
+
+def list_orders(cursor, backend, user_id, limit, after=None, with_lines=True):
+    """
+    Mengambil satu halaman pesanan user, terbaru dulu (keyset pada order_date, id).
+    Baris pesanan untuk seluruh halaman dimuat dengan satu query. Mengembalikan (orders, next_cursor).
+    """
+    query = f"SELECT {ORDER_COLUMNS} FROM orders WHERE user_id = ?"
+    params = [user_id]
+    if after is not None:
+        query += " AND (order_date < ? OR (order_date = ? AND id < ?))"
+        params.extend([after[0], after[0], after[1]])
+    query = backend.limit(query + " ORDER BY order_date DESC, id DESC", limit + 1)
+    cursor.execute(query, params)
+    orders = _rows_to_dicts(cursor)
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        last = orders[-1]
+        next_cursor = encode_cursor('orders', _isoformat(last['order_date']), last['id'])
+    if with_lines:
+        _attach_lines(cursor, orders)
+    return orders, next_cursor
+
+def get_order(cursor, user_id, order_id):
+    """
+    Mengambil satu pesanan milik user beserta barisnya, atau None jika tidak ada.
+    """
+    cursor.execute(f"SELECT {ORDER_COLUMNS} FROM orders WHERE id = ? AND user_id = ?", (order_id, user_id))
+    orders = _rows_to_dicts(cursor)
+    if not orders:
+        return None
+    _attach_lines(cursor, orders)
+    return orders[0]
+
+def _attach_lines(cursor, orders):
+    if not orders:
+        return
+    by_id = {order['id']: order for order in orders}
+    for order in orders:
+        order['items'] = []
+    cursor.execute(f"""
+    SELECT oi.order_id, oi.product_id, p.name, p.image_url, oi.quantity, oi.price_at_purchase
+    FROM order_items oi
+    LEFT JOIN products p ON p.id = oi.product_id
+    WHERE oi.order_id IN ({', '.join('?' * len(by_id))})
+    ORDER BY oi.order_id, oi.id
+    """, list(by_id))
+    for line in _rows_to_dicts(cursor):
+        by_id[line.pop('order_id')]['items'].append(line)
+
+def _rows_to_dicts(cursor):
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def _isoformat(value):
+    # SQL Server mengembalikan datetime, SQLite mengembalikan teks
+    return value.isoformat(' ') if isinstance(value, datetime.datetime) else str(value)
@@ -0,0 +1,204 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+LEGACY_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _b64encode(raw):
+    return base64.b64encode(raw).decode().rstrip('=')
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class PasswordHasher:
+    """
+    Hash password dengan KDF dari hashlib (scrypt atau PBKDF2-SHA256) dan salt acak.
+
+    Hash menyimpan parameternya sendiri, misalnya:
+        scrypt$16384$8$1$<salt>$<hash>
+        pbkdf2_sha256$600000$<salt>$<hash>
+    sehingga biaya bisa dinaikkan kapan saja; hash lama tetap bisa diverifikasi dan
+    needs_rehash() memberi tahu kapan perlu di-hash ulang. Hash SHA256 lama tanpa salt
+    (64 karakter hex) juga masih dikenali.
+
+    `max_concurrency` membatasi jumlah perhitungan KDF yang berjalan bersamaan agar
+    lonjakan login tidak memakai semua core CPU.
+    """
+
+    def __init__(self, scheme='scrypt', scrypt_n=2 ** 14, scrypt_r=8, scrypt_p=1,
+                 pbkdf2_iterations=600000, max_concurrency=None):
+        if scheme not in ('scrypt', 'pbkdf2_sha256'):
+            raise ValueError(f"Skema password tidak dikenal: {scheme}")
+        self.scheme = scheme
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self._slots = threading.BoundedSemaphore(max_concurrency or os.cpu_count() or 1)
+        self._dummy = None
+
+    def hash(self, password):
+        salt = os.urandom(16)
+        if self.scheme == 'scrypt':
+            params = (self.scrypt_n, self.scrypt_r, self.scrypt_p)
+            digest = self._scrypt(password, salt, *params)
+            return f"scrypt${params[0]}${params[1]}${params[2]}${_b64encode(salt)}${_b64encode(digest)}"
+        digest = self._pbkdf2(password, salt, self.pbkdf2_iterations)
+        return f"pbkdf2_sha256${self.pbkdf2_iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, password, stored):
+        """
+        Mencocokkan password dengan hash tersimpan dalam waktu konstan.
+        """
+        if not stored:
+            return False
+        if LEGACY_SHA256.match(stored):
+            candidate = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(candidate, stored)
+        try:
+            scheme, rest = stored.split('$', 1)
+            if scheme == 'scrypt':
+                n, r, p, salt, digest = rest.split('$')
+                candidate = self._scrypt(password, _b64decode(salt), int(n), int(r), int(p))
+            elif scheme == 'pbkdf2_sha256':
+                iterations, salt, digest = rest.split('$')
+                candidate = self._pbkdf2(password, _b64decode(salt), int(iterations))
+            else:
+                return False
+        except ValueError:
+            return False
+        return hmac.compare_digest(candidate, _b64decode(digest))
+
+    def needs_rehash(self, stored):
+        """
+        True jika hash memakai skema atau parameter selain konfigurasi saat ini.
+        """
+        if self.scheme == 'scrypt':
+            prefix = f"scrypt${self.scrypt_n}${self.scrypt_r}${self.scrypt_p}$"
+        else:
+            prefix = f"pbkdf2_sha256${self.pbkdf2_iterations}$"
+        return not stored.startswith(prefix)
+
+    def dummy_verify(self, password):
+        """
+        Menjalankan verifikasi dengan biaya yang sama untuk username yang tidak ada,
+        agar waktu respons tidak membocorkan username mana yang terdaftar.
+        """
+        if self._dummy is None:
+            self._dummy = self.hash('dummy-password')
+        self.verify(password, self._dummy)
+
+    def _scrypt(self, password, salt, n, r, p):
+        with self._slots:
+            return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                                  maxmem=256 * n * r * p, dklen=32)
+
+    def _pbkdf2(self, password, salt, iterations):
+        with self._slots:
+            return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+
+
+class LoginThrottle:
+    """
+    Membatasi percobaan login gagal per (username, IP) dan per IP dalam jendela waktu geser.
+    Percobaan yang sedang diblokir ditolak sebelum password di-hash sehingga tidak memakan CPU.
+    Paling banyak `max_keys` key disimpan; jika penuh, key dengan kegagalan terakhir paling lama dibuang.
+    """
+
+    def __init__(self, max_failures=5, max_failures_per_ip=50, window=300.0, max_keys=100000):
+        self.max_failures = max_failures
+        self.max_failures_per_ip = max_failures_per_ip
+        self.window = window
+        self.max_keys = max_keys
+        self._failures = OrderedDict() # key -> deque waktu kegagalan, urut kegagalan terakhir
+        self._lock = threading.Lock()
+
+    def retry_after(self, username, ip):
+        """
+        Mengembalikan jumlah detik sampai login boleh dicoba lagi, atau 0 jika tidak diblokir.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return max(
+                self._blocked_for(('user', username.lower(), ip), self.max_failures, now),
+                self._blocked_for(('ip', ip), self.max_failures_per_ip, now),
+            )
+
+    def record_failure(self, username, ip):
+        now = time.monotonic()
+        with self._lock:
+            for key in (('user', username.lower(), ip), ('ip', ip)):
+                self._failures.setdefault(key, deque()).append(now)
+                self._failures.move_to_end(key)
+            self._prune(now)
+
+    def reset(self, username, ip):
+        with self._lock:
+            self._failures.pop(('user', username.lower(), ip), None)
+
+    def _blocked_for(self, key, limit, now):
+        attempts = self._failures.get(key)
+        if not attempts:
+            return 0
+        while attempts and now - attempts[0] > self.window:
+            attempts.popleft()
+        if len(attempts) < limit:
+            return 0
+        return int(self.window - (now - attempts[-limit])) + 1
+
+    def _prune(self, now):
+        # Key terdepan adalah yang paling lama tidak gagal: buang selama sudah kadaluarsa atau melebihi max_keys
+        while self._failures:
+            attempts = next(iter(self._failures.values()))
+            if attempts and now - attempts[-1] <= self.window and len(self._failures) <= self.max_keys:
+                break
+            self._failures.popitem(last=False)
+
+
+def calibrate(target_ms, scheme='scrypt'):
+    """
+    Mencari biaya KDF terbesar yang waktu hash-nya masih di bawah `target_ms` pada mesin ini.
+    Mengembalikan (parameter, waktu_ms).
+    """
+    def measure(hasher):
+        start = time.perf_counter()
+        hasher.hash('benchmark-password')
+        return (time.perf_counter() - start) * 1000
+
+    if scheme == 'scrypt':
+        best = None
+        n = 2 ** 10
+        while n <= 2 ** 20:
+            elapsed = measure(PasswordHasher('scrypt', scrypt_n=n))
+            if elapsed > target_ms and best is not None:
+                break
+            best = ({'scrypt_n': n, 'scrypt_r': 8, 'scrypt_p': 1}, elapsed)
+            n *= 2
+        return best
+
+    iterations = 10000
+    elapsed = measure(PasswordHasher('pbkdf2_sha256', pbkdf2_iterations=iterations))
+    iterations = max(10000, int(iterations * target_ms / elapsed) // 1000 * 1000)
+    return {'pbkdf2_iterations': iterations}, measure(PasswordHasher('pbkdf2_sha256', pbkdf2_iterations=iterations))
+
+
+# Hasher default; app.py menyesuaikan parameternya dari konfigurasi
+hasher = PasswordHasher()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memilih biaya hash password untuk target latensi login.")
+    parser.add_argument('--target-ms', type=float, default=250.0, help="Target waktu hash per login (ms)")
+    parser.add_argument('--scheme', choices=['scrypt', 'pbkdf2_sha256'], default='scrypt')
+    args = parser.parse_args()
+
+    params, elapsed = calibrate(args.target_ms, args.scheme)
+    print(f"Skema {args.scheme}: {params} -> {elapsed:.1f} ms per hash")
+    print(f"Perkiraan kapasitas login per core: {1000 / elapsed:.1f} per detik")
@@ -0,0 +1,282 @@
+import argparse
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from flask import g, jsonify, request
+
+from auth import get_bearer_token, verify_request_token
+
+STRIPES = 64 # Jumlah lock pada store di dalam proses; bucket dibagi ke stripe menurut hash key
+MAX_KEYS_PER_STRIPE = 10000 # Bucket terlama dibuang jika terlampaui (hanya membuat limit lebih longgar)
+
+SHARED_SCHEMA_SQL = "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID"
+
+# Satu UPSERT atomik per request: baris hanya diperbarui (dan dikembalikan) jika request diizinkan
+SHARED_HIT_SQL = """
+    INSERT INTO rate_limits (key, tat) VALUES (:key, :now + :interval)
+    ON CONFLICT (key) DO UPDATE SET tat = max(tat, :now) + :interval
+    WHERE max(tat, :now) + :interval - :now <= :limit
+    RETURNING tat
+    """
+
+
+class LocalStore:
+    """
+    Bucket di memori proses. Key dibagi ke beberapa stripe dengan lock masing-masing,
+    sehingga request dari klien berbeda jarang menunggu lock yang sama.
+    """
+
+    def __init__(self, stripes=STRIPES, max_keys_per_stripe=MAX_KEYS_PER_STRIPE):
+        self.max_keys_per_stripe = max_keys_per_stripe
+        self._stripes = [(threading.Lock(), OrderedDict()) for _ in range(stripes)] # key -> tat, urut pemakaian
+
+    def hit(self, key, interval, limit, now):
+        lock, buckets = self._stripes[hash(key) % len(self._stripes)]
+        with lock:
+            tat = max(buckets.get(key, now), now) + interval
+            if tat - now > limit:
+                return False, tat - interval
+            buckets[key] = tat
+            buckets.move_to_end(key)
+            # Bucket yang sudah penuh kembali sama dengan bucket baru, jadi boleh dibuang
+            while buckets and (next(iter(buckets.values())) <= now or len(buckets) > self.max_keys_per_stripe):
+                buckets.popitem(last=False)
+            return True, tat
+
+    def refund(self, key, interval):
+        """
+        Mengembalikan token yang sudah diambil hit() (request ternyata ditolak limit lain).
+        """
+        lock, buckets = self._stripes[hash(key) % len(self._stripes)]
+        with lock:
+            if key in buckets:
+                buckets[key] -= interval
+
+    def stats(self):
+        return {'buckets': sum(len(buckets) for _, buckets in self._stripes)}
+
+
+class SharedStore:
+    """
+    Bucket di file SQLite yang dipakai bersama oleh semua proses worker di satu mesin.
+    Setiap thread memakai koneksinya sendiri. Jika file tidak bisa diakses, request diizinkan (fail open).
+    """
+
+    def __init__(self, path, busy_timeout=0.5, purge_interval=60.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.purge_interval = purge_interval
+        self.errors = 0
+        self._local = threading.local()
+        self._next_purge = 0.0
+        self._connect().execute(SHARED_SCHEMA_SQL)
+
+    def hit(self, key, interval, limit, now):
+        try:
+            conn = self._connect()
+            row = conn.execute(SHARED_HIT_SQL, {'key': key, 'now': now, 'interval': interval, 'limit': limit}).fetchone()
+            if row is not None:
+                allowed, tat = True, row[0]
+            else:
+                row = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+                allowed, tat = False, max(row[0] if row else now, now)
+            if now >= self._next_purge:
+                self._next_purge = now + self.purge_interval
+                conn.execute("DELETE FROM rate_limits WHERE tat < ?", (now,))
+            return allowed, tat
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Rate limit store error: {e}")
+            return True, now
+
+    def refund(self, key, interval):
+        try:
+            self._connect().execute("UPDATE rate_limits SET tat = tat - ? WHERE key = ?", (interval, key))
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"Rate limit store error: {e}")
+
+    def stats(self):
+        return {'store_errors': self.errors}
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit: setiap UPSERT langsung terlihat oleh proses lain
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF") # Data bucket boleh hilang saat mesin mati
+            self._local.conn = conn
+        return conn
+
+
+class RateLimiter:
+    """
+    Rate limiting token bucket per endpoint dan per klien (user_id dari JWT, atau IP).
+
+    Bucket disimpan dalam bentuk GCRA: satu angka per key (waktu ketika bucket kembali penuh),
+    jadi setiap request cukup satu perbandingan dan satu penulisan, O(1) tanpa timer.
+    Aturan berupa (request per detik, burst): klien boleh mengirim `burst` request sekaligus,
+    lalu bucket terisi ulang `rate` token per detik.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or LocalStore()
+        self.rules = {} # endpoint -> (interval, limit, burst) atau None jika tidak dibatasi
+        self.default_rule = None
+        self.global_rule = None
+        self._stats = {'limited': 0, 'global_limited': 0} # Request yang lolos tidak mengambil lock ini
+        self._lock = threading.Lock()
+
+    def configure(self, limits, global_limit=None):
+        """
+        `limits`: {nama endpoint: (rate, burst) atau None}; kunci 'default' untuk endpoint lain.
+        `global_limit`: (rate, burst) untuk seluruh klien bersama, atau None.
+        """
+        rules = {endpoint: self._rule(limit) for endpoint, limit in limits.items()}
+        self.default_rule = rules.pop('default', None)
+        self.rules = rules
+        self.global_rule = self._rule(global_limit)
+
+    def is_limited(self, endpoint):
+        """
+        True jika `endpoint` punya aturan; dicek sebelum klien dikenali agar endpoint bebas tidak memverifikasi JWT.
+        """
+        return self.rules.get(endpoint, self.default_rule) is not None
+
+    def check(self, endpoint, client):
+        """
+        Mengambil satu token untuk `client` di `endpoint`.
+        Mengembalikan (diizinkan, burst, sisa, retry_after_detik), atau None jika endpoint tidak dibatasi.
+        """
+        rule = self.rules.get(endpoint, self.default_rule)
+        if rule is None:
+            return None
+        interval, limit, burst = rule
+        now = time.time()
+        key = f"{endpoint}:{client}"
+        allowed, tat = self.store.hit(key, interval, limit, now)
+        if not allowed:
+            self._count('limited')
+            return False, burst, 0, self._retry_after(tat, rule, now)
+        if self.global_rule is not None:
+            global_allowed, global_tat = self.store.hit('global', self.global_rule[0], self.global_rule[1], now)
+            if not global_allowed:
+                # Request ditolak limit global: token klien dikembalikan agar budget-nya tidak berkurang
+                self.store.refund(key, interval)
+                self._count('global_limited')
+                return False, burst, 0, self._retry_after(global_tat, self.global_rule, now)
+        return True, burst, int((now + limit - tat) / interval + 1e-3), 0 # Toleransi pembulatan float
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(self.store.stats())
+        return stats
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    @staticmethod
+    def _rule(limit):
+        if limit is None:
+            return None
+        rate, burst = limit
+        return 1.0 / rate, burst / rate, int(burst)
+
+    @staticmethod
+    def _retry_after(tat, rule, now):
+        # Token berikutnya tersedia saat tat + interval - limit
+        return max(1, math.ceil(tat + rule[0] - rule[1] - now))
+
+
+def client_key():
+    """
+    Identitas klien untuk rate limit: user_id dari token yang valid, selain itu IP.
+    Token yang tidak valid dihitung per IP agar tidak bisa dipakai untuk menghindari limit.
+    """
+    token = get_bearer_token()
+    if token:
+        try:
+            return f"user:{verify_request_token(token)['user_id']}"
+        except (jwt.InvalidTokenError, KeyError):
+            pass
+    return f"ip:{request.remote_addr or ''}"
+
+
+def init_rate_limit(app, limiter):
+    """
+    Memasang rate limiting sebelum setiap request. Request yang melebihi limit dijawab 429
+    dengan header Retry-After; respons lain membawa X-RateLimit-Limit dan X-RateLimit-Remaining.
+
+    Konfigurasi:
+    - RATE_LIMIT_ENABLED: False untuk menonaktifkan (misalnya saat benchmark)
+    - RATE_LIMITS: {nama endpoint: (request per detik, burst) atau None}, 'default' untuk endpoint lain
+    - RATE_LIMIT_GLOBAL: (request per detik, burst) untuk semua klien bersama, atau None
+    - RATE_LIMIT_STORAGE: path file SQLite untuk berbagi bucket antar proses (None = per proses)
+    """
+    app.config.setdefault('RATE_LIMIT_ENABLED', True)
+    app.config.setdefault('RATE_LIMITS', {'default': (20, 40)})
+    app.config.setdefault('RATE_LIMIT_GLOBAL', None)
+    app.config.setdefault('RATE_LIMIT_STORAGE', None)
+
+    if app.config['RATE_LIMIT_STORAGE']:
+        limiter.store = SharedStore(app.config['RATE_LIMIT_STORAGE'])
+    limiter.configure(app.config['RATE_LIMITS'], app.config['RATE_LIMIT_GLOBAL'])
+
+    @app.before_request
+    def enforce_rate_limit():
+        if (not app.config['RATE_LIMIT_ENABLED'] or request.method == 'OPTIONS'
+                or not limiter.is_limited(request.endpoint)):
+            return None
+        allowed, burst, remaining, retry_after = limiter.check(request.endpoint, client_key())
+        if allowed:
+            g.rate_limit = (burst, remaining)
+            return None
+        response = jsonify({'message': 'Terlalu banyak request, coba lagi nanti'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        response.headers['X-RateLimit-Limit'] = str(burst)
+        response.headers['X-RateLimit-Remaining'] = '0'
+        return response
+
+    @app.after_request
+    def rate_limit_headers(response):
+        rate_limit = g.get('rate_limit')
+        if rate_limit is not None:
+            response.headers['X-RateLimit-Limit'] = str(rate_limit[0])
+            response.headers['X-RateLimit-Remaining'] = str(rate_limit[1])
+        return response
+
+
+rate_limiter = RateLimiter()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Isi file rate limit bersama (RATE_LIMIT_STORAGE).")
+    parser.add_argument('command', choices=('status', 'clear'))
+    parser.add_argument('--storage', help="Path file SQLite (default: RATE_LIMIT_STORAGE di app.py)")
+    args = parser.parse_args()
+
+    path = args.storage
+    if path is None:
+        from app import app
+        path = app.config['RATE_LIMIT_STORAGE']
+    if not path:
+        raise SystemExit("RATE_LIMIT_STORAGE tidak diatur; bucket hanya ada di memori proses")
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute(SHARED_SCHEMA_SQL)
+    if args.command == 'clear':
+        print(f"{conn.execute('DELETE FROM rate_limits').rowcount} bucket dihapus")
+    else:
+        now = time.time()
+        active = conn.execute("SELECT COUNT(*) FROM rate_limits WHERE tat > ?", (now,)).fetchone()[0]
+        print(f"{active} bucket aktif")
+        for key, tat in conn.execute("SELECT key, tat FROM rate_limits WHERE tat > ? ORDER BY tat DESC LIMIT 10", (now,)):
+            print(f"  {key}: penuh kembali dalam {tat - now:.1f} detik")
+    conn.close()
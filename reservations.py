@@ -0,0 +1,434 @@
+import argparse
+import datetime
+import threading
+import time
+
+from db import DB_ERRORS
+
+# Baris hold yang diambil saat checkout (seluruh hold milik user; yang tidak dipesan dilepas)
+TAKE_HOLDS_SQL = {
+    'mssql': "DELETE FROM stock_reservations OUTPUT deleted.product_id, deleted.quantity, deleted.shard WHERE user_id = ?",
+    'sqlite': "DELETE FROM stock_reservations WHERE user_id = ? RETURNING product_id, quantity, shard",
+}
+
+DELETE_HOLD_SQL = {
+    'mssql': """
+    DELETE FROM stock_reservations OUTPUT deleted.product_id, deleted.quantity, deleted.shard
+    WHERE user_id = ? AND product_id = ?
+    """,
+    'sqlite': "DELETE FROM stock_reservations WHERE user_id = ? AND product_id = ? RETURNING product_id, quantity, shard",
+}
+
+EXPIRE_HOLDS_SQL = {
+    'mssql': """
+    DELETE TOP (?) FROM stock_reservations OUTPUT deleted.product_id, deleted.quantity, deleted.shard
+    WHERE expires_at < ?
+    """,
+    'sqlite': """
+    DELETE FROM stock_reservations
+    WHERE id IN (SELECT id FROM stock_reservations WHERE expires_at < ? LIMIT ?)
+    RETURNING product_id, quantity, shard
+    """,
+}
+
+# Stok produk yang di-shard disimpan di stock_shards; products.stock hanya ringkasan untuk katalog
+REFRESH_SHARDED_STOCK_SQL = """
+    UPDATE products
+    SET stock = (SELECT SUM(s.stock) FROM stock_shards s WHERE s.product_id = products.id)
+    WHERE stock_shards > 0
+      AND stock <> (SELECT SUM(s.stock) FROM stock_shards s WHERE s.product_id = products.id)
+    """
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class StockReservations:
+    """
+    Penahanan stok (hold) sementara untuk item di keranjang.
+
+    Setiap baris keranjang memegang hold sebesar kuantitasnya selama `ttl` detik sejak
+    perubahan terakhir. Jumlah hold per produk disimpan di products.reserved, sehingga
+    pengecekan ketersediaan (stock - reserved) dan penahanan cukup satu UPDATE bersyarat.
+    Hold yang kedaluwarsa dilepas oleh sweeper di background; checkout mengubah hold
+    menjadi pengurangan stok.
+
+    Produk yang sangat laris bisa di-shard (lihat shard_product): stok dan hold-nya dibagi
+    ke beberapa baris stock_shards dan setiap user memakai shard "rumahnya", sehingga
+    checkout bersamaan tidak mengantre pada lock satu baris produk. Jika shard rumah
+    kehabisan, stok bebas dipinjam dari shard lain.
+    """
+
+    def __init__(self, ttl=900, sweep_interval=30.0, sweep_batch_size=1000):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.sweep_batch_size = sweep_batch_size
+        self._stats = {'sweeps': 0, 'expired_total': 0, 'sweep_errors': 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def hold(self, cursor, backend, user_id, product_id, quantity, add=False, existing=False):
+        """
+        Mengatur hold user untuk satu produk menjadi tepat `quantity` (0 = lepas) dan
+        memperpanjang masa berlakunya. Dengan add=True, `quantity` ditambahkan ke kuantitas
+        keranjang saat ini; baris keranjang dibaca di SELECT yang sama dengan produk dan hold.
+        Dengan existing=True, hold tidak diubah jika item belum ada di keranjang.
+        Mengembalikan (kuantitas baru, item sudah ada di keranjang), atau None jika produk
+        tidak ada atau stok bebas (di luar hold user lain) tidak cukup.
+        """
+        hint = " WITH (UPDLOCK, HOLDLOCK)" if backend.name == 'mssql' else ""
+        cursor.execute(f"""
+        SELECT p.stock_shards, r.quantity, r.shard, c.quantity
+        FROM products p
+        LEFT JOIN stock_reservations r{hint} ON r.product_id = p.id AND r.user_id = ?
+        LEFT JOIN carts c{hint} ON c.product_id = p.id AND c.user_id = ?
+        WHERE p.id = ?
+        """, (user_id, user_id, product_id))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        shards, held, shard = row[0], row[1] or 0, row[2]
+        exists = row[1] is not None
+        in_cart = row[3] is not None
+        if existing and not in_cart:
+            return held, False
+        if add:
+            quantity += row[3] or 0
+        if not shards:
+            shard = None
+        elif shard is None:
+            shard = user_id % shards # Shard rumah user
+
+        delta = quantity - held
+        if delta > 0 and not self._reserve(cursor, product_id, shard, delta):
+            return None
+        if delta < 0:
+            self._release(cursor, [(product_id, -delta, shard)])
+
+        if quantity == 0:
+            if exists:
+                cursor.execute("DELETE FROM stock_reservations WHERE user_id = ? AND product_id = ?",
+                               (user_id, product_id))
+        elif exists:
+            cursor.execute(
+                "UPDATE stock_reservations SET quantity = ?, expires_at = ? WHERE user_id = ? AND product_id = ?",
+                (quantity, self._expires_at(), user_id, product_id)
+            )
+        else:
+            cursor.execute(
+                "INSERT INTO stock_reservations (user_id, product_id, quantity, shard, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, product_id, quantity, shard, self._expires_at())
+            )
+        return quantity, in_cart
+
+    def release(self, cursor, backend, user_id, product_id):
+        """
+        Melepas hold user untuk satu produk (item dihapus dari keranjang).
+        """
+        cursor.execute(DELETE_HOLD_SQL[backend.name], (user_id, product_id))
+        self._release(cursor, cursor.fetchall())
+
+    def consume(self, cursor, backend, user_id, lines, shard_counts):
+        """
+        Checkout: mengubah hold user menjadi pengurangan stok untuk `lines` ({product_id: quantity}).
+        Hold user untuk produk lain ikut dilepas karena keranjang dikosongkan.
+        `shard_counts` adalah {product_id: products.stock_shards}.
+
+        Produk yang tidak di-shard dikurangi dalam satu UPDATE bersyarat; kuantitas yang
+        sudah ditahan user dihitung sebagai tersedia. Mengembalikan daftar kekurangan
+        stok (kosong jika semua berhasil); pemanggil wajib rollback jika tidak kosong.
+        """
+        cursor.execute(TAKE_HOLDS_SQL[backend.name], (user_id,))
+        held = {}
+        leftovers = []
+        for product_id, quantity, shard in cursor.fetchall():
+            if product_id in lines:
+                held[product_id] = (quantity, shard)
+            else:
+                leftovers.append((product_id, quantity, shard))
+        self._release(cursor, leftovers)
+
+        shortages = []
+        plain = [product_id for product_id in lines if not shard_counts.get(product_id)]
+        if plain:
+            case_sql = "CASE id " + " ".join(["WHEN ? THEN ?"] * len(plain)) + " END"
+            qty_params = [value for product_id in plain for value in (product_id, lines[product_id])]
+            held_params = [value for product_id in plain for value in (product_id, held.get(product_id, (0,))[0])]
+            placeholders = ", ".join("?" * len(plain))
+            output, returning = ("OUTPUT inserted.id ", "") if backend.name == 'mssql' else ("", " RETURNING id")
+            cursor.execute(
+                f"UPDATE products SET stock = stock - {case_sql}, reserved = reserved - {case_sql} {output}"
+                f"WHERE id IN ({placeholders}) AND stock - reserved + {case_sql} >= {case_sql}{returning}",
+                qty_params + held_params + plain + held_params + qty_params
+            )
+            updated = {row[0] for row in cursor.fetchall()}
+            failed = [product_id for product_id in plain if product_id not in updated]
+            if failed:
+                # Setiap baris yang tidak terkurangi adalah kekurangan, walaupun stok sudah bertambah
+                # sejak UPDATE di atas; SELECT ini hanya untuk angka di pesan error
+                cursor.execute(f"SELECT id, stock - reserved FROM products WHERE id IN ({', '.join('?' * len(failed))})",
+                               failed)
+                free = dict(cursor.fetchall())
+                for product_id in failed:
+                    shortages.append({'product_id': product_id, 'requested': lines[product_id],
+                                      'available': free.get(product_id, 0) + held.get(product_id, (0,))[0]})
+
+        for product_id, quantity in lines.items():
+            shards = shard_counts.get(product_id)
+            if not shards:
+                continue
+            held_quantity, shard = held.get(product_id, (0, None))
+            if shard is None:
+                shard = user_id % shards
+            if not self._take_from_shard(cursor, product_id, shard, quantity, held_quantity):
+                cursor.execute("SELECT SUM(stock - reserved) FROM stock_shards WHERE product_id = ?", (product_id,))
+                available = (cursor.fetchone()[0] or 0) + held_quantity
+                shortages.append({'product_id': product_id, 'requested': quantity, 'available': available})
+        return shortages
+
+    def expire(self, conn):
+        """
+        Melepas semua hold yang sudah kedaluwarsa (per batch, satu transaksi per batch) lalu
+        menyegarkan products.stock untuk produk yang di-shard.
+        Mengembalikan (jumlah hold dilepas, jumlah produk yang stok katalognya berubah).
+        """
+        backend = conn.backend
+        cursor = conn.cursor()
+        expired = 0
+        try:
+            while True:
+                now = _now()
+                params = (self.sweep_batch_size, now) if backend.name == 'mssql' else (now, self.sweep_batch_size)
+                cursor.execute(EXPIRE_HOLDS_SQL[backend.name], params)
+                rows = cursor.fetchall()
+                self._release(cursor, rows)
+                conn.commit()
+                expired += len(rows)
+                if len(rows) < self.sweep_batch_size:
+                    break
+            cursor.execute(REFRESH_SHARDED_STOCK_SQL)
+            refreshed = cursor.rowcount
+            conn.commit()
+            return expired, refreshed
+        except DB_ERRORS:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def sweep(self, get_connection, on_change=None):
+        """
+        Satu putaran sweeper. `on_change` dipanggil jika stok di katalog berubah.
+        """
+        conn = get_connection()
+        if conn is None:
+            self._stats['sweep_errors'] += 1
+            return
+        try:
+            expired, refreshed = self.expire(conn)
+            self._stats['sweeps'] += 1
+            self._stats['expired_total'] += expired
+            if refreshed and on_change is not None:
+                on_change()
+        except DB_ERRORS as e:
+            self._stats['sweep_errors'] += 1
+            print(f"Sweeper reservasi gagal: {e}")
+        finally:
+            conn.close()
+
+    def start_sweeper(self, get_connection, on_change=None):
+        """
+        Menjalankan sweep setiap `sweep_interval` detik di thread background (sekali per proses).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(self.sweep_interval):
+                self.sweep(get_connection, on_change)
+
+        self._thread = threading.Thread(target=run, name='reservation-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self):
+        return dict(self._stats, ttl=self.ttl)
+
+    def _expires_at(self):
+        return _now() + datetime.timedelta(seconds=self.ttl)
+
+    def _reserve(self, cursor, product_id, shard, amount):
+        if shard is None:
+            cursor.execute(
+                "UPDATE products SET reserved = reserved + ? WHERE id = ? AND stock - reserved >= ?",
+                (amount, product_id, amount)
+            )
+            return cursor.rowcount == 1
+        reserve_sql = ("UPDATE stock_shards SET reserved = reserved + ? "
+                       "WHERE product_id = ? AND shard = ? AND stock - reserved >= ?")
+        cursor.execute(reserve_sql, (amount, product_id, shard, amount))
+        if cursor.rowcount == 1:
+            return True
+        if not _borrow(cursor, product_id, shard, amount):
+            return False
+        cursor.execute(reserve_sql, (amount, product_id, shard, amount))
+        return cursor.rowcount == 1
+
+    def _take_from_shard(self, cursor, product_id, shard, quantity, held_quantity):
+        take_sql = ("UPDATE stock_shards SET stock = stock - ?, reserved = reserved - ? "
+                    "WHERE product_id = ? AND shard = ? AND stock - reserved + ? >= ?")
+        params = (quantity, held_quantity, product_id, shard, held_quantity, quantity)
+        cursor.execute(take_sql, params)
+        if cursor.rowcount == 1:
+            return True
+        if not _borrow(cursor, product_id, shard, quantity - held_quantity):
+            return False
+        cursor.execute(take_sql, params)
+        return cursor.rowcount == 1
+
+    @staticmethod
+    def _release(cursor, holds):
+        """
+        Mengurangi penghitung reserved untuk baris hold (product_id, quantity, shard) yang dilepas.
+        """
+        totals = {}
+        for product_id, quantity, shard in holds:
+            totals[(product_id, shard)] = totals.get((product_id, shard), 0) + quantity
+        plain = [(quantity, product_id) for (product_id, shard), quantity in totals.items() if shard is None]
+        sharded = [(quantity, product_id, shard) for (product_id, shard), quantity in totals.items() if shard is not None]
+        if plain:
+            cursor.executemany("UPDATE products SET reserved = reserved - ? WHERE id = ?", plain)
+        if sharded:
+            cursor.executemany("UPDATE stock_shards SET reserved = reserved - ? WHERE product_id = ? AND shard = ?",
+                               sharded)
+
+
+def _borrow(cursor, product_id, shard, amount):
+    """
+    Memindahkan stok bebas dari shard lain ke `shard` sampai shard tersebut punya `amount` unit bebas.
+    """
+    cursor.execute("SELECT shard, stock - reserved FROM stock_shards WHERE product_id = ?", (product_id,))
+    free = {row[0]: row[1] for row in cursor.fetchall()}
+    needed = amount - free.pop(shard, 0)
+    if needed <= 0:
+        return True
+    if sum(max(available, 0) for available in free.values()) < needed:
+        return False
+    moved = 0
+    for donor, available in sorted(free.items(), key=lambda item: -item[1]):
+        if needed <= 0 or available <= 0:
+            break
+        take = min(available, needed)
+        cursor.execute(
+            "UPDATE stock_shards SET stock = stock - ? WHERE product_id = ? AND shard = ? AND stock - reserved >= ?",
+            (take, product_id, donor, take)
+        )
+        if cursor.rowcount == 1:
+            moved += take
+            needed -= take
+    if moved:
+        cursor.execute("UPDATE stock_shards SET stock = stock + ? WHERE product_id = ? AND shard = ?",
+                       (moved, product_id, shard))
+    return needed <= 0
+
+
+def set_sharded_stock(cursor, product_id, stock):
+    """
+    Menetapkan total stok produk yang di-shard (misalnya dari impor katalog): stok bebas dibagi
+    rata ke shard, dan setiap shard tetap memiliki minimal stok sebesar hold-nya.
+    Mengembalikan True jika `stock` lebih kecil dari total hold sehingga dinaikkan.
+    """
+    cursor.execute("SELECT shard, reserved FROM stock_shards WHERE product_id = ? ORDER BY shard", (product_id,))
+    shard_reserved = cursor.fetchall()
+    reserved = sum(row[1] for row in shard_reserved)
+    free = max(stock - reserved, 0)
+    count = len(shard_reserved)
+    cursor.executemany(
+        "UPDATE stock_shards SET stock = ? WHERE product_id = ? AND shard = ?",
+        [(held + free // count + (1 if i < free % count else 0), product_id, shard)
+         for i, (shard, held) in enumerate(shard_reserved)]
+    )
+    cursor.execute("UPDATE products SET stock = ? WHERE id = ?", (max(stock, reserved), product_id))
+    return stock < reserved
+
+def shard_product(conn, product_id, shards, stock=None):
+    """
+    Membagi stok satu produk ke `shards` baris stock_shards (0 atau 1 = kembali ke satu baris products).
+    Hold yang ada dipindahkan ke shard rumah user-nya. `stock` opsional menetapkan total stok baru.
+    Jalankan saat trafik rendah.
+    """
+    cursor = conn.cursor()
+    try:
+        hint = " WITH (UPDLOCK, HOLDLOCK)" if conn.backend.name == 'mssql' else ""
+        cursor.execute(f"SELECT stock, reserved, stock_shards FROM products{hint} WHERE id = ?", (product_id,))
+        row = cursor.fetchone()
+        if row is None:
+            raise ValueError(f"Produk tidak ditemukan: {product_id}")
+        total, reserved, current_shards = row
+        if current_shards:
+            # Satukan kembali shard lama
+            cursor.execute("SELECT SUM(stock), SUM(reserved) FROM stock_shards WHERE product_id = ?", (product_id,))
+            total, reserved = (value or 0 for value in cursor.fetchone())
+            cursor.execute("DELETE FROM stock_shards WHERE product_id = ?", (product_id,))
+        if stock is not None:
+            total = stock
+
+        if shards <= 1:
+            cursor.execute("UPDATE products SET stock = ?, reserved = ?, stock_shards = 0 WHERE id = ?",
+                           (total, reserved, product_id))
+            cursor.execute("UPDATE stock_reservations SET shard = NULL WHERE product_id = ?", (product_id,))
+        else:
+            cursor.execute("UPDATE stock_reservations SET shard = user_id % ? WHERE product_id = ?",
+                           (shards, product_id))
+            cursor.execute("SELECT shard, SUM(quantity) FROM stock_reservations WHERE product_id = ? GROUP BY shard",
+                           (product_id,))
+            shard_reserved = {row[0]: row[1] for row in cursor.fetchall()}
+            free = max(total - sum(shard_reserved.values()), 0)
+            cursor.executemany(
+                "INSERT INTO stock_shards (product_id, shard, stock, reserved) VALUES (?, ?, ?, ?)",
+                [(product_id, i, shard_reserved.get(i, 0) + free // shards + (1 if i < free % shards else 0),
+                  shard_reserved.get(i, 0)) for i in range(shards)]
+            )
+            cursor.execute("UPDATE products SET stock = ?, reserved = 0, stock_shards = ? WHERE id = ?",
+                           (max(total, sum(shard_reserved.values())), shards, product_id))
+        conn.commit()
+    except (DB_ERRORS + (ValueError,)):
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+# Instans default; app.py mengatur ttl dan interval sweep dari konfigurasi
+stock_reservations = StockReservations()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pemeliharaan reservasi stok.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    shard_parser = subparsers.add_parser('shard', help="Bagi stok produk laris ke beberapa shard")
+    shard_parser.add_argument('product_id')
+    shard_parser.add_argument('--shards', type=int, default=8, help="Jumlah shard (1 = kembali tanpa shard)")
+    shard_parser.add_argument('--stock', type=int, help="Total stok baru (default: stok saat ini)")
+    subparsers.add_parser('sweep', help="Lepas hold yang kedaluwarsa sekarang")
+    args = parser.parse_args()
+
+    from app import DB_CONFIG
+    from db import get_pool
+    conn = get_pool(DB_CONFIG).acquire()
+    try:
+        if args.command == 'shard':
+            shard_product(conn, args.product_id, args.shards, args.stock)
+            print(f"Produk {args.product_id} sekarang memakai {args.shards if args.shards > 1 else 0} shard")
+        else:
+            start = time.perf_counter()
+            expired, refreshed = stock_reservations.expire(conn)
+            print(f"{expired} hold dilepas, {refreshed} produk diperbarui ({time.perf_counter() - start:.2f} detik)")
+    finally:
+        conn.close()
@@ -0,0 +1,168 @@
+import datetime
+import json
+import zlib
+from decimal import Decimal
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson # Encoder JSON cepat (opsional): pip install orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli # Kompresi br (opsional): pip install brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+STREAM_BATCH_SIZE = 500 # Baris per query potongan saat streaming
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value) # Teks agar presisi harga utuh (sama seperti encoder bawaan Flask)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return http_date(value) # Format tanggal HTTP seperti encoder bawaan Flask
+    raise TypeError(f"Tipe {type(value).__name__} tidak bisa diserialisasi ke JSON")
+
+if orjson is not None:
+    def dumps(value):
+        """
+        Serialisasi ringkas ke bytes UTF-8 (orjson jika terinstal).
+        """
+        return orjson.dumps(value, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'), ensure_ascii=False)
+
+    def dumps(value):
+        """
+        Serialisasi ringkas ke bytes UTF-8 (orjson jika terinstal).
+        """
+        return _encoder.encode(value).encode()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Provider JSON Flask yang memakai dumps() di atas, sehingga jsonify ikut lebih cepat dan ringkas.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+
+class JsonArrayStream:
+    """
+    Body respons berupa array JSON yang diserialisasi per potongan baris (list of dict),
+    sehingga hasil query besar tidak pernah dimuat atau di-encode sekaligus.
+    `pages` sebaiknya mengambil setiap potongan dengan koneksi sendiri, agar tidak ada
+    koneksi pool yang dipegang selama klien mengunduh.
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __iter__(self):
+        separator = b'['
+        for rows in self.pages:
+            if not rows:
+                continue
+            yield separator + b','.join(dumps(row) for row in rows)
+            separator = b','
+        yield b'[]' if separator == b'[' else b']'
+
+    def close(self):
+        close = getattr(self.pages, 'close', None)
+        if close is not None:
+            close()
+
+
+def negotiate_encoding():
+    """
+    Memilih Content-Encoding terbaik dari Accept-Encoding request: 'br', 'gzip', atau None.
+    """
+    accepted = request.accept_encodings
+    candidates = [('br', accepted.quality('br')) if brotli is not None else ('br', 0),
+                  ('gzip', accepted.quality('gzip'))]
+    encoding, quality = max(candidates, key=lambda candidate: candidate[1])
+    return encoding if quality > 0 else None
+
+def compress(data, encoding, level=6):
+    """
+    Mengompres bytes utuh (dipakai juga untuk body katalog yang di-cache).
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # wbits 31 = format gzip
+    return compressor.compress(data) + compressor.flush()
+
+
+class CompressedStream:
+    """
+    Mengompres body streaming per potongan tanpa menunggu seluruh body.
+    """
+
+    def __init__(self, chunks, encoding, level):
+        self.chunks = chunks
+        self.encoding = encoding
+        self.level = level
+
+    def __iter__(self):
+        if self.encoding == 'br':
+            compressor = brotli.Compressor(quality=min(self.level, 11))
+            process, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+            process, finish = compressor.compress, compressor.flush
+            flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+        for chunk in self.chunks:
+            data = process(chunk) + flush() # Flush agar klien menerima data sedikit demi sedikit
+            if data:
+                yield data
+        yield finish()
+
+    def close(self):
+        close = getattr(self.chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def init_compression(app):
+    """
+    Memasang kompresi gzip/br untuk respons teks/JSON sesuai Accept-Encoding.
+
+    Konfigurasi:
+    - COMPRESS_MIN_SIZE: body lebih kecil dari ini (bytes) tidak dikompres
+    - COMPRESS_LEVEL: level gzip (1-9) / kualitas brotli untuk respons dinamis
+    """
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers
+                or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding()
+        if encoding is None:
+            return response
+
+        level = app.config['COMPRESS_LEVEL']
+        if response.is_streamed:
+            response.response = CompressedStream(response.response, encoding, level)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < app.config['COMPRESS_MIN_SIZE']:
+                return response
+            response.set_data(compress(data, encoding, level))
+        response.headers['Content-Encoding'] = encoding
+        return response
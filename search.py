@@ -0,0 +1,234 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+MAX_QUERY_LENGTH = 100
+NAME_WEIGHT = 3 # Kecocokan di nama produk lebih penting daripada di deskripsi
+PREFIX_PENALTY = 0.5 # Kecocokan awalan (autocomplete) diberi skor lebih rendah dari kata utuh
+RESULT_CACHE_SIZE = 1024 # Hasil query terakhir; typeahead sering mengulang awalan yang sama
+
+STOPWORDS = frozenset("""
+    dan yang di ke dari untuk dengan atau ini itu pada dalam adalah juga tidak akan sudah
+    bisa ada oleh sebagai karena agar para per sangat lebih
+    a an and are as at be by for from in is it of on or the to with
+""".split())
+
+# Akhiran Indonesia (partikel/posesif) dan bentuk jamak bahasa Inggris yang dilepas.
+# Tidak ada aturan 'es' karena 'apples' -> 'appl' tidak akan bertemu 'apple' -> 'apple';
+# 'tomatoes' -> 'tomatoe' tetap ditemukan oleh 'tomato' lewat pencocokan awalan.
+SUFFIXES = ('nya', 'lah', 'kah', 'ies', 's')
+
+_WORD = re.compile(r'\w+')
+
+
+class SearchError(ValueError):
+    """
+    Parameter pencarian tidak valid.
+    """
+
+
+def _fold(text):
+    """
+    Menyeragamkan teks: huruf kecil dan tanpa aksen.
+    """
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+def stem(word):
+    """
+    Stemming ringan: hanya melepas satu akhiran umum dan menyisakan minimal 3 huruf.
+    Akhiran 'y' dan 'ies' sama-sama menjadi 'i' ('strawberry', 'strawberries' -> 'strawberri'),
+    sehingga kata yang sedang diketik ('strawberri') tetap menjadi awalan dari term di index.
+    """
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == 'ies':
+                return word[:-2]
+            if suffix == 's' and word.endswith('ss'):
+                return word
+            return word[:-len(suffix)]
+    if word.endswith('y') and len(word) > 3:
+        return word[:-1] + 'i'
+    return word
+
+def tokenize(text):
+    """
+    Memecah teks menjadi term yang sudah dinormalisasi dan di-stem, tanpa stopword.
+    """
+    return [stem(word) for word in _WORD.findall(_fold(text or '')) if word not in STOPWORDS]
+
+
+class SearchIndex:
+    """
+    Inverted index di dalam proses atas `name` dan `description` produk.
+
+    Posting menyimpan bobot per produk (NAME_WEIGHT x kemunculan di nama + kemunculan di deskripsi).
+    Daftar term terurut dipakai untuk pencarian awalan dengan bisect. sync() memperbarui index
+    secara inkremental: hanya produk yang teksnya berubah yang diindeks ulang.
+    """
+
+    def __init__(self):
+        self.version = None
+        self._products = {} # id -> dict produk terbaru (untuk hasil pencarian)
+        self._texts = {} # id -> (name, description) yang sudah diindeks
+        self._doc_terms = {} # id -> set term milik produk
+        self._postings = {} # term -> {id: bobot}
+        self._terms = [] # Term terurut untuk pencarian awalan
+        self._terms_dirty = False
+        self._results = OrderedDict() # (query, limit) -> hasil; dikosongkan saat index berubah
+        self._lock = threading.Lock()
+
+    def sync(self, products, version=None):
+        """
+        Menyamakan index dengan daftar produk terbaru. Mengembalikan jumlah produk yang diindeks ulang.
+        """
+        with self._lock:
+            if version is not None and version == self.version:
+                return 0
+            latest = {product['id']: product for product in products}
+            changed = 0
+            for product_id in [pid for pid in self._texts if pid not in latest]:
+                self._remove(product_id)
+                changed += 1
+            for product_id, product in latest.items():
+                text = (product.get('name') or '', product.get('description') or '')
+                if self._texts.get(product_id) != text:
+                    self._remove(product_id)
+                    self._add(product_id, text)
+                    changed += 1
+            self._products = latest
+            self.version = version
+            self._results.clear() # Hasil memuat data produk (harga/stok), jadi selalu dibuang
+            return changed
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Mengembalikan (produk teratas, jumlah total kecocokan) untuk `query`.
+
+        Semua kata harus cocok, baik sebagai term utuh maupun sebagai awalan term
+        (autocomplete dan bentuk kata yang berbeda akhiran); kecocokan utuh diberi skor lebih tinggi.
+        """
+        words = _WORD.findall(_fold(query))
+        if not words:
+            return [], 0
+        key = (' '.join(words), limit)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                return cached
+            ranked, total = self._rank(words, limit)
+            result = ([self._products[product_id] for product_id in ranked], total)
+            self._results[key] = result
+            if len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {'products': len(self._texts), 'terms': len(self._postings), 'cached_results': len(self._results)}
+
+    def _rank(self, words, limit):
+        # Setiap klausa: daftar (posting, pengali skor); produk harus cocok dengan minimal satu posting per klausa.
+        # Stopword hanya diabaikan jika bukan kata terakhir (kata terakhir mungkin belum selesai diketik).
+        clauses = []
+        for word in [word for word in words[:-1] if word not in STOPWORDS] + words[-1:]:
+            clause = self._prefix_clause(word)
+            if not clause:
+                return [], 0
+            clauses.append(clause)
+        clauses.sort(key=lambda clause: sum(len(posting) for posting, _ in clause))
+
+        # Kandidat diambil dari klausa terkecil, klausa lain hanya dicek keanggotaannya
+        scores = self._union(clauses[0])
+        for clause in clauses[1:]:
+            if len(clause) == 1:
+                posting, factor = clause[0]
+                scores = {product_id: score + posting[product_id] * factor
+                          for product_id, score in scores.items() if product_id in posting}
+            else:
+                other = self._union(clause)
+                scores = {product_id: score + other[product_id]
+                          for product_id, score in scores.items() if product_id in other}
+            if not scores:
+                return [], 0
+        top = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [product_id for product_id, _ in top], len(scores)
+
+    def _prefix_clause(self, word):
+        """
+        Klausa untuk satu kata: term utuh (setelah stemming) atau term lain yang diawali kata tersebut.
+        """
+        if self._terms_dirty:
+            self._terms = sorted(self._postings)
+            self._terms_dirty = False
+        prefix = stem(word)
+        clause = []
+        for i in range(bisect.bisect_left(self._terms, prefix), len(self._terms)):
+            term = self._terms[i]
+            if not term.startswith(prefix):
+                break
+            posting = self._postings[term]
+            exact = term == prefix and word not in STOPWORDS
+            clause.append((posting, self._idf(posting) * (1 if exact else PREFIX_PENALTY)))
+        return clause
+
+    def _idf(self, posting):
+        return math.log(1 + len(self._texts) / len(posting))
+
+    @staticmethod
+    def _union(clause):
+        scores = {}
+        for posting, factor in clause:
+            for product_id, weight in posting.items():
+                score = weight * factor
+                if score > scores.get(product_id, 0):
+                    scores[product_id] = score
+        return scores
+
+    def _add(self, product_id, text):
+        weights = {}
+        for weight, field in zip((NAME_WEIGHT, 1), text):
+            for term in tokenize(field):
+                weights[term] = weights.get(term, 0) + weight
+        for term, weight in weights.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                self._terms_dirty = True
+            posting[product_id] = weight
+        self._texts[product_id] = text
+        self._doc_terms[product_id] = set(weights)
+
+    def _remove(self, product_id):
+        self._texts.pop(product_id, None)
+        for term in self._doc_terms.pop(product_id, ()):
+            posting = self._postings[term]
+            del posting[product_id]
+            if not posting:
+                del self._postings[term]
+                self._terms_dirty = True
+
+
+def parse_search_args(args):
+    """
+    Membaca parameter q dan limit dari query string.
+    """
+    query = (args.get('q') or '').strip()
+    if not query:
+        raise SearchError("Parameter q wajib diisi")
+    if len(query) > MAX_QUERY_LENGTH:
+        raise SearchError(f"Parameter q maksimal {MAX_QUERY_LENGTH} karakter")
+    try:
+        limit = int(args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise SearchError("limit harus berupa angka")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise SearchError(f"limit harus antara 1 dan {MAX_LIMIT}")
+    return query, limit
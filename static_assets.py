@@ -0,0 +1,415 @@
+import argparse
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+
+from flask import abort, request, send_file
+from werkzeug.routing import PathConverter
+
+from responses import brotli, compress, negotiate_encoding
+
+try:
+    from PIL import Image # Varian gambar WebP/ukuran kecil (opsional): pip install Pillow
+except ImportError:
+    Image = None
+
+ASSET_URL_PREFIX = '/assets/'
+ASSET_EXTENSIONS = frozenset(('.css', '.js', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico',
+                              '.woff', '.woff2', '.ttf', '.eot', '.otf'))
+PAGE_EXTENSION = '.html'
+PRECOMPRESS_EXTENSIONS = frozenset(('.html', '.css', '.js', '.svg', '.ico', '.ttf', '.eot', '.otf'))
+IMAGE_VARIANT_EXTENSIONS = frozenset(('.jpg', '.jpeg', '.png'))
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+PRECOMPRESS_LEVELS = {'br': 11, 'gzip': 9} # Dikompres sekali saat build, jadi pakai level maksimal
+SKIP_DIRS = frozenset(('__pycache__', 'build', 'profiles', 'venv', 'node_modules'))
+HASH_LENGTH = 10
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600 # Nama file berubah jika isinya berubah, jadi aman di-cache setahun
+IMAGE_WIDTHS = (300, 600)
+IMAGE_QUALITY = 80
+
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+_HTML_ATTR = re.compile(r'''(\b(?:src|href)\s*=\s*)(["'])([^"']*)\2''', re.IGNORECASE)
+_IMG_TAG = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+_REFERENCE = re.compile(r'([^?#]*)(.*)', re.DOTALL)
+
+
+class AssetPathConverter(PathConverter):
+    """
+    Path yang berakhiran ekstensi aset (tanpa membedakan huruf besar/kecil), untuk route aset lewat path aslinya.
+    Path lain tidak cocok dengan route tersebut, jadi tetap 404 untuk method apa pun.
+    """
+    regex = r'[^/].*?\.(?:' + '|'.join(
+        ''.join(f'[{char.lower()}{char.upper()}]' if char.isalpha() else re.escape(char) for char in extension[1:])
+        for extension in sorted(ASSET_EXTENSIONS)
+    ) + ')'
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+def _write_file(path, data):
+    """
+    Menulis file secara atomik agar proses lain tidak pernah membaca file setengah jadi.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class StaticAssets:
+    """
+    Build dan penyajian aset frontend (HTML, CSS, JS, gambar) dari root repo.
+
+    build() menyalin setiap aset ke `output_dir` dengan nama ber-hash isi (style.<hash>.css),
+    menulis ulang rujukan di HTML/CSS ke nama tersebut, membuat varian .gz/.br, serta varian
+    gambar WebP dan ukuran kecil (jika Pillow terinstal). Karena nama file ditentukan oleh isi,
+    file yang sudah ada tidak dibuat ulang sehingga build ulang saat start tetap murah.
+    """
+
+    def __init__(self, source_dir='.', output_dir='build/static', build_on_startup=True, image_widths=IMAGE_WIDTHS):
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.build_on_startup = build_on_startup # False: pakai manifest.json hasil build saat deploy
+        self.image_widths = image_widths
+        self._assets = None # path sumber -> nama file ber-hash
+        self._files = {} # nama file ber-hash -> metadata (type, encodings, webp, variants)
+        self._pages = {} # nama halaman -> nama file ber-hash
+        self._by_name = {}
+        self._manifest = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.output_dir, 'manifest.json')
+
+    def load(self):
+        """
+        Menyiapkan manifest: build sekarang, atau baca manifest.json jika build dilakukan saat deploy.
+        """
+        with self._lock:
+            self._load()
+
+    def build(self):
+        with self._lock:
+            self._use(self._fresh_build())
+            return self._manifest
+
+    def clean(self):
+        """
+        Menghapus file build yang tidak dirujuk manifest saat ini. Mengembalikan jumlah file yang dihapus.
+        """
+        self._ensure_loaded()
+        keep = {'manifest.json'}
+        for name, entry in self._files.items():
+            keep.add(name)
+            keep.update(name + ENCODING_SUFFIXES[encoding] for encoding in entry['encodings'])
+        removed = 0
+        for name in os.listdir(self.output_dir):
+            if name not in keep:
+                os.remove(os.path.join(self.output_dir, name))
+                removed += 1
+        return removed
+
+    def url_for(self, path):
+        """
+        URL ber-hash untuk aset sumber `path` (misalnya 'images/product-1.jpg'), atau None.
+        """
+        self._ensure_loaded()
+        name = self._lookup(path)
+        return None if name is None else ASSET_URL_PREFIX + name
+
+    def stats(self):
+        return {'files': len(self._files), 'pages': len(self._pages), 'loaded': self._assets is not None}
+
+    # --- Penyajian ---
+
+    def send_asset(self, name):
+        """
+        Aset ber-hash: boleh di-cache selamanya oleh browser dan CDN.
+        """
+        self._ensure_loaded()
+        if name not in self._files:
+            abort(404)
+        response = self._send(name, max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.immutable = True
+        return response
+
+    def send_page(self, page):
+        """
+        Halaman HTML: URL-nya tetap, jadi browser wajib revalidasi (cukup dengan 304).
+        """
+        self._ensure_loaded()
+        name = self._pages.get(page)
+        if name is None:
+            abort(404)
+        return self._revalidated(self._send(name))
+
+    def send_source(self, path):
+        """
+        Aset lewat path aslinya (misalnya image_url produk dari API) dengan ETag dan revalidasi.
+        Parameter opsional `w` memilih varian gambar terkecil yang lebarnya minimal `w` piksel.
+        """
+        self._ensure_loaded()
+        name = self._lookup(path)
+        if name is None:
+            abort(404)
+        width = request.args.get('w', type=int)
+        variants = self._files[name].get('variants')
+        if width is not None and variants:
+            name = next((variant for variant_width, variant in variants if variant_width >= width), variants[-1][1])
+        return self._revalidated(self._send(name))
+
+    def _send(self, name, max_age=None):
+        entry = self._files[name]
+        vary = []
+        if entry.get('webp'):
+            vary.append('Accept')
+            if 'image/webp' in request.accept_mimetypes.values():
+                name = entry['webp']
+                entry = self._files[name]
+        encoding = None
+        if entry['encodings']:
+            vary.append('Accept-Encoding')
+            encoding = negotiate_encoding()
+            if encoding not in entry['encodings']:
+                encoding = None
+        path = os.path.join(self.output_dir, name + (ENCODING_SUFFIXES[encoding] if encoding else ''))
+        response = send_file(os.path.abspath(path), mimetype=entry['type'], max_age=max_age, conditional=True,
+                             etag=name if encoding is None else f"{name}-{encoding}")
+        response.vary.update(vary)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def _revalidated(response):
+        response.cache_control.no_cache = True
+        return response
+
+    def _ensure_loaded(self):
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    self._load()
+
+    def _load(self):
+        if self.build_on_startup or not os.path.exists(self.manifest_path):
+            manifest = self._fresh_build()
+        else:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        self._use(manifest)
+
+    def _use(self, manifest):
+        self._manifest = manifest
+        self._files = manifest['files']
+        self._pages = manifest['pages']
+        self._assets = manifest['assets']
+        self._by_name = self._index_names(self._assets)
+
+    @staticmethod
+    def _index_names(paths):
+        # Fallback berdasarkan nama file: aset repo ini tersimpan rata di root, sementara HTML
+        # merujuknya lewat css/, js/, dan images/. Nama yang muncul di lebih dari satu folder diabaikan.
+        by_name = {}
+        for path in paths:
+            name = posixpath.basename(path)
+            by_name[name] = None if name in by_name else path
+        return by_name
+
+    def _lookup(self, path, base=''):
+        path = posixpath.normpath(path.lstrip('/') if path.startswith('/') else posixpath.join(base, path))
+        if path in self._assets:
+            return self._assets[path]
+        source = self._by_name.get(posixpath.basename(path))
+        return None if source is None else self._assets.get(source)
+
+    # --- Build ---
+
+    def _fresh_build(self):
+        # Build di instance terpisah agar request yang berjalan tetap melihat manifest lama yang utuh
+        builder = type(self)(self.source_dir, self.output_dir, image_widths=self.image_widths)
+        return builder._build()
+
+    def _build(self):
+        start = time.perf_counter()
+        os.makedirs(self.output_dir, exist_ok=True)
+        sources = self._scan()
+        files = {}
+        self._assets, self._files = {}, files
+        self._by_name = self._index_names(path for path in sources if not path.endswith(PAGE_EXTENSION))
+
+        # CSS terakhir agar rujukan url() ke gambar/font sudah punya nama ber-hash
+        assets = sorted((path for path in sources if not path.endswith(PAGE_EXTENSION)),
+                        key=lambda path: (path.endswith('.css'), path))
+        for path in assets:
+            with open(sources[path], 'rb') as f:
+                data = f.read()
+            if path.endswith('.css'):
+                data = self._rewrite_css(data.decode('utf-8'), posixpath.dirname(path)).encode('utf-8')
+            stem, extension = posixpath.splitext(posixpath.basename(path))
+            extension = extension.lower()
+            digest = _digest(data)
+            name = self._emit(files, stem, extension, digest, lambda: data)
+            self._assets[path] = name
+            if Image is not None and extension in IMAGE_VARIANT_EXTENSIONS:
+                self._build_image_variants(files, path, data, name)
+
+        pages = {}
+        for path in sorted(path for path in sources if path.endswith(PAGE_EXTENSION)):
+            with open(sources[path], encoding='utf-8') as f:
+                html = self._rewrite_html(f.read(), posixpath.dirname(path)).encode('utf-8')
+            stem = posixpath.splitext(posixpath.basename(path))[0]
+            pages[path] = self._emit(files, stem, PAGE_EXTENSION, _digest(html), lambda: html)
+
+        manifest = {'assets': self._assets, 'files': files, 'pages': pages}
+        _write_file(self.manifest_path, json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+        print(f"Build aset statis: {len(assets)} aset, {len(pages)} halaman, {len(files)} file "
+              f"({time.perf_counter() - start:.2f} detik)")
+        if Image is None:
+            print("Pillow tidak terinstal: varian gambar WebP/ukuran kecil tidak dibuat")
+        return manifest
+
+    def _scan(self):
+        output_dir = os.path.abspath(self.output_dir)
+        sources = {}
+        for dirpath, dirnames, filenames in os.walk(self.source_dir):
+            dirnames[:] = [name for name in dirnames
+                           if not name.startswith('.') and name not in SKIP_DIRS
+                           and os.path.abspath(os.path.join(dirpath, name)) != output_dir]
+            for filename in filenames:
+                extension = os.path.splitext(filename)[1].lower()
+                if extension in ASSET_EXTENSIONS or extension == PAGE_EXTENSION:
+                    full_path = os.path.join(dirpath, filename)
+                    sources[os.path.relpath(full_path, self.source_dir).replace(os.sep, '/')] = full_path
+        return sources
+
+    def _emit(self, files, stem, extension, digest, render):
+        """
+        Menulis `stem.digest.extension` beserta varian .br/.gz. render() hanya dipanggil jika file belum ada.
+        """
+        name = f"{stem}.{digest}{extension}"
+        path = os.path.join(self.output_dir, name)
+        data = None
+        if not os.path.exists(path):
+            data = render()
+            _write_file(path, data)
+        encodings = []
+        if extension in PRECOMPRESS_EXTENSIONS:
+            for encoding, suffix in ENCODING_SUFFIXES.items():
+                if encoding == 'br' and brotli is None:
+                    continue
+                if not os.path.exists(path + suffix):
+                    if data is None:
+                        with open(path, 'rb') as f:
+                            data = f.read()
+                    _write_file(path + suffix, compress(data, encoding, PRECOMPRESS_LEVELS[encoding]))
+                encodings.append(encoding)
+        files[name] = {'type': mimetypes.guess_type(name)[0] or 'application/octet-stream', 'encodings': encodings}
+        return name
+
+    def _build_image_variants(self, files, path, data, name):
+        """
+        Varian gambar: ukuran lebih kecil (IMAGE_WIDTHS) dan WebP untuk setiap ukuran.
+        Nama varian diturunkan dari hash sumber + parameter, jadi gambar hanya di-encode sekali.
+        """
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                width, height, image_format = image.width, image.height, image.format
+        except OSError as e:
+            print(f"Varian gambar {path} dilewati: {e}")
+            return
+
+        def render(target_width, target_format):
+            def _render():
+                with Image.open(io.BytesIO(data)) as image:
+                    if target_width < width:
+                        image = image.resize((target_width, max(1, round(height * target_width / width))), Image.LANCZOS)
+                    if target_format == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+                        image = image.convert('RGBA' if image.mode in ('LA', 'P') else 'RGB')
+                    output = io.BytesIO()
+                    image.save(output, target_format, quality=IMAGE_QUALITY, optimize=True)
+                    return output.getvalue()
+            return _render
+
+        stem, extension = posixpath.splitext(posixpath.basename(path))
+        source_digest = _digest(data)
+        variants = []
+        for target_width in sorted(w for w in self.image_widths if w < width) + [width]:
+            key = f"{source_digest}:{target_width}:{IMAGE_QUALITY}"
+            if target_width == width:
+                variant, variant_stem = name, stem
+            else:
+                variant_stem = f"{stem}.{target_width}w"
+                variant = self._emit(files, variant_stem, extension.lower(), _digest(f"{key}:{image_format}".encode()),
+                                     render(target_width, image_format))
+            webp = self._emit(files, variant_stem, '.webp', _digest(f"{key}:WEBP".encode()), render(target_width, 'WEBP'))
+            files[variant]['webp'] = webp
+            variants.append([target_width, variant])
+        files[name]['variants'] = variants
+
+    def _asset_name(self, reference, base):
+        """
+        Nama file ber-hash dan sisa query/fragment untuk rujukan di HTML/CSS, atau (None, '').
+        """
+        reference = reference.strip()
+        if (not reference or '${' in reference or '://' in reference
+                or reference.startswith(('#', '//', 'data:', 'mailto:', 'tel:', 'javascript:'))):
+            return None, ''
+        path, suffix = _REFERENCE.match(reference).groups()
+        return (self._lookup(path, base) if path else None), suffix
+
+    def _asset_url(self, reference, base):
+        name, suffix = self._asset_name(reference, base)
+        return None if name is None else ASSET_URL_PREFIX + name + suffix
+
+    def _rewrite_css(self, css, base):
+        def url(match):
+            asset_url = self._asset_url(match.group(2), base)
+            return match.group(0) if asset_url is None else f"url({match.group(1)}{asset_url}{match.group(1)})"
+        return _CSS_URL.sub(url, css)
+
+    def _rewrite_html(self, html, base):
+        def srcset(match):
+            # <img> dengan varian ukuran mendapat srcset agar browser di layar kecil mengambil file yang lebih kecil
+            tag = match.group(0)
+            src = next((m.group(3) for m in _HTML_ATTR.finditer(tag) if m.group(1).strip().lower().startswith('src')), None)
+            if src is None or 'srcset' in tag.lower():
+                return tag
+            name = self._asset_name(src, base)[0]
+            variants = name and self._files[name].get('variants')
+            if not variants or len(variants) < 2:
+                return tag
+            candidates = ', '.join(f"{ASSET_URL_PREFIX}{variant} {width}w" for width, variant in variants)
+            end = -2 if tag.endswith('/>') else -1
+            return f'{tag[:end].rstrip()} srcset="{candidates}"{tag[end:]}'
+
+        def attribute(match):
+            asset_url = self._asset_url(match.group(3), base)
+            return match.group(0) if asset_url is None else f"{match.group(1)}{match.group(2)}{asset_url}{match.group(2)}"
+
+        html = _IMG_TAG.sub(srcset, html)
+        html = _HTML_ATTR.sub(attribute, html)
+        return self._rewrite_css(html, base) # url() di atribut style
+
+
+static_assets = StaticAssets()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build aset statis frontend (fingerprint, .gz/.br, varian gambar).")
+    parser.add_argument('command', choices=('build',))
+    parser.add_argument('--clean', action='store_true', help="Hapus file build lama yang tidak dirujuk manifest baru")
+    args = parser.parse_args()
+
+    from app import static_assets # Konfigurasi (folder sumber/keluaran, lebar gambar) dari app.py
+    static_assets.build()
+    if args.clean:
+        print(f"{static_assets.clean()} file lama dihapus")
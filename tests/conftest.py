@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as shop # noqa: E402
+import db # noqa: E402
+from benchmark import BENCH_PASSWORD, seed_database # noqa: E402
+from idempotency import idempotency_keys # noqa: E402
+
+PRODUCTS = 20
+USERS = 3
+
+
+@pytest.fixture
+def database(tmp_path):
+    """
+    Database SQLite berisi katalog benchmark (produk bench-0 .. bench-19, stok 1000000)
+    dan user user0 .. user2 (id 1 .. 3).
+    """
+    path = str(tmp_path / 'shop.db')
+    seed_database(path, PRODUCTS, USERS, carts=0)
+    return path
+
+
+@pytest.fixture
+def shop_app(database):
+    shop.DB_CONFIG.update(backend='sqlite', database=database, replicas=[])
+    shop.app.config['RATE_LIMIT_ENABLED'] = False
+    db.init_pool(shop.DB_CONFIG)
+    shop.catalog_cache.invalidate()
+    idempotency_keys._cache.clear()
+    shop.token_cache._verified.clear()
+    shop.token_cache._revoked.clear() # Token user yang sama di detik yang sama identik antar tes
+    yield shop
+    db.close_pool()
+
+
+@pytest.fixture
+def client(shop_app):
+    return shop_app.app.test_client()
+
+
+@pytest.fixture
+def conn(shop_app):
+    connection = db.get_pool(shop_app.DB_CONFIG).acquire()
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def auth_headers(client):
+    """
+    Header Authorization untuk user0 (id 1).
+    """
+    response = client.post('/login', json={'username': 'user0', 'password': BENCH_PASSWORD})
+    assert response.status_code == 200
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
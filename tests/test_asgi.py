@@ -0,0 +1,20 @@
+import asgi
+from auth import SharedRevocations, token_cache
+from ratelimit import LocalStore, SharedStore, rate_limiter
+
+
+def test_multiple_workers_share_rate_limits_and_revocations(shop_app, tmp_path, monkeypatch):
+    monkeypatch.setattr(asgi, 'SHARED_STATE_DIR', str(tmp_path / 'shared'))
+    monkeypatch.setattr(rate_limiter, 'store', LocalStore())
+    monkeypatch.setattr(token_cache, 'shared', None)
+    monkeypatch.setitem(shop_app.app.config, 'RATE_LIMIT_STORAGE', None)
+    monkeypatch.setitem(shop_app.app.config, 'TOKEN_REVOCATION_STORAGE', None)
+
+    asgi.use_shared_state(1)
+    assert isinstance(rate_limiter.store, LocalStore)
+    assert token_cache.shared is None
+
+    asgi.use_shared_state(4)
+    assert isinstance(rate_limiter.store, SharedStore)
+    assert isinstance(token_cache.shared, SharedRevocations)
+    assert shop_app.app.config['RATE_LIMIT_STORAGE'].startswith(str(tmp_path / 'shared'))
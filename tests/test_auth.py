@@ -0,0 +1,42 @@
+import time
+
+from auth import SharedRevocations, TokenCache
+
+
+def test_revocation_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'revoked.db')
+    worker_a = TokenCache(shared=SharedRevocations(path))
+    worker_b = TokenCache(shared=SharedRevocations(path))
+    now = time.time()
+
+    assert worker_a.revoke('token-1', now + 60)
+    assert worker_b.is_revoked('token-1', now)
+    assert not worker_b.is_revoked('token-2', now)
+    assert not worker_b.is_revoked('token-1', now + 61)
+
+
+def test_logout_revokes_token_in_every_worker(shop_app, client, auth_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(shop_app.token_cache, 'shared', SharedRevocations(str(tmp_path / 'revoked.db')))
+    assert client.get('/cart', headers=auth_headers).status_code == 200
+
+    assert client.post('/logout', headers=auth_headers).status_code == 200
+    # Proses worker lain: cache lokalnya tidak tahu token ini dicabut
+    other_worker = TokenCache(shared=SharedRevocations(str(tmp_path / 'revoked.db')))
+    token = auth_headers['Authorization'].split(' ')[1]
+    assert other_worker.is_revoked(token, time.time())
+    assert client.get('/cart', headers=auth_headers).status_code == 401
+
+
+def test_expired_revocations_are_swept_at_most_once_per_interval(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('auth.time.time', lambda: now[0])
+    cache = TokenCache(purge_interval=60)
+    cache.revoke('lama', 1010)
+    now[0] = 1020
+    cache.revoke('baru-1', 2000)
+    assert cache.stats()['revoked'] == 2 # Sapuan berikutnya belum jatuh tempo
+
+    now[0] = 1061
+    cache.revoke('baru-2', 2000)
+    assert cache.stats()['revoked'] == 2
+    assert not cache.is_revoked('lama', now[0])
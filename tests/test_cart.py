@@ -0,0 +1,77 @@
+import cart
+
+
+def cart_rows(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT c.product_id, c.quantity, r.quantity FROM carts c "
+                   "JOIN stock_reservations r ON r.user_id = c.user_id AND r.product_id = c.product_id "
+                   "WHERE c.user_id = 1 ORDER BY c.product_id")
+    return cursor.fetchall()
+
+
+def test_add_item_accumulates_quantity_and_hold(conn):
+    cursor = conn.cursor()
+    assert cart.add_item(cursor, conn.backend, 1, 'bench-0', 2) == 'inserted'
+    assert cart.add_item(cursor, conn.backend, 1, 'bench-0', 3) == 'updated'
+    conn.commit()
+
+    assert cart_rows(conn) == [('bench-0', 5, 5)]
+
+
+def test_add_item_rejects_when_free_stock_is_short(conn):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE products SET stock = 4 WHERE id = 'bench-0'")
+    assert cart.add_item(cursor, conn.backend, 1, 'bench-0', 3) == 'inserted'
+    assert cart.add_item(cursor, conn.backend, 1, 'bench-0', 2) is None
+    assert cart.add_item(cursor, conn.backend, 1, 'hilang', 1) is None
+    conn.commit()
+
+    assert cart_rows(conn) == [('bench-0', 3, 3)]
+
+
+def batch(client, headers, operations, version=None):
+    body = {'operations': operations}
+    if version is not None:
+        body['version'] = version
+    return client.post('/cart/batch', headers=headers, json=body)
+
+
+def test_batch_with_latest_version_succeeds(client, auth_headers):
+    first = batch(client, auth_headers, [{'op': 'set', 'product_id': 'bench-0', 'quantity': 2}],
+                  client.get('/cart', headers=auth_headers).headers['X-Cart-Version'])
+    assert first.status_code == 200
+
+    second = batch(client, auth_headers, [{'op': 'set', 'product_id': 'bench-1', 'quantity': 1}],
+                   first.get_json()['version'])
+    assert second.status_code == 200
+    assert {item['id']: item['quantity'] for item in second.get_json()['items']} == {'bench-0': 2, 'bench-1': 1}
+
+
+def test_batch_with_stale_version_conflicts_without_changes(client, auth_headers):
+    stale = client.get('/cart', headers=auth_headers).headers['X-Cart-Version']
+    assert batch(client, auth_headers, [{'op': 'set', 'product_id': 'bench-0', 'quantity': 2}], stale).status_code == 200
+
+    response = batch(client, auth_headers, [{'op': 'set', 'product_id': 'bench-1', 'quantity': 1}], stale)
+
+    assert response.status_code == 409
+    assert [item['id'] for item in response.get_json()['items']] == ['bench-0']
+
+
+def test_batch_without_version_is_applied(client, auth_headers):
+    assert batch(client, auth_headers, [{'op': 'set', 'product_id': 'bench-0', 'quantity': 2}]).status_code == 200
+    response = batch(client, auth_headers, [{'op': 'set', 'product_id': 'bench-0', 'quantity': 2},
+                                            {'op': 'remove', 'product_id': 'bench-1'}])
+
+    assert response.status_code == 200
+    assert [(item['id'], item['quantity']) for item in response.get_json()['items']] == [('bench-0', 2)]
+
+
+def test_update_quantity_only_changes_items_already_in_cart(client, auth_headers, conn):
+    update = {'product_id': 'bench-0', 'quantity': 3}
+    missing = client.post('/update_cart_quantity', headers=auth_headers, json=update)
+    assert missing.status_code == 404
+    assert cart_rows(conn) == []
+
+    assert client.post('/add_to_cart', headers=auth_headers, json={'product_id': 'bench-0', 'quantity': 1}).status_code == 201
+    assert client.post('/update_cart_quantity', headers=auth_headers, json=update).status_code == 200
+    assert cart_rows(conn) == [('bench-0', 3, 3)]
@@ -0,0 +1,59 @@
+import datetime
+import json
+
+import db
+from catalog_cache import CatalogCache
+from responses import dumps
+
+
+def test_catalog_etag_depends_on_content_not_process():
+    products = [{'id': 'a', 'stock': 1}]
+    first = CatalogCache(lambda: products, dumps)
+    second = CatalogCache(lambda: [{'id': 'a', 'stock': 0}], dumps)
+    restarted = CatalogCache(lambda: products, dumps)
+
+    assert first.get().version == second.get().version == 1
+    assert first.get().etag != second.get().etag
+    assert first.get().etag == restarted.get().etag
+
+
+def test_products_revalidates_with_etag(client):
+    response = client.get('/products')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    assert client.get('/products', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_unpaginated_list_streams_in_chunks_without_holding_a_connection(shop_app, client, monkeypatch):
+    monkeypatch.setattr(shop_app, 'STREAM_BATCH_SIZE', 3)
+    pool = db.get_pool(shop_app.DB_CONFIG)
+
+    response = client.get('/products?in_stock=1&sort=price_desc', buffered=False)
+    chunks = iter(response.response)
+    body = next(chunks)
+    assert pool.stats()['in_use'] == 0
+    body += b''.join(chunks)
+    response.close()
+
+    products = json.loads(body)
+    assert len(products) == 20
+    assert len({product['id'] for product in products}) == 20
+    prices = [product['price'] for product in products]
+    assert prices == sorted(prices, reverse=True)
+
+
+def test_dates_serialize_as_http_dates():
+    value = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    assert json.loads(dumps({'at': value})) == {'at': 'Tue, 02 Jan 2024 03:04:05 GMT'}
+
+
+def test_in_stock_excludes_products_fully_held_by_carts(client, conn):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE products SET stock = 3, reserved = 3 WHERE id = 'bench-0'")
+    cursor.execute("UPDATE products SET stock = 3, reserved = 2 WHERE id = 'bench-1'")
+    conn.commit()
+
+    ids = {product['id'] for product in client.get('/products?in_stock=1').get_json()}
+    assert 'bench-0' not in ids
+    assert 'bench-1' in ids
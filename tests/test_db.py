@@ -0,0 +1,17 @@
+import pytest
+
+from catalog_query import ProductQuery
+from db import SqlServerBackend
+
+
+def test_sql_server_limit_leaves_select_untouched():
+    backend = SqlServerBackend({})
+    query, _ = ProductQuery({'sort': 'price_asc', 'limit': '10'}).build(backend)
+    assert query.startswith("SELECT id, name")
+    assert query.endswith("ORDER BY price ASC, id ASC OFFSET 0 ROWS FETCH NEXT 11 ROWS ONLY")
+
+    distinct = backend.limit("SELECT DISTINCT user_id FROM orders ORDER BY user_id", 5)
+    assert distinct.startswith("SELECT DISTINCT user_id")
+
+    with pytest.raises(ValueError):
+        backend.limit("SELECT id FROM products", 5)
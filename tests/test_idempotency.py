@@ -0,0 +1,46 @@
+from idempotency import idempotency_keys
+
+SHIPPING = {'full_name': 'Pembeli', 'address': 'Jl. Contoh 1', 'city': 'Jakarta', 'zip_code': '10110',
+            'phone': '0800000000', 'email': 'pembeli@example.com'}
+
+
+def place_order(client, headers, key, quantity=1):
+    body = dict(SHIPPING, items=[{'id': 'bench-0', 'quantity': quantity}])
+    return client.post('/place_order', headers=dict(headers, **{'Idempotency-Key': key}), json=body)
+
+
+def order_count(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM orders WHERE user_id = 1")
+    return cursor.fetchone()[0]
+
+
+def test_retry_replays_first_order(client, auth_headers, conn):
+    first = place_order(client, auth_headers, 'checkout-1')
+    assert first.status_code == 201
+    assert 'Idempotent-Replayed' not in first.headers
+
+    retry = place_order(client, auth_headers, 'checkout-1')
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert order_count(conn) == 1
+
+
+def test_retry_after_cache_loss_replays_from_table(client, auth_headers, conn):
+    first = place_order(client, auth_headers, 'checkout-2')
+    idempotency_keys._cache.clear() # Seperti retry yang diterima proses worker lain
+
+    retry = place_order(client, auth_headers, 'checkout-2')
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json()['order_id'] == first.get_json()['order_id']
+    assert idempotency_keys.stats()['db_hits'] >= 1
+    assert order_count(conn) == 1
+
+
+def test_same_key_with_different_body_is_rejected(client, auth_headers, conn):
+    assert place_order(client, auth_headers, 'checkout-3').status_code == 201
+
+    reused = place_order(client, auth_headers, 'checkout-3', quantity=2)
+    assert reused.status_code == 422
+    assert order_count(conn) == 1
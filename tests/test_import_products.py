@@ -0,0 +1,44 @@
+from db import create_backend
+from import_products import import_products
+from reservations import shard_product, stock_reservations
+
+
+def record(product_id, stock):
+    return {'id': product_id, 'name': f'Produk {product_id}', 'price': 1000, 'stock': stock}
+
+
+def test_import_clamps_stock_to_reserved(conn, database):
+    assert stock_reservations.hold(conn.cursor(), conn.backend, 1, 'bench-0', 5)
+    conn.commit()
+
+    backend = create_backend({'backend': 'sqlite', 'database': database})
+    raw = backend.connect()
+    try:
+        summary = import_products(raw, backend, [record('bench-0', 2), record('bench-1', 7)], progress=False)
+    finally:
+        raw.close()
+
+    assert summary['clamped'] == 1
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, stock, reserved FROM products WHERE id IN ('bench-0', 'bench-1') ORDER BY id")
+    assert cursor.fetchall() == [('bench-0', 5, 5), ('bench-1', 7, 0)]
+
+
+def test_import_writes_sharded_stock_to_shards(conn, database):
+    shard_product(conn, 'bench-0', 4, stock=100)
+    assert stock_reservations.hold(conn.cursor(), conn.backend, 1, 'bench-0', 3)
+    conn.commit()
+
+    backend = create_backend({'backend': 'sqlite', 'database': database})
+    raw = backend.connect()
+    try:
+        import_products(raw, backend, [record('bench-0', 40)], progress=False)
+    finally:
+        raw.close()
+    stock_reservations.expire(conn) # Sweeper menyegarkan products.stock dari stock_shards
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT SUM(stock), SUM(reserved) FROM stock_shards WHERE product_id = 'bench-0'")
+    assert cursor.fetchone() == (40, 3)
+    cursor.execute("SELECT stock FROM products WHERE id = 'bench-0'")
+    assert cursor.fetchone()[0] == 40
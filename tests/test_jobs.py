@@ -0,0 +1,96 @@
+import pytest
+
+from jobs import JobQueue, _as_datetime, _now, job_queue
+from orders import OutOfStock, create_order
+
+SHIPPING = {'full_name': 'Budi', 'address': 'Jl. Merdeka 1', 'city': 'Bandung', 'zip_code': '40111',
+            'phone': '0812', 'email': 'budi@example.com'}
+
+
+def test_enqueued_counts_only_committed_jobs(conn):
+    before = job_queue.stats()['enqueued']
+    conn.cursor().execute("UPDATE products SET stock = 1 WHERE id = 'bench-0'")
+    conn.commit()
+
+    with pytest.raises(OutOfStock):
+        create_order(conn, 1, SHIPPING, {'bench-0': 2})
+    assert job_queue.stats()['enqueued'] == before
+
+    create_order(conn, 1, SHIPPING, {'bench-1': 1})
+    assert job_queue.stats()['enqueued'] == before + 1
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(max_attempts=3, backoff_base=10)
+    queue.calls = []
+    return queue
+
+
+def job_row(conn, job_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT status, attempts, run_at, last_error FROM jobs WHERE id = ?", (job_id,))
+    status, attempts, run_at, last_error = cursor.fetchone()
+    return status, attempts, _as_datetime(run_at), last_error
+
+
+def make_due(conn):
+    conn.cursor().execute("UPDATE jobs SET run_at = ?", (_now(),))
+    conn.commit()
+
+
+def test_failed_job_is_retried_with_backoff_then_succeeds(queue, conn):
+    @queue.handler('kirim_email')
+    def send(payload):
+        queue.calls.append(payload)
+        if len(queue.calls) == 1:
+            raise ConnectionError('SMTP mati')
+
+    queue.enqueue(conn.cursor(), conn.backend, 'kirim_email', {'order_id': 1})
+    conn.commit()
+    job_id = conn.cursor().execute("SELECT MAX(id) FROM jobs").fetchone()[0]
+
+    assert queue.run_pending(conn) == 1
+    status, attempts, run_at, last_error = job_row(conn, job_id)
+    assert (status, attempts) == ('pending', 1)
+    assert 'SMTP mati' in last_error
+    delay = (run_at - _now()).total_seconds()
+    assert 7 < delay <= 12 # backoff_base * 2^0 dengan jitter 0.8-1.2
+    assert queue.run_pending(conn) == 0 # Belum jatuh tempo
+
+    make_due(conn)
+    assert queue.run_pending(conn) == 1
+    assert job_row(conn, job_id)[:2] == ('done', 2)
+    assert queue.calls == [{'order_id': 1}, {'order_id': 1}]
+    assert queue.stats()['retried'] == 1 and queue.stats()['succeeded'] == 1
+
+
+def test_job_fails_permanently_after_max_attempts(queue, conn):
+    @queue.handler('selalu_gagal', max_attempts=2)
+    def fail(payload):
+        raise ValueError('rusak')
+
+    queue.enqueue(conn.cursor(), conn.backend, 'selalu_gagal')
+    conn.commit()
+    for _ in range(2):
+        make_due(conn)
+        queue.run_pending(conn)
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT status, attempts FROM jobs WHERE kind = 'selalu_gagal'")
+    assert cursor.fetchone() == ('failed', 2)
+    assert queue.stats()['failed'] == 1
+
+
+def test_dedup_key_creates_one_job(queue, conn):
+    queue.handler('order_placed')(queue.calls.append)
+    cursor = conn.cursor()
+    assert queue.enqueue(cursor, conn.backend, 'order_placed', {'order_id': 7}, key='order_placed:7')
+    assert not queue.enqueue(cursor, conn.backend, 'order_placed', {'order_id': 7}, key='order_placed:7')
+    conn.commit()
+
+    cursor.execute("SELECT COUNT(*) FROM jobs WHERE idempotency_key = 'order_placed:7'")
+    assert cursor.fetchone()[0] == 1
+    assert queue.stats()['duplicates'] == 1
+    assert queue.run_pending(conn) == 1
+    assert queue.calls == [{'order_id': 7}]
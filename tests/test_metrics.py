@@ -0,0 +1,30 @@
+from ratelimit import LocalStore
+
+REMOTE = {'REMOTE_ADDR': '203.0.113.7'}
+
+
+def test_metrics_only_for_allowed_ips_or_token(shop_app, client, monkeypatch):
+    assert client.get('/metrics').status_code == 200 # Test client memakai 127.0.0.1
+    assert client.get('/metrics', environ_base=REMOTE).status_code == 404
+
+    monkeypatch.setitem(shop_app.app.config, 'METRICS_TOKEN', 'rahasia')
+    assert client.get('/metrics', environ_base=REMOTE, headers={'Authorization': 'Bearer salah'}).status_code == 404
+    response = client.get('/metrics', environ_base=REMOTE, headers={'Authorization': 'Bearer rahasia'})
+    assert response.status_code == 200
+    assert b'farhanshop_http_requests_total' in response.data
+
+
+def test_server_timing_is_opt_in(shop_app, client, monkeypatch):
+    assert 'Server-Timing' not in client.get('/products').headers
+
+    monkeypatch.setitem(shop_app.app.config, 'SERVER_TIMING', True)
+    assert client.get('/products').headers['Server-Timing'].startswith('db;dur=')
+
+
+def test_metrics_is_rate_limited(shop_app, client, monkeypatch):
+    monkeypatch.setitem(shop_app.app.config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(shop_app.rate_limiter, 'store', LocalStore())
+
+    statuses = [client.get('/metrics').status_code for _ in range(12)]
+    assert statuses[0] == 200
+    assert statuses[-1] == 429
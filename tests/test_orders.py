@@ -0,0 +1,96 @@
+from decimal import Decimal
+
+import pytest
+
+from orders import OutOfStock, create_order
+
+SHIPPING = {'full_name': 'Budi', 'address': 'Jl. Merdeka 1', 'city': 'Bandung', 'zip_code': '40111',
+            'phone': '0812', 'email': 'budi@example.com'}
+
+
+def prices(conn, *product_ids):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT id, price FROM products WHERE id IN ({', '.join('?' * len(product_ids))})", product_ids)
+    return {row[0]: Decimal(str(row[1])) for row in cursor.fetchall()}
+
+
+def test_total_is_computed_from_product_prices(client, auth_headers, conn):
+    body = dict(SHIPPING, total_amount=1, items=[
+        {'id': 'bench-0', 'quantity': 2, 'price': 1},
+        {'id': 'bench-1', 'quantity': 1, 'price': 1},
+        {'id': 'bench-0', 'quantity': '1'}, # Digabung dengan baris bench-0 di atas
+    ])
+    response = client.post('/place_order', headers=auth_headers, json=body)
+    assert response.status_code == 201
+
+    expected = prices(conn, 'bench-0', 'bench-1')
+    assert Decimal(str(response.get_json()['total_amount'])) == expected['bench-0'] * 3 + expected['bench-1']
+    cursor = conn.cursor()
+    cursor.execute("SELECT product_id, quantity, price_at_purchase FROM order_items ORDER BY product_id")
+    assert [(row[0], row[1], Decimal(str(row[2]))) for row in cursor.fetchall()] == [
+        ('bench-0', 3, expected['bench-0']), ('bench-1', 1, expected['bench-1'])]
+
+
+def test_oversell_is_rejected_without_changes(conn):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE products SET stock = 2 WHERE id = 'bench-0'")
+    conn.commit()
+
+    with pytest.raises(OutOfStock) as error:
+        create_order(conn, 1, SHIPPING, {'bench-0': 3, 'bench-1': 1})
+
+    assert error.value.details['shortages'] == [{'product_id': 'bench-0', 'requested': 3, 'available': 2}]
+    cursor.execute("SELECT stock FROM products WHERE id IN ('bench-0', 'bench-1') ORDER BY id")
+    assert [row[0] for row in cursor.fetchall()] == [2, 1000000]
+    cursor.execute("SELECT COUNT(*) FROM order_items")
+    assert cursor.fetchone()[0] == 0
+
+
+def test_unknown_product_is_rejected(client, auth_headers, conn):
+    body = dict(SHIPPING, items=[{'id': 'bench-0', 'quantity': 1}, {'id': 'hilang', 'quantity': 1}])
+    response = client.post('/place_order', headers=auth_headers, json=body)
+
+    assert response.status_code == 404
+    assert response.get_json()['product_ids'] == ['hilang']
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM orders")
+    assert cursor.fetchone()[0] == 0
+
+
+def place_orders(conn, user_id, count):
+    return [create_order(conn, user_id, SHIPPING, {'bench-0': i + 1})[0] for i in range(count)]
+
+
+def test_order_history_pages_with_cursor(client, auth_headers, conn):
+    order_ids = place_orders(conn, 1, 5)
+    place_orders(conn, 2, 1) # Pesanan user lain tidak ikut
+
+    seen = []
+    cursor = None
+    while True:
+        url = '/orders?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(url, headers=auth_headers).get_json()
+        assert len(page['items']) <= 2
+        seen.extend(order['id'] for order in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == sorted(order_ids, reverse=True)
+    first = client.get('/orders?limit=1', headers=auth_headers).get_json()['items'][0]
+    assert first['item_count'] == 5 and first['line_count'] == 1
+    assert first['items'][0]['product_id'] == 'bench-0'
+
+
+def test_order_detail_is_only_visible_to_its_owner(client, auth_headers, conn):
+    own_id = place_orders(conn, 1, 1)[0]
+    other_id = place_orders(conn, 2, 1)[0]
+
+    own = client.get(f'/orders/{own_id}', headers=auth_headers)
+    assert own.status_code == 200
+    assert own.get_json()['items'][0]['quantity'] == 1
+    assert client.get(f'/orders/{other_id}', headers=auth_headers).status_code == 404
+
+
+def test_invalid_history_cursor_is_rejected(client, auth_headers):
+    assert client.get('/orders?cursor=bukan-cursor', headers=auth_headers).status_code == 400
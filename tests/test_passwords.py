@@ -0,0 +1,32 @@
+import pytest
+
+from passwords import LoginThrottle
+
+
+def test_login_throttle_keeps_at_most_max_keys():
+    throttle = LoginThrottle(max_failures=2, max_failures_per_ip=100, max_keys=10)
+    for i in range(50):
+        throttle.record_failure(f'user{i}', f'10.0.0.{i}')
+    assert len(throttle._failures) <= 10
+
+    # Yang terbaru tetap diingat, yang terlama dibuang
+    throttle.record_failure('user49', '10.0.0.49')
+    assert throttle.retry_after('user49', '10.0.0.49') > 0
+    throttle.record_failure('user0', '10.0.0.0')
+    assert throttle.retry_after('user0', '10.0.0.0') == 0
+
+
+@pytest.mark.parametrize('body', [
+    {'username': 123, 'password': 'x'},
+    {'username': ['user0'], 'password': 'x'},
+    {'username': 'user0', 'password': {'a': 1}},
+    [],
+])
+def test_login_rejects_non_string_credentials(client, body):
+    assert client.post('/login', json=body).status_code == 400
+
+
+def test_login_and_register_reject_non_json_body(client):
+    assert client.post('/login', data='username=user0', content_type='text/plain').status_code == 400
+    assert client.post('/register', data='bukan json', content_type='application/json').status_code == 400
+    assert client.post('/register', json={'username': 1, 'password': 'x', 'email': 'a@b.c'}).status_code == 400
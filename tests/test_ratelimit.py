@@ -0,0 +1,77 @@
+import pytest
+
+import auth
+
+from ratelimit import LocalStore, RateLimiter, SharedStore
+
+
+@pytest.fixture(params=['local', 'shared'])
+def store(request, tmp_path):
+    return LocalStore() if request.param == 'local' else SharedStore(str(tmp_path / 'ratelimit.db'))
+
+
+def test_burst_then_refill(store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('ratelimit.time.time', lambda: now[0])
+    limiter = RateLimiter(store)
+    limiter.configure({'default': (1, 3)})
+
+    results = [limiter.check('login', 'ip:1') for _ in range(4)]
+    assert [result[0] for result in results] == [True, True, True, False]
+    assert [result[2] for result in results[:3]] == [2, 1, 0]
+    assert results[3][3] == 1 # Retry-After: satu token kembali dalam 1 detik
+
+    assert limiter.check('login', 'ip:2')[0] # Klien lain punya bucket sendiri
+    now[0] += 1.0
+    assert limiter.check('login', 'ip:1')[0]
+    assert not limiter.check('login', 'ip:1')[0]
+
+
+def test_global_limit_and_unlimited_endpoints(store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('ratelimit.time.time', lambda: now[0])
+    limiter = RateLimiter(store)
+    limiter.configure({'default': (10, 10), 'asset': None}, global_limit=(1, 2))
+
+    assert not limiter.is_limited('asset')
+    assert limiter.check('asset', 'ip:1') is None
+    assert limiter.check('cart', 'ip:1')[0]
+    assert limiter.check('cart', 'ip:2')[0]
+    allowed, _, _, retry_after = limiter.check('cart', 'ip:3')
+    assert not allowed and retry_after == 1
+    assert limiter.stats()['global_limited'] == 1
+
+    # Penolakan global tidak memakan budget klien
+    now[0] += 1.0
+    allowed, _, remaining, _ = limiter.check('cart', 'ip:3')
+    assert allowed and remaining == 9
+
+
+def test_endpoint_answers_429_with_retry_after(shop_app, client, monkeypatch):
+    monkeypatch.setitem(shop_app.app.config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(shop_app.rate_limiter, 'store', LocalStore())
+    monkeypatch.setattr(shop_app.rate_limiter, 'rules', {'search_products': shop_app.rate_limiter._rule((0.1, 2))})
+
+    first = client.get('/products/search?q=bench')
+    assert first.status_code == 200
+    assert first.headers['X-RateLimit-Limit'] == '2'
+    assert first.headers['X-RateLimit-Remaining'] == '1'
+    assert client.get('/products/search?q=bench').status_code == 200
+
+    limited = client.get('/products/search?q=bench')
+    assert limited.status_code == 429
+    assert int(limited.headers['Retry-After']) == 10
+
+
+def test_token_is_verified_once_and_only_for_limited_endpoints(shop_app, client, auth_headers, monkeypatch):
+    monkeypatch.setitem(shop_app.app.config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(shop_app.rate_limiter, 'store', LocalStore())
+    monkeypatch.setattr(shop_app.rate_limiter, 'rules', {'get_products': None})
+    calls = []
+    verify_token = auth.verify_token
+    monkeypatch.setattr(auth, 'verify_token', lambda token: calls.append(token) or verify_token(token))
+
+    assert client.get('/products', headers=auth_headers).status_code == 200
+    assert calls == []
+    assert client.get('/cart', headers=auth_headers).status_code == 200
+    assert len(calls) == 1 # Rate limit dan token_required berbagi hasil verifikasi
@@ -0,0 +1,35 @@
+import pytest
+
+import db
+
+
+@pytest.fixture
+def replicated(shop_app, database):
+    shop_app.DB_CONFIG.update(replicas=[{'database': database + '.replica'}], replica_sticky_seconds=60)
+    db.init_pool(shop_app.DB_CONFIG)
+    db.sync_sqlite_replicas(shop_app.DB_CONFIG)
+    yield db.get_replicas(shop_app.DB_CONFIG)
+    shop_app.DB_CONFIG['replicas'] = []
+
+
+def test_reads_use_replica_until_user_writes(client, auth_headers, replicated):
+    assert client.get('/cart', headers=auth_headers).get_json() == []
+    assert client.get('/orders', headers=auth_headers).status_code == 200
+    stats = replicated.stats()
+    assert (stats['replica_reads'], stats['sticky_keys']) == (1, 0) # Riwayat pesanan tidak menandai tulis
+
+    client.post('/add_to_cart', headers=auth_headers, json={'product_id': 'bench-0', 'quantity': 2})
+    cart = client.get('/cart', headers=auth_headers).get_json()
+
+    assert [item['quantity'] for item in cart] == [2] # Replica belum disalin ulang
+    assert replicated.stats()['sticky_reads'] == 1
+
+
+def test_catalog_loads_from_primary(client, replicated, conn):
+    conn.cursor().execute("UPDATE products SET stock = 7 WHERE id = 'bench-0'")
+    conn.commit()
+
+    products = client.get('/products').get_json()
+
+    assert next(product['stock'] for product in products if product['id'] == 'bench-0') == 7
+    assert replicated.stats()['replica_reads'] == 0
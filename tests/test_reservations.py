@@ -0,0 +1,79 @@
+import pytest
+
+from orders import OutOfStock, create_order
+from reservations import stock_reservations
+
+SHIPPING = {'full_name': 'Budi', 'address': 'Jl. Merdeka 1', 'city': 'Bandung', 'zip_code': '40111',
+            'phone': '0812', 'email': 'budi@example.com'}
+
+
+class RestockAfterUpdate:
+    """
+    Cursor yang menambah stok tepat setelah UPDATE pengurangan stok, meniru restock
+    yang di-commit di antara UPDATE dan SELECT pada consume().
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.rows = None
+
+    def execute(self, sql, params=()):
+        result = self.cursor.execute(sql, params)
+        if sql.startswith("UPDATE products SET stock = stock -"):
+            self.rows = self.cursor.fetchall()
+            self.cursor.execute("UPDATE products SET stock = stock + 100 WHERE id = 'bench-1'")
+        return result
+
+    def fetchall(self):
+        rows, self.rows = self.rows, None
+        return rows if rows is not None else self.cursor.fetchall()
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def stock(conn, product_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT stock, reserved FROM products WHERE id = ?", (product_id,))
+    return cursor.fetchone()
+
+
+def test_consume_reports_shortage_even_if_restocked_before_select(conn):
+    conn.cursor().execute("UPDATE products SET stock = 1 WHERE id = 'bench-1'")
+    cursor = RestockAfterUpdate(conn.cursor())
+
+    shortages = stock_reservations.consume(cursor, conn.backend, 1, {'bench-0': 1, 'bench-1': 2}, {})
+
+    assert [shortage['product_id'] for shortage in shortages] == ['bench-1']
+    assert shortages[0]['available'] == 101
+
+
+def test_consume_reports_missing_product(conn):
+    shortages = stock_reservations.consume(conn.cursor(), conn.backend, 1, {'bench-0': 1, 'hilang': 1}, {})
+
+    assert shortages == [{'product_id': 'hilang', 'requested': 1, 'available': 0}]
+
+
+def test_create_order_rolls_back_on_shortage(conn):
+    cursor = conn.cursor()
+    assert stock_reservations.hold(cursor, conn.backend, 1, 'bench-0', 2)
+    cursor.execute("UPDATE products SET stock = 1 WHERE id = 'bench-1'")
+    conn.commit()
+
+    with pytest.raises(OutOfStock) as error:
+        create_order(conn, 1, SHIPPING, {'bench-0': 2, 'bench-1': 2})
+
+    assert error.value.details['shortages'][0]['product_id'] == 'bench-1'
+    assert stock(conn, 'bench-0') == (1000000, 2) # Hold tetap ada, stok tidak berkurang
+    cursor.execute("SELECT COUNT(*) FROM orders")
+    assert cursor.fetchone()[0] == 0
+
+
+def test_create_order_consumes_hold(conn):
+    cursor = conn.cursor()
+    assert stock_reservations.hold(cursor, conn.backend, 1, 'bench-0', 2)
+    conn.commit()
+
+    create_order(conn, 1, SHIPPING, {'bench-0': 2})
+
+    assert stock(conn, 'bench-0') == (999998, 0)
@@ -0,0 +1,42 @@
+import gzip
+import json
+
+from responses import JsonArrayStream
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+def test_catalog_is_gzipped_only_when_accepted(client):
+    plain = client.get('/products')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    compressed = client.get('/products', headers=GZIP)
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(compressed.data)) == plain.get_json()
+
+    refused = client.get('/products', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in refused.headers
+
+
+def test_streamed_list_is_valid_json_when_gzipped(shop_app, client, monkeypatch):
+    monkeypatch.setattr(shop_app, 'STREAM_BATCH_SIZE', 7)
+    response = client.get('/products?in_stock=1', headers=GZIP)
+
+    assert response.is_streamed
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert [product['id'] for product in json.loads(gzip.decompress(response.data))] == [
+        f'bench-{i}' for i in sorted(range(20), key=lambda i: f'bench-{i}')]
+
+
+def test_json_array_stream_handles_empty_and_partial_pages():
+    assert b''.join(JsonArrayStream(iter([]))) == b'[]'
+    assert b''.join(JsonArrayStream(iter([[], [{'a': 1}], [], [{'a': 2}, {'a': 3}]]))) == b'[{"a":1},{"a":2},{"a":3}]'
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get('/', headers=GZIP)
+    assert response.status_code == 200
+    assert len(response.data) < 1024
+    assert 'Content-Encoding' not in response.headers
@@ -0,0 +1,51 @@
+import pytest
+
+from db_setup import SAMPLE_PRODUCTS
+from search import SearchIndex, stem
+
+
+@pytest.fixture(scope='module')
+def index():
+    index = SearchIndex()
+    index.sync([{'id': row[0], 'name': row[1], 'description': row[2]} for row in SAMPLE_PRODUCTS])
+    return index
+
+
+def names(index, query):
+    return [product['name'] for product in index.search(query)[0]]
+
+
+@pytest.mark.parametrize('singular, plural', [('apple', 'apples'), ('tomato', 'tomatoes'),
+                                              ('strawberry', 'strawberries'), ('glass', 'glasses')])
+def test_singular_and_plural_share_a_stem_or_prefix(singular, plural):
+    assert stem(plural).startswith(stem(singular)) or stem(singular).startswith(stem(plural))
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('apple segar', 'Apple'),
+    ('apples segar', 'Apple'),
+    ('strawberri', 'Strawberry'),
+    ('strawberries', 'Strawberry'),
+    ('tomatoes', 'Tomatoe'),
+    ('tomat merah', 'Tomatoe'), # Awalan juga berlaku untuk kata selain kata terakhir
+])
+def test_search_matches_word_forms(index, query, expected):
+    assert names(index, query)[0] == expected
+
+
+def test_exact_match_ranks_above_prefix_match():
+    index = SearchIndex()
+    index.sync([{'id': 1, 'name': 'Apel', 'description': ''}, {'id': 2, 'name': 'Apelsin', 'description': ''}])
+
+    assert names(index, 'apel') == ['Apel', 'Apelsin']
+
+
+def test_all_words_must_match(index):
+    assert names(index, 'apple stroberi') == []
+
+
+def test_search_endpoint(client):
+    response = client.get('/products/search?q=bench+produk+1')
+
+    assert response.status_code == 200
+    assert response.get_json()['items'][0]['id'] == 'bench-1'
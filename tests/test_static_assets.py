@@ -0,0 +1,81 @@
+import json
+import os
+import re
+
+import pytest
+
+from static_assets import StaticAssets, static_assets
+
+
+def test_root_is_api_greeting_and_pages_keep_their_paths(client):
+    root = client.get('/')
+    assert root.status_code == 200
+    assert b'Farhan Shop' in root.data
+
+    page = client.get('/index.html')
+    assert page.status_code == 200
+    assert page.mimetype == 'text/html'
+
+
+def test_source_assets_only_match_asset_extensions(client):
+    assert client.get('/product-4.jpg').status_code == 200
+    assert client.get('/PRODUCT-4.JPG').status_code == 404 # Cocok dengan route, tapi file tidak ada
+    assert client.get('/tidak-ada').status_code == 404
+    assert client.post('/tidak-ada').status_code == 404
+    assert client.put('/api/lama/endpoint').status_code == 404
+
+
+@pytest.fixture
+def site(tmp_path):
+    source = tmp_path / 'site'
+    (source / 'css').mkdir(parents=True)
+    (source / 'images').mkdir()
+    (source / 'images' / 'logo.png').write_bytes(b'bukan-png-sungguhan')
+    (source / 'css' / 'style.css').write_text("body { background: url('../images/logo.png'); }" + ' ' * 2000)
+    (source / 'index.html').write_text('<link href="css/style.css" rel="stylesheet">'
+                                       '<img src="images/logo.png?v=1"><a href="https://example.com/x.css">x</a>')
+    return source
+
+
+def test_build_fingerprints_assets_and_rewrites_references(site, tmp_path):
+    assets = StaticAssets(str(site), str(tmp_path / 'out'), image_widths=())
+    manifest = assets.build()
+
+    css_name = manifest['assets']['css/style.css']
+    logo_name = manifest['assets']['images/logo.png']
+    assert re.fullmatch(r'style\.[0-9a-f]{10}\.css', css_name)
+    assert 'gzip' in manifest['files'][css_name]['encodings']
+    assert os.path.exists(tmp_path / 'out' / f'{css_name}.gz')
+
+    css = (tmp_path / 'out' / css_name).read_text()
+    assert f"url('/assets/{logo_name}')" in css
+    html = (tmp_path / 'out' / manifest['pages']['index.html']).read_text()
+    assert f'href="/assets/{css_name}"' in html
+    assert f'src="/assets/{logo_name}?v=1"' in html
+    assert 'href="https://example.com/x.css"' in html # Rujukan eksternal tidak disentuh
+    assert json.loads((tmp_path / 'out' / 'manifest.json').read_text()) == manifest
+
+
+def test_changed_asset_gets_new_name_and_deploy_build_is_reused(site, tmp_path):
+    output = str(tmp_path / 'out')
+    first = StaticAssets(str(site), output, image_widths=()).build()
+    (site / 'images' / 'logo.png').write_bytes(b'logo-baru')
+    second = StaticAssets(str(site), output, image_widths=()).build()
+
+    assert first['assets']['images/logo.png'] != second['assets']['images/logo.png']
+    assert first['assets']['css/style.css'] != second['assets']['css/style.css'] # url() di CSS ikut berubah
+
+    deployed = StaticAssets(str(site), output, build_on_startup=False, image_widths=())
+    deployed.load()
+    assert deployed.url_for('images/logo.png') == '/assets/' + second['assets']['images/logo.png']
+
+
+def test_hashed_assets_are_immutable_and_pages_revalidate(client):
+    url = static_assets.url_for('product-4.jpg')
+    asset = client.get(url)
+    assert asset.status_code == 200
+    assert asset.cache_control.immutable and asset.cache_control.max_age == 365 * 24 * 3600
+
+    page = client.get('/index.html')
+    assert page.cache_control.no_cache
+    assert client.get('/index.html', headers={'If-None-Match': page.headers['ETag']}).status_code == 304